@@ -1,5 +1,14 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -17,21 +26,204 @@ st.set_page_config(
 # ========================================================
 # Configuration API
 # ========================================================
+# "remote" : appels HTTP à l'API FastAPI ; "local" : scripts/predictor.py importé
+# directement dans le processus Streamlit (déploiement sur une seule machine)
+BACKENDS = {"remote": "API HTTP", "local": "En processus"}
+DEFAULT_BACKEND = os.getenv("APP_BACKEND", "remote")
+if DEFAULT_BACKEND not in BACKENDS:
+    DEFAULT_BACKEND = "remote"
+
+backend = st.sidebar.radio(
+    "Moteur de prédiction",
+    list(BACKENDS),
+    index=list(BACKENDS).index(DEFAULT_BACKEND),
+    format_func=BACKENDS.get,
+    help="API HTTP : appelle l'API FastAPI. En processus : charge le modèle dans l'interface (sans aller-retour HTTP)."
+)
+
 API_URL = st.sidebar.text_input(
     "URL de l'API",
-    value="http://localhost:8000",
-    help="Adresse de votre API FastAPI"
+    value=os.getenv("API_URL", "http://localhost:8000"),
+    help="Adresse de votre API FastAPI",
+    disabled=backend == "local"
 )
 
-# Test de connexion API
-try:
-    health_response = requests.get(f"{API_URL}/health", timeout=2)
-    if health_response.status_code == 200:
+# Streamlit ré-exécute tout le script à chaque interaction : sans cache, chaque
+# rerun ouvrait une nouvelle connexion, refaisait le health check et renvoyait
+# les mêmes requêtes à l'API.
+HEALTH_TTL_S = float(os.getenv("APP_HEALTH_TTL_S", "30"))
+RESPONSE_TTL_S = float(os.getenv("APP_RESPONSE_TTL_S", "300"))
+RESPONSE_CACHE_ENTRIES = int(os.getenv("APP_RESPONSE_CACHE_ENTRIES", "256"))
+
+
+class ApiError(Exception):
+    """Réponse non 200 de l'API (levée dans les fonctions en cache : jamais mémorisée)."""
+
+    def __init__(self, status_code: int, body: dict):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.body = body
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Session HTTP partagée par tous les reruns et utilisateurs (keep-alive, pool de connexions)."""
+    session = requests.Session()
+    retry = Retry(total=2, connect=2, read=0, backoff_factor=0.2,
+                  allowed_methods=frozenset({"GET"}), status_forcelist=(502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=HEALTH_TTL_S, show_spinner=False)
+def check_health(api_url: str) -> Optional[int]:
+    """Code HTTP de /health, ou None si l'API est injoignable ; au plus un appel par TTL."""
+    try:
+        return get_session().get(f"{api_url}/health", timeout=2).status_code
+    except requests.exceptions.RequestException:
+        return None
+
+
+@st.cache_data(ttl=RESPONSE_TTL_S, max_entries=RESPONSE_CACHE_ENTRIES, show_spinner=False)
+def _post_cached(api_url: str, endpoint: str, payload_json: str, timeout: float) -> dict:
+    response = get_session().post(f"{api_url}{endpoint}", data=payload_json,
+                                  headers={"Content-Type": "application/json"}, timeout=timeout)
+    try:
+        body = response.json()
+    except ValueError:
+        body = {"detail": response.text or "Erreur inconnue"}
+    if response.status_code != 200:
+        raise ApiError(response.status_code, body)
+    return body
+
+
+def api_post(endpoint: str, payload: dict, timeout: float) -> Tuple[int, dict]:
+    """
+    POST JSON mémorisé par payload : un rerun avec les mêmes paramètres ne
+    rappelle pas l'API pendant RESPONSE_TTL_S. Le payload est sérialisé avec
+    les clés triées pour servir de clé de cache. Seules les réponses 200 sont
+    mémorisées ; les erreurs réseau remontent telles quelles (requests.exceptions).
+    """
+    payload_json = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    try:
+        return 200, _post_cached(API_URL, endpoint, payload_json, timeout)
+    except ApiError as e:
+        return e.status_code, e.body
+
+
+@st.cache_resource(show_spinner="Chargement du modèle...")
+def get_local_backend():
+    """Moteur en processus : modèle chargé une seule fois pour tous les reruns et utilisateurs."""
+    from api import local_backend
+    return local_backend
+
+
+def call_backend(endpoint: str, payload: dict, timeout: float) -> Tuple[int, dict]:
+    """(code, corps) identiques quel que soit le moteur choisi."""
+    if backend == "local":
+        return get_local_backend().call(endpoint, payload)
+    return api_post(endpoint, payload, timeout)
+
+
+# Mode CSV en masse : blocs de BATCH_CHUNK_ROWS lignes envoyés à /predict/batch,
+# BATCH_CONCURRENCY requêtes en parallèle
+BATCH_CHUNK_ROWS = int(os.getenv("APP_BATCH_CHUNK_ROWS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("APP_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_RETRIES = int(os.getenv("APP_BATCH_MAX_RETRIES", "10"))
+BATCH_COLUMNS = ["area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+BATCH_FLAGS = ["irrigation", "fertilizer"]
+
+
+def prepare_bulk(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """
+    Lignes envoyables à /predict/batch et nombre de lignes écartées (valeur
+    manquante ou hors des bornes de l'API). Lève ValueError si une colonne manque.
+    """
+    missing = [c for c in BATCH_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {missing}")
+    out = df[BATCH_COLUMNS].copy()
+    for c in BATCH_COLUMNS[2:]:
+        out[c] = pd.to_numeric(out[c], errors="coerce")
+    present = out.notna().all(axis=1)
+    out["area"], out["item"] = out["area"].astype(str), out["item"].astype(str)
+    for c in BATCH_FLAGS:
+        col = df[c] if c in df.columns else pd.Series(False, index=df.index)
+        if col.dtype == object:
+            col = col.astype(str).str.strip().str.lower().isin(["1", "true", "yes", "oui"])
+        out[c] = col.fillna(False).astype(bool)
+    valid = (present & out["year"].between(1900, 2100)
+             & (out["avg_rain_mm"] >= 0) & (out["pesticides_tonnes"] >= 0))
+    out = out[valid].astype({"year": int})
+    return out.reset_index(drop=True), int((~valid).sum())
+
+
+def batch_sender() -> Callable[[List[dict]], Tuple[int, dict]]:
+    """Envoi d'un bloc de lignes ; résolu dans le thread du script (les caches Streamlit y sont liés)."""
+    if backend == "local":
+        engine = get_local_backend()
+        return lambda rows: engine.call("/predict/batch", {"rows": rows})
+    session, api_url = get_session(), API_URL
+
+    def send(rows: List[dict]) -> Tuple[int, dict]:
+        # 429 / 503 (limitation de débit, file d'inférence pleine) : on attend Retry-After et on renvoie le bloc
+        for _ in range(BATCH_MAX_RETRIES):
+            response = session.post(f"{api_url}/predict/batch", json={"rows": rows}, timeout=120)
+            if response.status_code not in (429, 503):
+                break
+            time.sleep(float(response.headers.get("Retry-After", "1")))
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"detail": response.text or "Erreur inconnue"}
+        return response.status_code, body
+
+    return send
+
+
+def score_bulk(df: pd.DataFrame, chunk_rows: int, concurrency: int,
+               on_progress: Callable[[int, int], None]) -> np.ndarray:
+    """Rendement (hg/ha) de chaque ligne : blocs envoyés en parallèle, progression à chaque bloc reçu."""
+    send = batch_sender()
+    records = df.to_dict("records")
+    preds = np.empty(len(records))
+    done = 0
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {pool.submit(send, records[start:start + chunk_rows]): start
+                   for start in range(0, len(records), chunk_rows)}
+        for future in as_completed(futures):
+            status_code, body = future.result()
+            if status_code != 200:
+                raise ApiError(status_code, body)
+            start = futures[future]
+            chunk = body["pred_yield_hg_ha"]
+            preds[start:start + len(chunk)] = chunk
+            done += len(chunk)
+            on_progress(done, len(records))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return preds
+
+
+if backend == "local":
+    try:
+        st.sidebar.success(f"✅ Moteur local chargé (modèle {get_local_backend().MODEL_VERSION})")
+    except Exception as e:
+        st.sidebar.error(f"❌ Moteur local indisponible : {e}")
+else:
+    # Test de connexion API (au plus un appel toutes les HEALTH_TTL_S secondes)
+    if st.sidebar.button("🔄 Retester la connexion"):
+        check_health.clear()
+    health_status = check_health(API_URL)
+    if health_status == 200:
         st.sidebar.success("✅ API connectée")
-    else:
+    elif health_status is not None:
         st.sidebar.warning("⚠️ API répond mais avec erreur")
-except:
-    st.sidebar.error("❌ API non accessible")
+    else:
+        st.sidebar.error("❌ API non accessible")
 
 # ========================================================
 # Titre et description
@@ -48,7 +240,7 @@ de cultures basées sur vos conditions environnementales.
 st.sidebar.header("⚙️ Configuration")
 mode = st.sidebar.radio(
     "Mode",
-    ["Prédiction", "Recommandation par Rendement", "Recommandation par Rentabilité"],
+    ["Prédiction", "Recommandation par Rendement", "Recommandation par Rentabilité", "Scoring en masse (CSV)"],
     help="Choisissez le type d'analyse souhaité"
 )
 
@@ -177,10 +369,9 @@ if mode == "Prédiction":
                     payload["price_unit"] = price_unit
                 
                 # Envoyer la requête à l'API
-                response = requests.post(f"{API_URL}/predict", json=payload, timeout=10)
+                status_code, result = call_backend("/predict", payload, timeout=10)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if status_code == 200:
                     
                     # Afficher les résultats
                     st.success("✅ Prédiction réussie !")
@@ -225,7 +416,7 @@ if mode == "Prédiction":
                             st.write(f"- 🌱 Fertilisation : {'✅ Oui' if fertilizer else '❌ Non'}")
                     
                 else:
-                    st.error(f"❌ Erreur {response.status_code}: {response.json().get('detail', 'Erreur inconnue')}")
+                    st.error(f"❌ Erreur {status_code}: {result.get('detail', 'Erreur inconnue')}")
                     
             except requests.exceptions.ConnectionError:
                 st.error(f"❌ Impossible de se connecter à l'API à l'adresse {API_URL}")
@@ -274,10 +465,9 @@ elif mode == "Recommandation par Rendement":
                 }
                 
                 # Envoyer la requête à l'API
-                response = requests.post(f"{API_URL}/recommend/yield", json=payload, timeout=15)
+                status_code, result = call_backend("/recommend/yield", payload, timeout=15)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if status_code == 200:
                     recommendations = result["results"]
                     
                     st.success(f"✅ {len(recommendations)} recommandation(s) générée(s) !")
@@ -326,7 +516,7 @@ elif mode == "Recommandation par Rendement":
                     st.caption(f"🚰 Irrigation : {'✅ Oui' if irrigation else '❌ Non'} | 🌱 Fertilisation : {'✅ Oui' if fertilizer else '❌ Non'}")
                     
                 else:
-                    st.error(f"❌ Erreur {response.status_code}: {response.json().get('detail', 'Erreur inconnue')}")
+                    st.error(f"❌ Erreur {status_code}: {result.get('detail', 'Erreur inconnue')}")
                     
             except requests.exceptions.ConnectionError:
                 st.error(f"❌ Impossible de se connecter à l'API à l'adresse {API_URL}")
@@ -336,6 +526,65 @@ elif mode == "Recommandation par Rendement":
             except Exception as e:
                 st.error(f"❌ Erreur: {str(e)}")
 
+# ========================================================
+# Mode Scoring en masse (CSV)
+# ========================================================
+elif mode == "Scoring en masse (CSV)":
+    st.header("📦 Scoring en masse")
+    st.info("💡 Un scénario par ligne : colonnes area, item, year, avg_rain_mm, pesticides_tonnes, avg_temp "
+            "(irrigation et fertilizer optionnelles). Les paramètres de la barre latérale ne sont pas utilisés.")
+
+    uploaded = st.file_uploader("Fichier CSV des scénarios", type=["csv"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        chunk_rows = st.number_input("Lignes par requête", min_value=100, max_value=5000,
+                                     value=BATCH_CHUNK_ROWS, step=100)
+    with col2:
+        concurrency = st.slider("Requêtes en parallèle", min_value=1, max_value=16, value=BATCH_CONCURRENCY)
+
+    if uploaded is not None and st.button("🚀 Scorer le fichier", type="primary", width="stretch"):
+        try:
+            scenarios, n_invalid = prepare_bulk(pd.read_csv(uploaded))
+            if n_invalid:
+                st.warning(f"⚠️ {n_invalid} ligne(s) écartée(s) : valeur manquante ou hors bornes")
+            progress = st.progress(0.0, text="Scoring en cours...")
+            t0 = time.perf_counter()
+            preds = score_bulk(scenarios, int(chunk_rows), concurrency,
+                               lambda done, total: progress.progress(done / total, text=f"{done:,} / {total:,} lignes"))
+            seconds = time.perf_counter() - t0
+            # résultats gardés en session : changer de page ne relance pas le scoring
+            st.session_state["bulk_results"] = scenarios.assign(pred_yield_hg_ha=preds, pred_yield_t_ha=preds / 10000)
+            st.session_state["bulk_page"] = 1
+            st.success(f"✅ {len(scenarios):,} lignes scorées en {seconds:.1f} s "
+                       f"({len(scenarios) / max(seconds, 1e-9):,.0f} lignes/s)")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        except ApiError as e:
+            st.error(f"❌ Erreur {e.status_code}: {e.body.get('detail', 'Erreur inconnue')}")
+        except requests.exceptions.ConnectionError:
+            st.error(f"❌ Impossible de se connecter à l'API à l'adresse {API_URL}")
+        except requests.exceptions.Timeout:
+            st.error("❌ Timeout : l'API met trop de temps à répondre")
+
+    results = st.session_state.get("bulk_results")
+    if results is not None:
+        # pagination côté serveur Streamlit : seule la page affichée est envoyée au navigateur
+        st.subheader("📋 Résultats")
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            page_size = st.selectbox("Lignes par page", [50, 100, 500, 1000], index=1)
+        n_pages = max(1, -(-len(results) // page_size))
+        st.session_state["bulk_page"] = min(st.session_state.get("bulk_page", 1), n_pages)
+        with col2:
+            page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="bulk_page")
+        with col3:
+            st.download_button("💾 Télécharger tous les résultats (CSV)", results.to_csv(index=False).encode(),
+                               file_name="predictions.csv", mime="text/csv")
+        start = (page - 1) * page_size
+        st.dataframe(results.iloc[start:start + page_size], width="stretch", hide_index=True)
+        st.caption(f"Page {page} / {n_pages} — {len(results):,} lignes")
+
 # ========================================================
 # Mode Recommandation par Rentabilité
 # ========================================================
@@ -416,10 +665,9 @@ else:  # Recommandation par Rentabilité
                 }
                 
                 # Envoyer la requête à l'API
-                response = requests.post(f"{API_URL}/recommend/revenue", json=payload, timeout=15)
+                status_code, result = call_backend("/recommend/revenue", payload, timeout=15)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if status_code == 200:
                     recommendations = result["results"]
                     
                     st.success(f"✅ {len(recommendations)} recommandation(s) générée(s) !")
@@ -477,8 +725,8 @@ else:  # Recommandation par Rentabilité
                         st.write(f"- Prix : {best_crop['price_value']:.2f} {price_unit}")
                     
                 else:
-                    error_detail = response.json().get('detail', 'Erreur inconnue')
-                    st.error(f"❌ Erreur {response.status_code}: {error_detail}")
+                    error_detail = result.get('detail', 'Erreur inconnue')
+                    st.error(f"❌ Erreur {status_code}: {error_detail}")
                     
             except requests.exceptions.ConnectionError:
                 st.error(f"❌ Impossible de se connecter à l'API à l'adresse {API_URL}")
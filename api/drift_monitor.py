@@ -0,0 +1,158 @@
+#api/drift_monitor.py
+"""
+Détection de dérive en continu des requêtes journalisées par rapport aux
+données d'entraînement (inputs/processed/clean_data.csv).
+
+Le moniteur est abonné au journal des prédictions (PredictionLogger.subscribe) :
+il est mis à jour à chaque lot écrit, dans le thread d'écriture, jamais sur le
+chemin des requêtes, et sans relire le journal.
+
+Mémoire constante :
+- variables numériques (pluie, pesticides, température) : un histogramme par
+  variable sur des bins fixés par les déciles de l'entraînement, plus deux
+  bins "hors plage" (sous le min / au-dessus du max) ; PSI et KS sont calculés
+  sur ces bins ;
+- pays : taux de pays inconnus du modèle et les plus fréquents d'entre eux
+  (sketch Space-Saving à `top_k` compteurs). Les noms sont comparés après
+  normalize_area, comme au scoring : "France" n'est pas un pays inconnu.
+
+Les compteurs décroissent exponentiellement (demi-vie `half_life` requêtes) :
+les scores reflètent le trafic récent.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scripts.area_neighbors import normalize_area
+
+NUMERIC_COLS = ["avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+
+# seuils usuels du PSI
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+
+
+def psi(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-4) -> float:
+    """Population Stability Index entre deux distributions sur les mêmes bins."""
+    e = np.clip(expected, eps, None)
+    a = np.clip(actual, eps, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks_binned(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Statistique de Kolmogorov-Smirnov approchée : écart max des fonctions de répartition par bin."""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+class DriftMonitor:
+    def __init__(
+        self,
+        reference: pd.DataFrame,
+        numeric_cols: Sequence[str] = NUMERIC_COLS,
+        n_bins: int = 10,
+        half_life: float = 10_000,
+        top_k: int = 20,
+        min_count: float = 100,
+    ):
+        self.numeric_cols = list(numeric_cols)
+        self.half_life = half_life
+        self.top_k = top_k
+        self.min_count = min_count
+
+        # bins : ]-inf, min[, déciles, ]max, +inf[ -> les deux bins extrêmes valent 0 à l'entraînement
+        self.edges: Dict[str, np.ndarray] = {}
+        self.expected: Dict[str, np.ndarray] = {}
+        for col in self.numeric_cols:
+            values = reference[col].dropna().to_numpy(dtype=float)
+            inner = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)))
+            edges = np.concatenate([inner[:1], inner[1:-1], [np.nextafter(inner[-1], np.inf)]])
+            self.edges[col] = edges
+            self.expected[col] = np.bincount(np.searchsorted(edges, values, side="right"),
+                                             minlength=len(edges) + 1) / len(values)
+        self.known_areas = frozenset(normalize_area(a) for a in reference["area"].dropna().unique())
+
+        self._lock = threading.Lock()
+        self._counts = {col: np.zeros(len(self.edges[col]) + 1) for col in self.numeric_cols}
+        self._n = 0.0
+        self._n_unseen = 0.0
+        self._unseen_top: Dict[str, float] = {}
+        self.batches = 0
+        self.records = 0
+
+    @classmethod
+    def from_csv(cls, path: Path, **kwargs) -> "DriftMonitor":
+        return cls(pd.read_csv(path, usecols=["area"] + list(kwargs.get("numeric_cols", NUMERIC_COLS))), **kwargs)
+
+    # ----------------------------------------------------
+    # Mise à jour par lot (callback du PredictionLogger)
+    # ----------------------------------------------------
+    def update(self, batch: List[dict]) -> None:
+        inputs = [r.get("input") or {} for r in batch]
+        if not inputs:
+            return
+        decay = 0.5 ** (len(inputs) / self.half_life)
+        columns = {
+            col: np.array([x.get(col) for x in inputs], dtype=float) for col in self.numeric_cols
+        }
+        areas = (normalize_area(x["area"]) for x in inputs if x.get("area") is not None)
+        unseen = [a for a in areas if a not in self.known_areas]
+
+        with self._lock:
+            for col, values in columns.items():
+                values = values[~np.isnan(values)]
+                counts = self._counts[col]
+                counts *= decay
+                counts += np.bincount(np.searchsorted(self.edges[col], values, side="right"),
+                                      minlength=len(counts))
+            self._n = self._n * decay + len(inputs)
+            self._n_unseen = self._n_unseen * decay + len(unseen)
+            for area in self._unseen_top:
+                self._unseen_top[area] *= decay
+            for area in unseen:
+                self._add_unseen(area)
+            self.batches += 1
+            self.records += len(inputs)
+
+    def _add_unseen(self, area: str) -> None:
+        # Space-Saving : au plus top_k compteurs, le moins fréquent cède sa place
+        if area in self._unseen_top or len(self._unseen_top) < self.top_k:
+            self._unseen_top[area] = self._unseen_top.get(area, 0.0) + 1
+            return
+        rarest = min(self._unseen_top, key=self._unseen_top.get)
+        self._unseen_top[area] = self._unseen_top.pop(rarest) + 1
+
+    # ----------------------------------------------------
+    # Scores (lecture seule, O(nombre de bins))
+    # ----------------------------------------------------
+    def scores(self) -> dict:
+        with self._lock:
+            counts = {col: c.copy() for col, c in self._counts.items()}
+            n, n_unseen = self._n, self._n_unseen
+            top = sorted(self._unseen_top.items(), key=lambda kv: -kv[1])
+
+        features = {}
+        for col in self.numeric_cols:
+            total = counts[col].sum()
+            if total < self.min_count:
+                features[col] = {"psi": None, "ks": None, "out_of_range": None, "status": "insufficient_data"}
+                continue
+            actual = counts[col] / total
+            score = psi(self.expected[col], actual)
+            features[col] = {
+                "psi": score,
+                "ks": ks_binned(self.expected[col], actual),
+                "out_of_range": float(actual[0] + actual[-1]),
+                "status": "drift" if score >= PSI_DRIFT else "warning" if score >= PSI_WARNING else "ok",
+            }
+        return {
+            "records": self.records,
+            "batches": self.batches,
+            "effective_count": n,
+            "features": features,
+            "unseen_area_rate": n_unseen / n if n else None,
+            "top_unseen_areas": [area for area, _ in top[:10]],
+        }
@@ -0,0 +1,245 @@
+#api/history.py
+"""
+Historique des rendements et du climat, servi depuis un index SQLite local.
+
+Les CSV bruts de inputs/raw/ (56 718 lignes de rendement, plus la pluie, les
+pesticides et les relevés de température) sont chargés une fois dans une base
+SQLite (HISTORY_DB), puis les requêtes ne touchent plus qu'à l'index :
+- yields (area, item, year, yield_hg_ha) et climate (area, year, pluie,
+  pesticides, température moyenne des stations) sont des tables WITHOUT ROWID :
+  la clé primaire est l'index couvrant, une requête par pays / culture / plage
+  d'années est un parcours de plage dans un seul B-tree ;
+- yields_by_item (item, year, area, yield_hg_ha) couvre les requêtes par
+  culture sans pays.
+
+Noms de pays et de cultures en minuscules (comme les catégories du modèle).
+La base garde la signature (taille, date) des CSV sources : elle est
+reconstruite au premier accès si un CSV change, dans un fichier temporaire
+remplacé atomiquement (les workers de api.serve partagent le fichier).
+
+Construction hors API : python -m api.history
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+RAW_DIR = BASE_DIR.parent / "inputs" / "raw"
+SOURCES = ("yield.csv", "rainfall.csv", "pesticides.csv", "temp.csv")
+
+SCHEMA = """
+CREATE TABLE yields (
+    area TEXT NOT NULL,
+    item TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    yield_hg_ha REAL NOT NULL,
+    PRIMARY KEY (area, item, year)
+) WITHOUT ROWID;
+CREATE TABLE climate (
+    area TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    avg_rain_mm REAL,
+    pesticides_tonnes REAL,
+    avg_temp REAL,
+    PRIMARY KEY (area, year)
+) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+# créé après le chargement : plus rapide que de maintenir l'index ligne à ligne
+INDEXES = "CREATE INDEX yields_by_item ON yields (item, year, area, yield_hg_ha);"
+
+CLIMATE_COLS = ["avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+
+
+def _norm(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip().str.lower()
+
+
+def source_signature(raw_dir: Path) -> str:
+    """(taille, date de modification) de chaque CSV source."""
+    return json.dumps({name: [(raw_dir / name).stat().st_size, (raw_dir / name).stat().st_mtime_ns]
+                       for name in SOURCES}, sort_keys=True)
+
+
+def load_sources(raw_dir: Path = RAW_DIR) -> Dict[str, pd.DataFrame]:
+    """Tables yields et climate normalisées à partir des CSV bruts."""
+    y = pd.read_csv(raw_dir / "yield.csv", usecols=["Area", "Item", "Year", "Element", "Value"])
+    y = y[y["Element"] == "Yield"].dropna(subset=["Value"])
+    yields = pd.DataFrame({"area": _norm(y["Area"]), "item": _norm(y["Item"]),
+                           "year": y["Year"].astype(int), "yield_hg_ha": y["Value"].astype(float)})
+    yields = yields.groupby(["area", "item", "year"], as_index=False)["yield_hg_ha"].mean()
+
+    rain = pd.read_csv(raw_dir / "rainfall.csv")
+    rain.columns = [c.strip() for c in rain.columns]
+    rain = pd.DataFrame({"area": _norm(rain["Area"]), "year": rain["Year"].astype(int),
+                         "avg_rain_mm": pd.to_numeric(rain["average_rain_fall_mm_per_year"], errors="coerce")})
+    pest = pd.read_csv(raw_dir / "pesticides.csv", usecols=["Area", "Year", "Value"])
+    pest = pd.DataFrame({"area": _norm(pest["Area"]), "year": pest["Year"].astype(int),
+                         "pesticides_tonnes": pd.to_numeric(pest["Value"], errors="coerce")})
+    temp = pd.read_csv(raw_dir / "temp.csv")
+    temp = pd.DataFrame({"area": _norm(temp["country"]), "year": temp["year"].astype(int),
+                         "avg_temp": pd.to_numeric(temp["avg_temp"], errors="coerce")})
+
+    # une valeur par (pays, année) : moyenne des stations pour la température
+    parts = [df.groupby(["area", "year"])[col].mean()
+             for df, col in ((rain, "avg_rain_mm"), (pest, "pesticides_tonnes"), (temp, "avg_temp"))]
+    climate = pd.concat(parts, axis=1).dropna(how="all").reset_index()
+    return {"yields": yields, "climate": climate[["area", "year"] + CLIMATE_COLS]}
+
+
+def build(db_path: Path, raw_dir: Path = RAW_DIR) -> Dict[str, int]:
+    """(Re)construit la base dans un fichier temporaire, puis la met en place atomiquement."""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    signature = source_signature(raw_dir)
+    tables = load_sources(raw_dir)
+    tmp = db_path.with_name(f"{db_path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    db = sqlite3.connect(tmp)
+    try:
+        db.executescript(SCHEMA)
+        for name, df in tables.items():
+            df = df.sort_values(list(df.columns[:3 if name == "yields" else 2]))
+            cols = ", ".join(df.columns)
+            marks = ", ".join("?" * len(df.columns))
+            rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            db.executemany(f"INSERT INTO {name} ({cols}) VALUES ({marks})", rows)
+        db.executescript(INDEXES)
+        db.execute("INSERT INTO meta VALUES ('source_signature', ?)", (signature,))
+        db.execute("INSERT INTO meta VALUES ('built_at', ?)", (str(time.time()),))
+        db.commit()
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+    os.replace(tmp, db_path)
+    return {name: len(df) for name, df in tables.items()}
+
+
+class HistoryStore:
+    def __init__(self, db_path: Path, raw_dir: Path = RAW_DIR, max_rows: int = 10_000):
+        self.db_path = Path(db_path)
+        self.raw_dir = Path(raw_dir)
+        self.max_rows = max_rows
+        self._local = threading.local()  # une connexion en lecture seule par thread
+        self._lock = threading.Lock()
+        self._checked = False
+        self.queries = 0
+
+    # ----------------------------------------------------
+    # Base à jour + connexions
+    # ----------------------------------------------------
+    def ensure(self) -> None:
+        """Construit la base si elle manque ou si un CSV source a changé (une fois par processus)."""
+        if self._checked:
+            return
+        with self._lock:
+            if self._checked:
+                return
+            if self._stored_signature() != source_signature(self.raw_dir):
+                build(self.db_path, self.raw_dir)
+            self._checked = True
+
+    def _stored_signature(self) -> Optional[str]:
+        if not self.db_path.exists():
+            return None
+        db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'source_signature'").fetchone()
+            return row[0] if row else None
+        except sqlite3.DatabaseError:
+            return None
+        finally:
+            db.close()
+
+    def _db(self) -> sqlite3.Connection:
+        self.ensure()
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        return db
+
+    def _query(self, sql: str, params: list) -> List[dict]:
+        self.queries += 1
+        cursor = self._db().execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    # ----------------------------------------------------
+    # Requêtes
+    # ----------------------------------------------------
+    def yields(self, area: Optional[str] = None, item: Optional[str] = None, year_from: Optional[int] = None,
+               year_to: Optional[int] = None, climate: bool = True, limit: Optional[int] = None) -> List[dict]:
+        """Rendements (hg/ha) triés par pays, culture, année ; avec le climat de l'année si `climate`."""
+        if area is None and item is None:
+            raise ValueError("area or item is required")
+        where, params = _filters(area=area, item=item, year_from=year_from, year_to=year_to, prefix="y.")
+        select = "y.area, y.item, y.year, y.yield_hg_ha"
+        join = ""
+        if climate:
+            select += ", " + ", ".join(f"c.{c}" for c in CLIMATE_COLS)
+            join = "LEFT JOIN climate c ON c.area = y.area AND c.year = y.year"
+        order = "y.area, y.item, y.year" if area is not None else "y.item, y.year, y.area"
+        return self._query(f"SELECT {select} FROM yields y {join} WHERE {where} ORDER BY {order} LIMIT ?",
+                           params + [self._limit(limit)])
+
+    def climate(self, area: str, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                limit: Optional[int] = None) -> List[dict]:
+        where, params = _filters(area=area, year_from=year_from, year_to=year_to)
+        return self._query(f"SELECT area, year, {', '.join(CLIMATE_COLS)} FROM climate WHERE {where} "
+                           f"ORDER BY year LIMIT ?", params + [self._limit(limit)])
+
+    def _limit(self, limit: Optional[int]) -> int:
+        return min(limit or self.max_rows, self.max_rows)
+
+    def stats(self) -> dict:
+        return {"db_path": str(self.db_path), "ready": self._checked, "queries": self.queries}
+
+
+def _filters(*, area=None, item=None, year_from=None, year_to=None, prefix: str = ""):
+    clauses, params = [], []
+    for col, value in (("area", area), ("item", item)):
+        if value is not None:
+            clauses.append(f"{prefix}{col} = ?")
+            params.append(str(value).strip().lower())
+    if year_from is not None:
+        clauses.append(f"{prefix}year >= ?")
+        params.append(int(year_from))
+    if year_to is not None:
+        clauses.append(f"{prefix}year <= ?")
+        params.append(int(year_to))
+    return " AND ".join(clauses) or "1", params
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Construit la base SQLite de l'historique (inputs/raw/*.csv).")
+    parser.add_argument("--db", type=Path,
+                        default=Path(os.getenv("HISTORY_DB", BASE_DIR.parent / "cache" / "history.sqlite")))
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts = build(args.db, args.raw_dir)
+    print(f"✅ {args.db} : {counts['yields']} rendements, {counts['climate']} lignes climat "
+          f"({time.perf_counter() - start:.1f} s, {args.db.stat().st_size / 1e6:.1f} Mo)")
+
+    store = HistoryStore(args.db, args.raw_dir)
+    for label, fn in (("pays + culture + années", lambda: store.yields("india", "maize", 1990, 2013)),
+                      ("culture, une année", lambda: store.yields(item="wheat", year_from=2010, year_to=2010)),
+                      ("climat d'un pays", lambda: store.climate("india", 1990, 2013))):
+        fn()
+        n, t0 = 1000, time.perf_counter()
+        for _ in range(n):
+            rows = fn()
+        print(f"  {label:<24} {len(rows):>4} lignes  {(time.perf_counter() - t0) / n * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+#api/jobs.py
+"""
+Jobs de scoring par lots (millions de scénarios), hors du cycle requête / réponse.
+
+- Soumission : `POST /jobs` avec le fichier en corps brut (CSV, JSONL ou
+  Parquet selon le Content-Type ou `?format=`), ou un JSON
+  {"path": ...} désignant un fichier déjà présent sous JOBS_INPUT_ROOT.
+  Le fichier est copié par blocs sur disque ; la réponse (202) donne l'id du job.
+- État : une table SQLite (JOBS_DIR/jobs.sqlite, mode WAL). Les workers
+  réclament les jobs en file par un UPDATE atomique : plusieurs processus
+  (workers de api.serve, `python -m api.jobs`) peuvent se partager la file.
+- Traitement : chaque worker lit l'entrée par blocs de `chunk_rows` lignes,
+  les score en un seul appel (scripts/predictor.py:predict_frame) et ajoute le
+  résultat au fichier de sortie (CSV ou Parquet) ; l'avancement et le débit
+  sont mis à jour après chaque bloc.
+- Résultat : `GET /jobs/{id}/result` renvoie le fichier en streaming.
+
+Parquet nécessite pyarrow (optionnel) ; sans lui, seuls CSV et JSONL sont acceptés.
+Un job interrompu (arrêt du processus) est remis en file et repris du début.
+Chaque job 'running' porte un bail (`heartbeat_at`) renouvelé par le runner qui le
+traite ; un job dont le bail a expiré (processus tué, machine perdue) est remis en file
+par n'importe quel runner, sans dépendre des pid (recyclés, invisibles d'un conteneur à l'autre).
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Set
+
+import pandas as pd
+
+try:  # Parquet optionnel
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    PARQUET_AVAILABLE = False
+
+BASE_DIR = Path(__file__).resolve().parent
+
+INPUT_FORMATS = ("csv", "jsonl", "parquet")
+OUTPUT_FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    input_format TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    result_path TEXT,
+    total_rows INTEGER,
+    processed_rows INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_pid INTEGER,
+    heartbeat_at REAL,
+    owns_input INTEGER NOT NULL DEFAULT 1,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobError(ValueError):
+    """Soumission invalide (format, chemin, dépendance manquante)."""
+
+
+def check_format(fmt: str, allowed=INPUT_FORMATS) -> str:
+    fmt = (fmt or "").lower()
+    if fmt not in allowed:
+        raise JobError(f"Unsupported format {fmt!r}. Available: {list(allowed)}")
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        raise JobError("Parquet requires pyarrow (pip install pyarrow).")
+    return fmt
+
+
+# ========================================================
+# Lecture par blocs / écriture incrémentale
+# ========================================================
+def count_rows(path: Path, fmt: str) -> int:
+    """Nombre de lignes de données (approximatif si un champ CSV contient un saut de ligne)."""
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    n, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            n += block.count(b"\n")
+            last = block[-1:]
+    n += last != b"\n"
+    return max(0, n - (fmt == "csv"))
+
+
+def iter_chunks(path: Path, fmt: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={"area": str, "item": str})
+    elif fmt == "jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows, dtype={"area": str, "item": str})
+    else:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+
+
+class ResultWriter:
+    """Ajout bloc par bloc au fichier de résultat (en-tête CSV / schéma Parquet au premier bloc)."""
+
+    def __init__(self, path: Path, fmt: str):
+        self.path, self.fmt = path, fmt
+        self._parquet = None
+        self._rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a" if self._rows else "w", header=not self._rows, index=False)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        self._rows += len(df)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        elif not self._rows and self.fmt == "csv":
+            self.path.write_text("")
+
+
+# ========================================================
+# État des jobs (SQLite)
+# ========================================================
+class JobStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "jobs.sqlite"
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:  # base créée avant les baux
+                db.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _execute(self, sql: str, params=()) -> List[sqlite3.Row]:
+        db = self._connect()
+        try:
+            return db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def new_input_path(self, job_id: str, fmt: str) -> Path:
+        return self.root / f"{job_id}.input.{fmt}"
+
+    def create(self, job_id: str, input_path: Path, input_format: str, output_format: str,
+               owns_input: bool = True) -> dict:
+        self._execute(
+            "INSERT INTO jobs (id, status, input_path, input_format, output_format, result_path, created_at, owns_input)"
+            " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, str(input_path), input_format, output_format,
+             str(self.root / f"{job_id}.result.{output_format}"), time.time(), int(owns_input)))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def claim(self) -> Optional[dict]:
+        """Passe le plus ancien job en file à 'running' pour ce processus (atomique entre processus)."""
+        now = time.time()
+        rows = self._execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, worker_pid = ?, processed_rows = 0"
+            " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)"
+            " AND status = 'queued' RETURNING *",
+            (now, now, os.getpid()))
+        return dict(rows[0]) if rows else None
+
+    def update(self, job_id: str, **fields) -> None:
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def progress(self, job_id: str, processed_rows: int) -> bool:
+        """Enregistre l'avancement ; False si le job a été annulé entre-temps."""
+        rows = self._execute("UPDATE jobs SET processed_rows = ?, heartbeat_at = ? WHERE id = ? AND status = 'running'"
+                             " RETURNING id", (processed_rows, time.time(), job_id))
+        return bool(rows)
+
+    def heartbeat(self, job_ids) -> None:
+        """Renouvelle le bail des jobs 'running' traités par ce runner."""
+        job_ids = list(job_ids)
+        if job_ids:
+            marks = ", ".join("?" * len(job_ids))
+            self._execute(f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND id IN ({marks})",
+                          (time.time(), *job_ids))
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        self._execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                      (time.time(), job_id))
+        return self.get(job_id)
+
+    def delete(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        paths = [job["result_path"]] + ([job["input_path"]] if job["owns_input"] else [])
+        for path in paths:
+            if path:
+                Path(path).unlink(missing_ok=True)
+
+    def requeue_orphans(self, lease_s: float) -> int:
+        """Remet en file les jobs 'running' dont le bail n'a pas été renouvelé depuis `lease_s` secondes."""
+        rows = self._execute(
+            "UPDATE jobs SET status = 'queued', processed_rows = 0, heartbeat_at = NULL"
+            " WHERE status = 'running' AND COALESCE(heartbeat_at, started_at, 0) < ? RETURNING id",
+            (time.time() - lease_s,))
+        return len(rows)
+
+    def purge(self, older_than_s: float) -> int:
+        """Supprime les jobs terminés depuis plus de `older_than_s` secondes (et leurs fichiers)."""
+        old = self._execute("SELECT id FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+                            (time.time() - older_than_s,))
+        for row in old:
+            self.delete(row["id"])
+        return len(old)
+
+
+def describe(job: dict) -> dict:
+    """Vue publique d'un job : avancement, débit (lignes/s) et temps restant estimé."""
+    now = job["finished_at"] or time.time()
+    elapsed = now - job["started_at"] if job["started_at"] else 0.0
+    processed, total = job["processed_rows"], job["total_rows"]
+    rate = processed / elapsed if elapsed > 0 else None
+    eta = (total - processed) / rate if rate and total is not None and job["status"] == "running" else None
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "input_format": job["input_format"],
+        "output_format": job["output_format"],
+        "total_rows": total,
+        "processed_rows": processed,
+        "progress": round(processed / total, 4) if total else (1.0 if job["status"] == "done" else 0.0),
+        "rows_per_s": round(rate, 1) if rate is not None else None,
+        "elapsed_s": round(elapsed, 3),
+        "eta_s": round(max(eta, 0.0), 1) if eta is not None else None,
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "result_url": f"/jobs/{job['id']}/result" if job["status"] == "done" else None,
+    }
+
+
+# ========================================================
+# Workers
+# ========================================================
+def score_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes d'entrée + rendement prédit (scripts/predictor.py:predict_frame)."""
+    from scripts.predictor import model, predict_frame
+
+    preds = predict_frame(model, df)
+    return df.assign(pred_yield_hg_ha=preds, pred_yield_t_ha=preds / 10_000)
+
+
+class JobRunner:
+    """Pool de threads qui vident la file des jobs ; `process_next()` traite un job de manière synchrone.
+
+    Un thread supplémentaire renouvelle toutes les `lease_s / 3` secondes le bail des jobs en
+    cours, de sorte qu'un bloc long ne fasse pas expirer le bail ; les jobs dont le bail a expiré
+    (runner disparu) sont remis en file au démarrage puis périodiquement quand la file est vide.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 1, chunk_rows: int = 50_000,
+                 poll_interval: float = 1.0, retention_s: float = 72 * 3600, lease_s: float = 60.0,
+                 score: Callable[[pd.DataFrame], pd.DataFrame] = score_chunk):
+        self.store = store
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.poll_interval = poll_interval
+        self.retention_s = retention_s
+        self.lease_s = lease_s
+        self.score = score
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Set[str] = set()
+        self._active_lock = threading.Lock()
+        self._last_purge = 0.0
+        self._last_requeue = 0.0
+
+    def start(self) -> None:
+        if self.workers <= 0 or self._threads:
+            return
+        self.store.requeue_orphans(self.lease_s)
+        self._last_requeue = time.time()
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopping.wait(self.lease_s / 3):
+            with self._active_lock:
+                active = list(self._active)
+            self.store.heartbeat(active)
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            if self.process_next():
+                continue
+            if time.time() - self._last_requeue > self.lease_s:
+                self._last_requeue = time.time()
+                if self.store.requeue_orphans(self.lease_s):
+                    continue
+            if time.time() - self._last_purge > 600:
+                self._last_purge = time.time()
+                self.store.purge(self.retention_s)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def process_next(self) -> Optional[str]:
+        """Traite le prochain job en file ; retourne son id, ou None si la file est vide."""
+        job = self.store.claim()
+        if job is None:
+            return None
+        job_id = job["id"]
+        with self._active_lock:
+            self._active.add(job_id)
+        try:
+            return self._process(job)
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def _process(self, job: dict) -> str:
+        job_id, result_path = job["id"], Path(job["result_path"])
+        outcome = "done"
+        try:
+            input_path = Path(job["input_path"])
+            self.store.update(job_id, total_rows=count_rows(input_path, job["input_format"]))
+            writer = ResultWriter(result_path, job["output_format"])
+            processed = 0
+            try:
+                for chunk in iter_chunks(input_path, job["input_format"], self.chunk_rows):
+                    if self._stopping.is_set():
+                        outcome = "interrupted"
+                        break
+                    writer.write(self.score(chunk))
+                    processed += len(chunk)
+                    if not self.store.progress(job_id, processed):
+                        outcome = "cancelled"
+                        break
+            finally:
+                writer.close()
+        except Exception as e:
+            self.store.update(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+            result_path.unlink(missing_ok=True)
+            return job_id
+
+        if outcome == "done":
+            self.store.update(job_id, status="done", total_rows=processed, finished_at=time.time())
+        else:
+            result_path.unlink(missing_ok=True)
+            if outcome == "interrupted":  # repris du début par le prochain worker
+                self.store.update(job_id, status="queued", processed_rows=0)
+        return job_id
+
+
+def main(argv=None) -> None:
+    """Worker dédié, hors API : python -m api.jobs --workers 2"""
+    parser = argparse.ArgumentParser(description="Traite la file des jobs de scoring (SQLite partagée avec l'API).")
+    parser.add_argument("--jobs-dir", type=Path, default=Path(os.getenv("JOBS_DIR", BASE_DIR.parent / "jobs")))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-rows", type=int, default=int(os.getenv("JOBS_CHUNK_ROWS", "50000")))
+    parser.add_argument("--lease-s", type=float, default=float(os.getenv("JOBS_LEASE_S", "60")))
+    args = parser.parse_args(argv)
+
+    runner = JobRunner(JobStore(args.jobs_dir), workers=args.workers, chunk_rows=args.chunk_rows,
+                       lease_s=args.lease_s)
+    runner.start()
+    print(f"✅ {args.workers} worker(s) sur {args.jobs_dir} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#api/local_backend.py
+"""
+Moteur en processus pour l'interface Streamlit (déploiement sur une seule machine).
+
+Au lieu d'un POST HTTP vers api/main.py (sérialisation JSON, aller-retour
+réseau, désérialisation), l'interface appelle directement
+scripts/predictor.py. Le modèle est chargé à l'import du module, une seule fois
+par processus Streamlit (get_local_backend est en st.cache_resource).
+
+`call(endpoint, payload)` a la même signature de retour que api_post côté
+interface, (code HTTP, corps). Les payloads sont validés avec les schémas
+Pydantic de l'API (api/schemas.py) : mêmes bornes, mêmes 422, et mêmes formes
+de résultat que l'API. L'interface ne distingue pas les deux modes.
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import pandas as pd
+from pydantic import BaseModel, ValidationError
+
+from api.schemas import (PredictBatchRequest, PredictRequest, RecommendRevenueRequest, RecommendRow,
+                         RecommendYieldRequest)
+from scripts.predictor import (
+    MODEL_VERSION,
+    model,
+    predict_frame,
+    predict_yield_hg_ha,
+    predict_yield_quantiles_hg_ha,
+    quantile_label,
+    quantile_models,
+    recommend_by_yield,
+    recommend_by_revenue,
+)
+from scripts.utils import compute_revenue_per_ha
+
+BASE_DIR = Path(__file__).resolve().parent
+CANDIDATE_ITEMS_PATH = BASE_DIR.parent / "inputs" / "candidate_items.json"
+CANDIDATE_ITEMS: List[str] = json.loads(CANDIDATE_ITEMS_PATH.read_text(encoding="utf-8"))
+
+# mêmes champs et même ordre que RecommendRow (frame_to_rows dans api/main.py)
+ROW_FIELDS = [f for f in RecommendRow.model_fields if f != "quantiles"]
+
+CLIMATE_KEYS = ("area", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp")
+
+
+class HTTPError(Exception):
+    """Équivalent local d'une HTTPException (code + détail)."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _rows(df: pd.DataFrame, quantiles: Optional[List[float]] = None) -> List[dict]:
+    n = len(df)
+    values = [df[c].to_numpy().tolist() if c in df.columns else [None] * n for c in ROW_FIELDS]
+    rows = [dict(zip(ROW_FIELDS, row)) for row in zip(*values)]
+    if quantiles:
+        labels = [quantile_label(q) for q in sorted(set(map(float, quantiles)))]
+        for r, qs in zip(rows, zip(*[df[label].to_numpy().tolist() for label in labels])):
+            r["quantiles"] = dict(zip(labels, qs))
+    return rows
+
+
+def _check_quantiles(quantiles: Optional[List[float]]) -> dict:
+    """Arguments quantiles des recommenders ; mêmes 400 / 503 que check_quantiles (api/main.py)."""
+    if not quantiles:
+        return {}
+    if not quantile_models:
+        raise HTTPError(503, "Quantile models not available. Run `python -m scripts.train_quantiles`.")
+    bad = [q for q in quantiles if float(q) not in quantile_models]
+    if bad:
+        raise HTTPError(400, f"Unsupported quantiles: {bad}. Available: {sorted(quantile_models)}")
+    return {"quantile_models": quantile_models, "quantiles": quantiles}
+
+
+def _climate(req: BaseModel) -> dict:
+    return {k: getattr(req, k) for k in CLIMATE_KEYS}
+
+
+def predict(req: PredictRequest) -> dict:
+    q_kwargs = _check_quantiles(req.quantiles)
+    q_preds = None
+    if q_kwargs:
+        pred_hg_ha, q_preds = predict_yield_quantiles_hg_ha(
+            model, q_kwargs["quantile_models"], item=req.item, quantiles=req.quantiles,
+            irrigation=req.irrigation, fertilizer=req.fertilizer, **_climate(req))
+    else:
+        pred_hg_ha = predict_yield_hg_ha(
+            model, item=req.item, irrigation=req.irrigation, fertilizer=req.fertilizer, **_climate(req))
+    pred_hg_ha = float(pred_hg_ha)
+    revenue = None
+    if req.price_value is not None:
+        revenue = float(compute_revenue_per_ha(pred_hg_ha, float(req.price_value), req.price_unit))
+    return {
+        "item": req.item,
+        "pred_yield_hg_ha": pred_hg_ha,
+        "pred_yield_t_ha": pred_hg_ha / 10000,
+        "revenue_per_ha": revenue,
+        "quantiles": q_preds,
+    }
+
+
+def predict_batch(req: PredictBatchRequest) -> dict:
+    preds = predict_frame(model, pd.DataFrame([r.model_dump() for r in req.rows]))
+    return {"pred_yield_hg_ha": preds.tolist(), "pred_yield_t_ha": (preds / 10000).tolist()}
+
+
+def recommend_yield(req: RecommendYieldRequest) -> dict:
+    q_kwargs = _check_quantiles(req.quantiles)
+    df_out = recommend_by_yield(
+        model,
+        candidate_items=CANDIDATE_ITEMS,
+        irrigation=req.irrigation,
+        fertilizer=req.fertilizer,
+        top_k=req.top_k,
+        **_climate(req),
+        **q_kwargs,
+    )
+    return {"results": _rows(df_out, req.quantiles)}
+
+
+def recommend_revenue(req: RecommendRevenueRequest) -> dict:
+    if not req.prices:
+        raise HTTPError(400, "prices must be a non-empty dict {item: price}")
+    q_kwargs = _check_quantiles(req.quantiles)
+    bad = [k for k, v in req.prices.items() if v is None or float(v) <= 0]
+    if bad:
+        raise HTTPError(400, f"All prices must be > 0. Invalid items: {bad}")
+    df_out = recommend_by_revenue(
+        model,
+        candidate_items=CANDIDATE_ITEMS,
+        prices=req.prices,
+        price_unit=req.price_unit,
+        irrigation=req.irrigation,
+        fertilizer=req.fertilizer,
+        top_k=req.top_k,
+        **_climate(req),
+        **q_kwargs,
+    )
+    return {"results": _rows(df_out, req.quantiles)}
+
+
+ROUTES: Dict[str, Tuple[Type[BaseModel], Callable[[BaseModel], dict]]] = {
+    "/predict": (PredictRequest, predict),
+    "/predict/batch": (PredictBatchRequest, predict_batch),
+    "/recommend/yield": (RecommendYieldRequest, recommend_yield),
+    "/recommend/revenue": (RecommendRevenueRequest, recommend_revenue),
+}
+
+
+def validation_detail(e: ValidationError) -> List[dict]:
+    """Erreurs Pydantic au format des 422 de FastAPI (loc préfixée par "body")."""
+    return [{**err, "loc": ["body", *err["loc"]]} for err in json.loads(e.json(include_url=False))]
+
+
+def call(endpoint: str, payload: dict) -> Tuple[int, dict]:
+    """(code, corps) comme l'API : 200, 400 / 503 (HTTPError), 404 (route inconnue), 422 (validation) ou 500."""
+    route = ROUTES.get(endpoint)
+    if route is None:
+        return 404, {"detail": "Not Found"}
+    schema, handler = route
+    try:
+        req = schema.model_validate(payload)
+    except ValidationError as e:
+        return 422, {"detail": validation_detail(e)}
+    try:
+        return 200, handler(req)
+    except HTTPError as e:
+        return e.status_code, {"detail": e.detail}
+    except Exception as e:
+        return 500, {"detail": str(e)}
+
+
+def health() -> dict:
+    return {"status": "ok", "backend": "local", "model_version": MODEL_VERSION}
@@ -1,20 +1,72 @@
 from __future__ import annotations
+import asyncio
+import hashlib
 import json
-from typing import Dict, List, Optional, Literal
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple, get_args
 import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+
+try:  # orjson : sérialisation JSON native (numpy compris), bien plus rapide que json
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+
+    def json_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+except ImportError:  # pragma: no cover - repli sur le json standard
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
+    def json_line(obj) -> bytes:
+        return (json.dumps(obj) + "\n").encode()
 
 import sys
 from pathlib import Path
 
 from scripts.predictor import (
+    MODEL_VERSION,
+    AREA_FALLBACK,
+    AREA_INDEX_PATH,
+    AREA_NEIGHBORS_K,
+    PREDICTOR_ENGINE,
+    QUANTILE_MODELS_PATH,
+    RECOMMEND_FAST_PATH,
     model,
+    get_area_neighbors,
+    quantile_manifest,
+    quantile_models,
+    quantile_label,
     predict_yield_hg_ha,
+    predict_yield_quantiles_hg_ha,
+    predict_frame,
     recommend_by_yield,
     recommend_by_revenue,
+    optimize_practices,
+    climate_trajectory,
+    forecast_horizon,
 )
 from scripts.utils import compute_revenue_per_ha
+from scripts.practice_effects import PRACTICE_EFFECTS_PATH
+from scripts.explain import explain_prediction
+from api.schemas import (
+    PredictRequest, PredictResponse, PredictBatchRequest, PredictBatchResponse, ExplainResponse,
+    RecommendYieldRequest, RecommendRevenueRequest, RecommendRow, RecommendResponse, PlanRequest,
+    HorizonRequest, HorizonResponse, JobPathRequest, PlanRow, PlanResponse, PriceUnit, MAX_HORIZON_YEARS)
+from api.prediction_logger import PredictionLogger
+from api.drift_monitor import DriftMonitor
+from api.response_cache import ResponseCache, ResponseCacheMiddleware
+from api.rate_limit import (FairQueueMiddleware, FairScheduler, RateLimitMiddleware, TokenBucketLimiter,
+                            parse_rate, parse_rules)
+from api.warmup import Warmup, is_warming
+from api.history import HistoryStore
+from api.jobs import (CONTENT_TYPE_FORMATS, MEDIA_TYPES, OUTPUT_FORMATS, JobError, JobRunner, JobStore,
+                      check_format, describe)
 
 
 # ---------------------------------------------------------
@@ -39,126 +91,231 @@ CANDIDATE_ITEMS = load_candidate_items()
 
 
 # ---------------------------------------------------------
-# Pydantic schemas
-# ---------------------------------------------------------
-
-PriceUnit = Literal["eur_per_t", "eur_per_kg", "eur_per_hg"]
-
-class PredictRequest(BaseModel):
-    area: str = Field(..., description="Nom du pays")
-    item: str = Field(..., description="Type de culture")
-    year: int =  Field(..., ge=1900, le=2100, description="Année")
-    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes en mm")
-    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides en tonnes")
-    avg_temp: float = Field(..., description="Température moyenne en °C")
-    irrigation: bool = Field(default=False, description="Usage de l'irrigation")
-    fertilizer: bool = Field(default=False, description="Usage de la fertilisation")
-    # Prix facultatif (pour calculer le revenu)
-    price_value: Optional[float] = Field(default=None, description="Prix par culture (optionnel)")
-    price_unit: PriceUnit = Field(default="eur_per_t", description="Unité de prix")
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "area": "France",
-                "item": "maize",
-                "year": 2026,
-                "avg_rain_mm": 650.0,
-                "pesticides_tonnes": 5000.0,
-                "avg_temp": 12.5,
-                "irrigation": False,
-                "fertilizer": False,
-                "price_value": 0,
-                "price_unit": "eur_per_t"
-                
-            }
-        }
+# Sérialisation rapide des résultats
+# ---------------------------------------------------------
+# Les routes chaudes renvoient directement une FastJSONResponse : FastAPI ne
+# revalide pas la réponse (response_model ne sert plus qu'à la doc OpenAPI)
+# et les lignes sont construites colonne par colonne, sans iterrows ni
+# objets Pydantic intermédiaires.
+
+ROW_FIELDS = [f for f in RecommendRow.model_fields if f != "quantiles"]
+PLAN_FIELDS = list(PlanRow.model_fields)
+
+
+def frame_to_rows(df: pd.DataFrame, columns: List[str] = ROW_FIELDS,
+                  quantiles: Optional[List[float]] = None) -> List[dict]:
+    """
+    Convertit un DataFrame de résultats en liste de dicts JSON-sérialisables.
+    Les colonnes absentes du DataFrame valent None (même forme que RecommendRow),
+    les colonnes quantiles ('p10', ...) sont regroupées dans 'quantiles'.
+    """
+    n = len(df)
+    values = [df[c].to_numpy().tolist() if c in df.columns else [None] * n for c in columns]
+    rows = [dict(zip(columns, row)) for row in zip(*values)]
+    if quantiles:
+        labels = [quantile_label(q) for q in sorted(set(map(float, quantiles)))]
+        q_values = [df[label].to_numpy().tolist() for label in labels]
+        for r, qs in zip(rows, zip(*q_values)):
+            r["quantiles"] = dict(zip(labels, qs))
+    return rows
+
+
+def check_quantiles(quantiles: Optional[List[float]]) -> None:
+    """400 si un quantile demandé n'a pas de modèle, 503 si aucune variante n'est entraînée."""
+    if not quantiles:
+        return
+    if not quantile_models:
+        raise HTTPException(status_code=503, detail="Quantile models not available. Run `python -m scripts.train_quantiles`.")
+    bad = [q for q in quantiles if float(q) not in quantile_models]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Unsupported quantiles: {bad}. Available: {sorted(quantile_models)}")
+
+
+def _quantile_kwargs(quantiles: Optional[List[float]]) -> dict:
+    # arguments supplémentaires des recommenders, seulement si des quantiles sont demandés
+    if not quantiles:
+        return {}
+    return {"quantile_models": quantile_models, "quantiles": quantiles}
 
-class PredictResponse(BaseModel):
-    item: str
-    pred_yield_hg_ha: float
-    pred_yield_t_ha: float
-    revenue_per_ha: Optional[float] = None
-
-
-class RecommendBaseRequest(BaseModel):
-    area: str = Field(..., description="Nom du pays")
-    year: int =  Field(..., ge=1900, le=2100, description="Année")
-    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes en mm")
-    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides en tonnes")
-    avg_temp: float = Field(..., description="Température moyenne en °C")
-    irrigation: bool = Field(default=False, description="Usage de l'irrigation")
-    fertilizer: bool = Field(default=False, description="Usage de la fertilisation")
-    top_k: int = Field(default=5, ge=1, le=20, description="Nombre de recommandations")
-    prices: Optional[dict] = Field(default=None, description="Prix par culture (optionnel)")
-    price_unit: str = Field(default="eur_per_t", description="Unité de prix")
-
-
-class RecommendYieldRequest(RecommendBaseRequest):
-    """Recommandation triée par rendement (pas besoin de prix)."""
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "area": "France",
-                "year": 2026,
-                "avg_rain_mm": 650.0,
-                "pesticides_tonnes": 5000.0,
-                "avg_temp": 15,
-                "irrigation": False,
-                "fertilizer": False,
-                "top_k": 5,
-                }
-            }
-    pass
 
+# ---------------------------------------------------------
+# Journal des prédictions (analyse de dérive)
+# ---------------------------------------------------------
+# Écriture asynchrone par lots (voir api/prediction_logger.py) : les handlers
+# ne font qu'un put_nowait dans une file bornée.
+PREDICTION_LOG_PATH = Path(os.getenv("PREDICTION_LOG_PATH", BASE_DIR.parent / "logs" / "predictions.jsonl"))
+
+prediction_logger = PredictionLogger(
+    PREDICTION_LOG_PATH,
+    max_queue=int(os.getenv("PREDICTION_LOG_MAX_QUEUE", "10000")),
+    flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_S", "1.0")),
+    max_bytes=int(os.getenv("PREDICTION_LOG_MAX_MB", "50")) * 1024 * 1024,
+    max_age_s=float(os.getenv("PREDICTION_LOG_MAX_AGE_H", "24")) * 3600,
+    backup_count=int(os.getenv("PREDICTION_LOG_BACKUPS", "30")),
+    enabled=os.getenv("PREDICTION_LOG_ENABLED", "1") != "0",
+)
+
+# Dérive des entrées vs données d'entraînement, mise à jour à chaque lot écrit
+# (hors du chemin des requêtes)
+TRAINING_DATA_PATH = BASE_DIR.parent / "inputs" / "processed" / "clean_data.csv"
 
-class RecommendRevenueRequest(RecommendBaseRequest):
-    """Recommandation triée par revenu (prix requis)."""
-    prices: Dict[str, float] = Field(
-        ...,
-        description="Dictionnaire {item: prix} saisi par l'agriculteur"
+drift_monitor: Optional[DriftMonitor] = None
+if os.getenv("DRIFT_MONITOR_ENABLED", "1") != "0" and TRAINING_DATA_PATH.exists():
+    drift_monitor = DriftMonitor.from_csv(
+        TRAINING_DATA_PATH,
+        half_life=float(os.getenv("DRIFT_HALF_LIFE", "10000")),
     )
-    price_unit: PriceUnit = Field(default="eur_per_t", description="Unité de prix")
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "area": "France",
-                "year": 2026,
-                "avg_rain_mm": 650.0,
-                "pesticides_tonnes": 5000.0,
-                "avg_temp": 15,
-                "irrigation": False,
-                "fertilizer": False,
-                "top_k": 5,
-                "price_unit": "eur_per_t",
-                "prices": {
-                    "maize": 0,
-                    "rice, paddy": 0,
-                    "wheat": 0,
-                    "cassava": 0,
-                    "sorghum": 0,
-                    "potatoes": 0,
-                    "soybeans":0,
-                    "yams": 0,
-                    "sweet potatoes": 0,
-                    "plantains and others": 0
-                    }
-                }
-            }
+    prediction_logger.subscribe(drift_monitor.update)
 
 
-class RecommendRow(BaseModel):
-    item: str
-    pred_yield_hg_ha: float
-    pred_yield_t_ha: float
-    revenue_per_ha: Optional[float] = None
-    price_value: Optional[float] = None
-    price_unit: Optional[str] = None
+def log_prediction(endpoint: str, req: BaseModel, output, t0: float, cache_hit: bool = False) -> None:
+    if is_warming():  # appels de préchauffage : ni journal ni dérive
+        return
+    prediction_logger.log({
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "model_version": MODEL_VERSION,
+        "latency_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "cache_hit": cache_hit,
+        "input": req.model_dump(),
+        "output": output,
+    })
 
 
-class RecommendResponse(BaseModel):
-    results: List[RecommendRow]
+# ---------------------------------------------------------
+# Cache des réponses (corps canonique + version de service)
+# ---------------------------------------------------------
+# Voir api/response_cache.py : LRU en mémoire, second niveau disque optionnel,
+# ETag / If-None-Match -> 304.
+RESPONSE_CACHE_PATHS = os.getenv(
+    "RESPONSE_CACHE_PATHS", "/predict,/explain,/recommend/yield,/recommend/revenue,/recommend/plan").split(",")
+
+
+# routes journalisées par leur handler : schéma de la requête, sortie journalée à partir du corps de la réponse
+CACHE_HIT_LOGGING: Dict[str, Tuple[type, Callable[[dict], object]]] = {
+    "/predict": (PredictRequest, lambda body: body),
+    "/recommend/yield": (RecommendYieldRequest, lambda body: body["results"]),
+    "/recommend/revenue": (RecommendRevenueRequest, lambda body: body["results"]),
+    "/recommend/plan": (PlanRequest, lambda body: body["results"]),
+}
+
+
+def log_cache_hit(path: str, request_body: bytes, response_body: bytes, t0: float) -> None:
+    """Hit du cache : journalisé (et vu par le moniteur de dérive) comme l'appel du handler qu'il remplace."""
+    spec = CACHE_HIT_LOGGING.get(path)
+    if spec is None or not prediction_logger.enabled:
+        return
+    schema, output = spec
+    log_prediction(path, schema.model_validate_json(request_body), output(json.loads(response_body)), t0,
+                   cache_hit=True)
+
+
+def serving_version() -> str:
+    """
+    Empreinte de tout ce qui détermine une réponse en cache : modèle, quantiles,
+    effets des pratiques, cultures candidates, index des voisins et variables
+    de service. Calculée une fois au démarrage (pas de rechargement à chaud).
+    """
+    h = hashlib.sha256(MODEL_VERSION.encode())
+    for path in (QUANTILE_MODELS_PATH, PRACTICE_EFFECTS_PATH, CANDIDATE_ITEMS_PATH, AREA_INDEX_PATH):
+        h.update(path.read_bytes() if path.exists() else b"missing")
+        h.update(b"\0")
+    settings = {"PREDICTOR_ENGINE": PREDICTOR_ENGINE, "RECOMMEND_FAST_PATH": RECOMMEND_FAST_PATH,
+                "AREA_FALLBACK": AREA_FALLBACK, "AREA_NEIGHBORS_K": AREA_NEIGHBORS_K}
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return f"{MODEL_VERSION}-{h.hexdigest()[:12]}"
+
+
+response_cache = ResponseCache(
+    serving_version(),
+    max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", "1024")),
+    disk_dir=os.getenv("RESPONSE_CACHE_DIR") or None,
+    disk_max_entries=int(os.getenv("RESPONSE_CACHE_DISK_ENTRIES", "100000")),
+    enabled=os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0",
+)
+
+
+# ---------------------------------------------------------
+# Limitation de débit + file équitable d'inférence
+# ---------------------------------------------------------
+# Voir api/rate_limit.py. Client = clé X-API-Key, sinon IP. État en mémoire,
+# propre à chaque worker de api/serve.py (limites à diviser par WEB_CONCURRENCY).
+# Règles "route=débit:rafale" (jetons/s) et "route=coût" ; '*' en fin = préfixe.
+# nombre de reverse proxies de confiance devant l'API (X-Forwarded-For lu depuis la droite)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# seules ces clés identifient un client ; une autre clé X-API-Key est ignorée (limite par IP)
+RATE_LIMIT_API_KEYS = frozenset(k.strip() for k in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if k.strip())
+
+rate_limiter = TokenBucketLimiter(
+    parse_rules(os.getenv(
+        "RATE_LIMITS",
+        "/predict=20:40,/predict/batch=2:10,/explain=10:20,/recommend/*=10:20,/forecast/*=5:10,/jobs=1:5"),
+        parse_rate),
+    max_buckets=int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000")),
+)
+
+FAIR_QUEUE_COSTS = parse_rules(os.getenv(
+    "FAIR_QUEUE_COSTS", "/predict=1,/predict/batch=10,/explain=2,/recommend/*=4,/forecast/*=4"))
+
+inference_scheduler = FairScheduler(
+    concurrency=int(os.getenv("INFERENCE_CONCURRENCY", "2")),
+    quantum=float(os.getenv("FAIR_QUEUE_QUANTUM", "4")),
+    max_queue_per_client=int(os.getenv("FAIR_QUEUE_MAX_PER_CLIENT", "64")),
+    # ex: "key:streamlit=4,ip:10.0.0.12=2" (poids 1 par défaut)
+    weights=dict(parse_rules(os.getenv("FAIR_QUEUE_WEIGHTS", ""))),
+)
+
+
+# ---------------------------------------------------------
+# Jobs de scoring par lots (état SQLite, workers locaux)
+# ---------------------------------------------------------
+JOBS_DIR = Path(os.getenv("JOBS_DIR", BASE_DIR.parent / "jobs"))
+# les jobs sur chemin serveur ne lisent que sous ce dossier
+JOBS_INPUT_ROOT = Path(os.getenv("JOBS_INPUT_ROOT", BASE_DIR.parent / "inputs")).resolve()
+JOBS_MAX_UPLOAD_BYTES = int(os.getenv("JOBS_MAX_UPLOAD_MB", "2048")) * 1024 * 1024
+
+# créés au démarrage (lifespan) ou à la première requête /jobs, pas à l'import :
+# importer api.main (tests, outils) ne crée ni JOBS_DIR ni la base SQLite
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs() -> Tuple[JobStore, JobRunner]:
+    global job_store, job_runner
+    with _jobs_lock:
+        if job_store is None:
+            job_store = JobStore(JOBS_DIR)
+        if job_runner is None:
+            job_runner = JobRunner(
+                job_store,
+                workers=int(os.getenv("JOBS_WORKERS", "1")),
+                chunk_rows=int(os.getenv("JOBS_CHUNK_ROWS", "50000")),
+                retention_s=float(os.getenv("JOBS_RETENTION_H", "72")) * 3600,
+                lease_s=float(os.getenv("JOBS_LEASE_S", "60")),
+            )
+        return job_store, job_runner
+
+
+# ---------------------------------------------------------
+# Historique des rendements (SQLite indexée, construite depuis inputs/raw/)
+# ---------------------------------------------------------
+history_store = HistoryStore(
+    Path(os.getenv("HISTORY_DB", BASE_DIR.parent / "cache" / "history.sqlite")),
+    max_rows=int(os.getenv("HISTORY_MAX_ROWS", "10000")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prediction_logger.start()
+    await warmup.start()
+    _, runner = get_jobs()
+    runner.start()
+    yield
+    await asyncio.to_thread(runner.stop)
+    await prediction_logger.stop()
+
 
 # ---------------------------------------------------------
 # FastAPI app
@@ -166,7 +323,20 @@ class RecommendResponse(BaseModel):
 app = FastAPI(
     title="Crop Yield PREDICTION API",
     version="1.0.0",
-    description="API de prédiction de rendement et recommandation de cultures à destinationd des agriculteurs")
+    description="API de prédiction de rendement et recommandation de cultures à destinationd des agriculteurs",
+    lifespan=lifespan)
+
+# le dernier middleware ajouté est le plus externe :
+# limitation de débit -> cache des réponses -> file équitable -> handlers
+app.add_middleware(FairQueueMiddleware, scheduler=inference_scheduler, costs=FAIR_QUEUE_COSTS,
+                   timeout=float(os.getenv("FAIR_QUEUE_TIMEOUT_S", "30")),
+                   trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES, api_keys=RATE_LIMIT_API_KEYS,
+                   enabled=os.getenv("FAIR_QUEUE_ENABLED", "1") != "0")
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache,
+                   paths=[p.strip() for p in RESPONSE_CACHE_PATHS if p.strip()], on_hit=log_cache_hit)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES,
+                   api_keys=RATE_LIMIT_API_KEYS,
+                   enabled=os.getenv("RATE_LIMIT_ENABLED", "1") != "0")
 
 # ---------------------------------------------------------
 # GET / Endpoint santé : 
@@ -175,8 +345,37 @@ app = FastAPI(
 @app.get("/health")
 def health():
     return {"status": "running",
+            "ready": warmup.ready,
             "message": "Agricultural Yield Prediction API",
-            "endpoints": ["/predict", "/recommend", "/docs"]}
+            # couverture [P10, P90] mesurée sur les années de test par scripts/train_quantiles.py
+            "quantile_coverage": quantile_manifest.get("test_coverage"),
+            "endpoints": ["/predict", "/predict/batch", "/recommend", "/recommend/plan", "/forecast/horizon", "/explain", "/jobs", "/history", "/metrics", "/docs"]}
+
+# ---------------------------------------------------------
+# GET /ready : 503 tant que le préchauffage n'est pas terminé
+# ---------------------------------------------------------
+
+@app.get("/ready")
+def ready():
+    if not warmup.ready:
+        return FastJSONResponse({"ready": False, "warmup": warmup.state}, status_code=503)
+    return {"ready": True, "warmup": warmup.state}
+
+# ---------------------------------------------------------
+# GET /metrics
+# ---------------------------------------------------------
+
+@app.get("/metrics")
+def metrics():
+    return {"model_version": MODEL_VERSION,
+            "prediction_log": prediction_logger.stats(),
+            "drift": drift_monitor.scores() if drift_monitor is not None else None,
+            "response_cache": response_cache.stats(),
+            "rate_limit": rate_limiter.stats(),
+            "inference_queue": inference_scheduler.stats(),
+            "area_fallback": get_area_neighbors(model).stats() if AREA_FALLBACK else None,
+            "history": history_store.stats(),
+            "warmup": warmup.stats()}
 
 # ---------------------------------------------------------
 # POST /predict
@@ -184,30 +383,95 @@ def health():
 
 @app.post("/predict", response_model=PredictResponse)
 def predict(req: PredictRequest):
+    t0 = time.perf_counter()
     try:
-        pred_hg_ha = predict_yield_hg_ha(
-            model,
-            area=req.area,
-            item=req.item,
-            year=req.year,
-            avg_rain_mm=req.avg_rain_mm,
-            pesticides_tonnes=req.pesticides_tonnes,
-            avg_temp=req.avg_temp,
-            irrigation=req.irrigation,
-            fertilizer=req.fertilizer
-        )
+        check_quantiles(req.quantiles)
+        q_preds = None
+        if req.quantiles:
+            pred_hg_ha, q_preds = predict_yield_quantiles_hg_ha(
+                model,
+                quantile_models,
+                area=req.area,
+                item=req.item,
+                year=req.year,
+                avg_rain_mm=req.avg_rain_mm,
+                pesticides_tonnes=req.pesticides_tonnes,
+                avg_temp=req.avg_temp,
+                quantiles=req.quantiles,
+                irrigation=req.irrigation,
+                fertilizer=req.fertilizer
+            )
+        else:
+            pred_hg_ha = predict_yield_hg_ha(
+                model,
+                area=req.area,
+                item=req.item,
+                year=req.year,
+                avg_rain_mm=req.avg_rain_mm,
+                pesticides_tonnes=req.pesticides_tonnes,
+                avg_temp=req.avg_temp,
+                irrigation=req.irrigation,
+                fertilizer=req.fertilizer
+            )
         resp = {
             "item" : req.item,
             "pred_yield_hg_ha": float(pred_hg_ha),
             "pred_yield_t_ha": float(pred_hg_ha) / 10000,
-            "revenue_per_ha": None
+            "revenue_per_ha": None,
+            "quantiles": q_preds
         }
 
         if req.price_value is not None:
             revenue = compute_revenue_per_ha(float(pred_hg_ha), float(req.price_value), req.price_unit)
             resp["revenue_per_ha"] = float(revenue)
 
-        return resp
+        log_prediction("/predict", req, resp, t0)
+        return FastJSONResponse(resp)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------------------------------------
+# POST /predict/batch
+# ---------------------------------------------------------
+
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+def predict_batch(req: PredictBatchRequest):
+    """
+    Rendement de chaque ligne, dans l'ordre des lignes (réponse en colonnes).
+    Les lots ne sont pas journalisés : ils viennent de fichiers, pas de saisies.
+    """
+    try:
+        preds = predict_frame(model, pd.DataFrame([r.model_dump() for r in req.rows]))
+        return FastJSONResponse({"pred_yield_hg_ha": preds.tolist(), "pred_yield_t_ha": (preds / 10000).tolist()})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------------------------------------
+# POST /explain
+# ---------------------------------------------------------
+
+@app.post("/explain", response_model=ExplainResponse)
+def explain(req: PredictRequest):
+    """
+    Contributions par variable d'une prédiction (chemins d'arbres du HGB) :
+    base_value + somme(contributions) + scenario_adjustment = pred_yield_hg_ha.
+    """
+    try:
+        resp = explain_prediction(
+            model,
+            area=req.area,
+            item=req.item,
+            year=req.year,
+            avg_rain_mm=req.avg_rain_mm,
+            pesticides_tonnes=req.pesticides_tonnes,
+            avg_temp=req.avg_temp,
+            irrigation=req.irrigation,
+            fertilizer=req.fertilizer
+        )
+        return FastJSONResponse(resp)
 
     except HTTPException:
         raise
@@ -220,7 +484,9 @@ def predict(req: PredictRequest):
 
 @app.post("/recommend/yield", response_model=RecommendResponse)
 def recommend_yield(req: RecommendYieldRequest):
+    t0 = time.perf_counter()
     try:
+        check_quantiles(req.quantiles)
         df_out = recommend_by_yield(
             model,
             area=req.area,
@@ -231,18 +497,13 @@ def recommend_yield(req: RecommendYieldRequest):
             candidate_items=CANDIDATE_ITEMS,
             irrigation=req.irrigation,
             fertilizer=req.fertilizer,
-            top_k=req.top_k
+            top_k=req.top_k,
+            **_quantile_kwargs(req.quantiles)
         )
 
-        results = [
-            RecommendRow(
-                item=str(r["item"]),
-                pred_yield_hg_ha=float(r["pred_yield_hg_ha"]),
-                pred_yield_t_ha=float(r["pred_yield_t_ha"]),
-            )
-            for _, r in df_out.iterrows()
-        ]
-        return RecommendResponse(results=results)
+        rows = frame_to_rows(df_out, quantiles=req.quantiles)
+        log_prediction("/recommend/yield", req, rows, t0)
+        return FastJSONResponse({"results": rows})
 
     except HTTPException:
         raise
@@ -255,10 +516,13 @@ def recommend_yield(req: RecommendYieldRequest):
 # ---------------------------------------------------------
 @app.post("/recommend/revenue", response_model=RecommendResponse)
 def recommend_revenue(req: RecommendRevenueRequest):
+    t0 = time.perf_counter()
     try:
         if not req.prices:
             raise HTTPException(status_code=400, detail="prices must be a non-empty dict {item: price}")
 
+        check_quantiles(req.quantiles)
+
         # validation simple : prix > 0
         bad = [k for k, v in req.prices.items() if v is None or float(v) <= 0]
         if bad:
@@ -276,21 +540,138 @@ def recommend_revenue(req: RecommendRevenueRequest):
             price_unit=req.price_unit,
             irrigation=req.irrigation,
             fertilizer=req.fertilizer,
+            top_k=req.top_k,
+            **_quantile_kwargs(req.quantiles)
+        )
+
+        rows = frame_to_rows(df_out, quantiles=req.quantiles)
+        log_prediction("/recommend/revenue", req, rows, t0)
+        return FastJSONResponse({"results": rows})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ---------------------------------------------------------
+# POST /recommend/plan
+# ---------------------------------------------------------
+@app.post("/recommend/plan", response_model=PlanResponse)
+def recommend_plan(req: PlanRequest):
+    """
+    Compare en un appel toutes les combinaisons culture x {irrigation, fertilisation}
+    (une seule prédiction par culture) et renvoie les plans au meilleur revenu net.
+    """
+    t0 = time.perf_counter()
+    try:
+        if not req.prices:
+            raise HTTPException(status_code=400, detail="prices must be a non-empty dict {item: price}")
+
+        bad = [k for k, v in req.prices.items() if v is None or float(v) <= 0]
+        if bad:
+            raise HTTPException(status_code=400, detail=f"All prices must be > 0. Invalid items: {bad}")
+
+        df_out = optimize_practices(
+            model,
+            area=req.area,
+            year=req.year,
+            avg_rain_mm=req.avg_rain_mm,
+            pesticides_tonnes=req.pesticides_tonnes,
+            avg_temp=req.avg_temp,
+            candidate_items=CANDIDATE_ITEMS,
+            prices=req.prices,
+            price_unit=req.price_unit,
+            irrigation_cost=req.irrigation_cost_per_ha,
+            fertilizer_cost=req.fertilizer_cost_per_ha,
+            budget=req.budget_per_ha,
             top_k=req.top_k
         )
 
-        results = [
-            RecommendRow(
-                item=str(r["item"]),
-                pred_yield_hg_ha=float(r["pred_yield_hg_ha"]),
-                pred_yield_t_ha=float(r["pred_yield_t_ha"]),
-                revenue_per_ha=float(r["revenue_per_ha"]),
-                price_value=float(r["price_value"]),
-                price_unit=str(r["price_unit"])
+        rows = frame_to_rows(df_out, columns=PLAN_FIELDS)
+        log_prediction("/recommend/plan", req, rows, t0)
+        return FastJSONResponse({"results": rows})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ---------------------------------------------------------
+# POST /forecast/horizon
+# ---------------------------------------------------------
+@app.post("/forecast/horizon", response_model=HorizonResponse)
+def forecast(req: HorizonRequest):
+    """
+    Rendement de chaque culture sur [start_year, end_year] : toutes les lignes
+    culture x année sont scorées en un seul appel, la réponse est en colonnes
+    (une liste par série). Avec stream=true : NDJSON, l'en-tête part tout de
+    suite puis chaque culture est scorée et envoyée à son tour (une ligne par
+    culture) ; une erreur en cours de flux donne une dernière ligne {"error": ...}.
+    """
+    t0 = time.perf_counter()
+    try:
+        if req.end_year < req.start_year:
+            raise HTTPException(status_code=400, detail="end_year must be >= start_year")
+        if req.end_year - req.start_year + 1 > MAX_HORIZON_YEARS:
+            raise HTTPException(status_code=400, detail=f"Horizon limited to {MAX_HORIZON_YEARS} years")
+        check_quantiles(req.quantiles)
+
+        years = np.arange(req.start_year, req.end_year + 1)
+        items = req.items or CANDIDATE_ITEMS
+        try:
+            climate = {
+                "avg_rain_mm": climate_trajectory(req.avg_rain_mm, years, req.rain_trend_per_year, req.avg_rain_mm_by_year),
+                "pesticides_tonnes": climate_trajectory(req.pesticides_tonnes, years, req.pesticides_trend_per_year, req.pesticides_tonnes_by_year),
+                "avg_temp": climate_trajectory(req.avg_temp, years, req.temp_trend_per_year, req.avg_temp_by_year),
+            }
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        header = {
+            "area": req.area,
+            "years": years.tolist(),
+            "climate": {k: v.tolist() for k, v in climate.items()},
+        }
+
+        def score(batch: List[str]) -> List[dict]:
+            preds, q_preds = forecast_horizon(
+                model,
+                area=req.area,
+                items=batch,
+                years=years,
+                irrigation=req.irrigation,
+                fertilizer=req.fertilizer,
+                **climate,
+                **_quantile_kwargs(req.quantiles)
             )
-            for _, r in df_out.iterrows()
-        ]
-        return RecommendResponse(results=results)
+            return [
+                {
+                    "item": it,
+                    "pred_yield_hg_ha": preds[i].tolist(),
+                    "quantiles": {label: v[i].tolist() for label, v in q_preds.items()} if q_preds else None,
+                }
+                for i, it in enumerate(batch)
+            ]
+
+        if req.stream:
+            def lines():
+                yield json_line(header)
+                series = []
+                try:
+                    for it in items:
+                        series += score([it])
+                        yield json_line(series[-1])
+                except Exception as e:  # statut 200 déjà envoyé : l'erreur termine le flux
+                    yield json_line({"error": str(e)})
+                    return
+                log_prediction("/forecast/horizon", req, series, t0)
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        series = score(items)
+        log_prediction("/forecast/horizon", req, series, t0)
+        return FastJSONResponse({**header, "series": series})
 
     except HTTPException:
         raise
@@ -298,3 +679,171 @@ def recommend_revenue(req: RecommendRevenueRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ---------------------------------------------------------
+# /jobs : scoring asynchrone de gros lots
+# ---------------------------------------------------------
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request,
+                     input_format: Optional[str] = Query(default=None, alias="format"),
+                     output_format: str = Query(default="csv")):
+    """
+    Soumet un lot de scénarios (colonnes area, item, year, avg_rain_mm,
+    pesticides_tonnes, avg_temp ; irrigation / fertilizer optionnelles) :
+    - corps brut CSV / JSONL / Parquet (Content-Type ou ?format=), copié par blocs ;
+    - ou JSON {"path": ...} vers un fichier sous JOBS_INPUT_ROOT.
+    Retourne l'id du job (202) ; suivi sur GET /jobs/{job_id}.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    job_store, job_runner = get_jobs()
+    job_id = job_store.new_id()
+    try:
+        if content_type == "application/json":
+            req = JobPathRequest.model_validate_json(await request.body())
+            path = (JOBS_INPUT_ROOT / req.path).resolve()
+            if not path.is_relative_to(JOBS_INPUT_ROOT):
+                raise HTTPException(status_code=403, detail="path must be inside the jobs input directory")
+            if not path.is_file():
+                raise HTTPException(status_code=404, detail=f"File not found: {req.path}")
+            fmt = check_format(req.format or path.suffix.lstrip("."))
+            job = job_store.create(job_id, path, fmt, check_format(req.output_format, OUTPUT_FORMATS),
+                                   owns_input=False)
+        else:
+            fmt = check_format(input_format or CONTENT_TYPE_FORMATS.get(content_type, ""))
+            out_fmt = check_format(output_format, OUTPUT_FORMATS)
+            input_path = job_store.new_input_path(job_id, fmt)
+            size = 0
+            try:
+                with open(input_path, "wb") as f:
+                    async for chunk in request.stream():
+                        size += len(chunk)
+                        if size > JOBS_MAX_UPLOAD_BYTES:
+                            raise HTTPException(status_code=413, detail=f"Upload larger than {JOBS_MAX_UPLOAD_BYTES} bytes")
+                        f.write(chunk)
+                if size == 0:
+                    raise HTTPException(status_code=400, detail="Empty upload")
+            except BaseException:
+                input_path.unlink(missing_ok=True)
+                raise
+            job = job_store.create(job_id, input_path, fmt, out_fmt)
+    except JobError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:  # corps JSON invalide
+        raise HTTPException(status_code=422, detail=str(e))
+
+    job_runner.notify()
+    return FastJSONResponse(describe(job), status_code=202)
+
+
+def _get_job(job_id: str) -> dict:
+    job = get_jobs()[0].get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Statut, avancement (lignes traitées / total), débit et temps restant estimé."""
+    return FastJSONResponse(describe(_get_job(job_id)))
+
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    """Fichier de résultat (entrée + pred_yield_hg_ha, pred_yield_t_ha), envoyé en streaming."""
+    job = _get_job(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, result not available")
+    fmt = job["output_format"]
+    return FileResponse(job["result_path"], media_type=MEDIA_TYPES[fmt], filename=f"{job_id}.{fmt}")
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Annule le job s'il est en cours puis supprime son état et ses fichiers."""
+    _get_job(job_id)
+    job_store, _ = get_jobs()
+    job_store.cancel(job_id)
+    job_store.delete(job_id)
+    return {"job_id": job_id, "deleted": True}
+
+
+# ---------------------------------------------------------
+# GET /history/* : rendements et climat observés (api/history.py)
+# ---------------------------------------------------------
+
+def _history(query: Callable[[], List[dict]]):
+    try:
+        rows = query()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (OSError, sqlite3.Error) as e:
+        raise HTTPException(status_code=503, detail=f"History store unavailable: {e}")
+    return FastJSONResponse({"count": len(rows), "rows": rows})
+
+
+@app.get("/history/yield")
+def history_yield(
+    area: Optional[str] = Query(None, description="Pays (insensible à la casse)"),
+    item: Optional[str] = Query(None, description="Culture (insensible à la casse)"),
+    year_from: Optional[int] = Query(None, ge=1900, le=2100),
+    year_to: Optional[int] = Query(None, ge=1900, le=2100),
+    climate: bool = Query(True, description="Ajoute pluie, pesticides et température de l'année"),
+    limit: Optional[int] = Query(None, ge=1, description="Nombre maximal de lignes (plafonné à HISTORY_MAX_ROWS)"),
+):
+    """Rendements historiques (hg/ha) par pays et / ou culture, sur une plage d'années."""
+    return _history(lambda: history_store.yields(area, item, year_from, year_to, climate=climate, limit=limit))
+
+
+@app.get("/history/climate")
+def history_climate(
+    area: str = Query(..., description="Pays (insensible à la casse)"),
+    year_from: Optional[int] = Query(None, ge=1900, le=2100),
+    year_to: Optional[int] = Query(None, ge=1900, le=2100),
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """Pluie, pesticides et température moyenne d'un pays, année par année."""
+    return _history(lambda: history_store.climate(area, year_from, year_to, limit=limit))
+
+
+# ---------------------------------------------------------
+# Préchauffage au démarrage (api/warmup.py)
+# ---------------------------------------------------------
+# Scénario représentatif passé par les handlers eux-mêmes (validation,
+# prédicteur, sérialisation), une fois par unité de prix pour les revenus.
+WARMUP_SCENARIO = {"area": "india", "year": 2020, "avg_rain_mm": 1083.0,
+                   "pesticides_tonnes": 2000.0, "avg_temp": 26.0}
+
+
+def warmup_calls() -> Dict[str, Callable[[], object]]:
+    item = CANDIDATE_ITEMS[0]
+    prices = {it: 150.0 for it in CANDIDATE_ITEMS}
+    calls: Dict[str, Callable[[], object]] = {
+        "/predict": lambda: predict(PredictRequest(item=item, **WARMUP_SCENARIO)),
+        "/recommend/yield": lambda: recommend_yield(RecommendYieldRequest(**WARMUP_SCENARIO)),
+        # construit la base de l'historique si besoin (CSV modifiés, premier démarrage)
+        "/history/yield": lambda: history_store.yields(WARMUP_SCENARIO["area"], item, 2000, 2013),
+    }
+    for unit in get_args(PriceUnit):
+        calls[f"/predict[{unit}]"] = lambda unit=unit: predict(
+            PredictRequest(item=item, price_value=150.0, price_unit=unit, **WARMUP_SCENARIO))
+        calls[f"/recommend/revenue[{unit}]"] = lambda unit=unit: recommend_revenue(
+            RecommendRevenueRequest(prices=prices, price_unit=unit, **WARMUP_SCENARIO))
+    calls["/recommend/plan"] = lambda: recommend_plan(PlanRequest(prices=prices, **WARMUP_SCENARIO))
+    if AREA_FALLBACK:
+        # charge (ou reconstruit) l'index des voisins ici plutôt qu'à la première requête d'un pays inconnu
+        unknown = {**WARMUP_SCENARIO, "area": "unknown area"}
+        calls["/predict[unknown area]"] = lambda: predict(PredictRequest(item=item, **unknown))
+        calls["/explain[unknown area]"] = lambda: explain(PredictRequest(item=item, **unknown))
+    if quantile_models:
+        levels = sorted(quantile_models)
+        calls["/predict[quantiles]"] = lambda: predict(PredictRequest(item=item, quantiles=levels, **WARMUP_SCENARIO))
+        calls["/recommend/yield[quantiles]"] = lambda: recommend_yield(
+            RecommendYieldRequest(quantiles=levels, **WARMUP_SCENARIO))
+    return calls
+
+
+warmup = Warmup(
+    warmup_calls(),
+    iterations=int(os.getenv("WARMUP_ITERATIONS", "3")),
+    mode=os.getenv("WARMUP_MODE", "blocking"),
+)
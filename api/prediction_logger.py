@@ -0,0 +1,219 @@
+#api/prediction_logger.py
+"""
+Journal des prédictions (JSONL) pour l'analyse de dérive.
+
+Les handlers n'écrivent jamais sur disque : `log()` dépose l'entrée dans une
+file bornée (put_nowait, thread-safe) et rend la main immédiatement. Une tâche
+de fond (`run()`, démarrée au lifespan de l'API) vide la file par lots et
+écrit chaque lot en un seul appel dans un thread (asyncio.to_thread).
+
+- Backpressure : si le disque est lent et que la file est pleine, l'entrée
+  est abandonnée et comptée dans `dropped` ; la requête n'est jamais bloquée.
+- Rotation : au-delà de `max_bytes` ou de `max_age_s`, le fichier courant est
+  renommé avec un horodatage puis compressé en .gz ; seuls les `backup_count`
+  derniers fichiers compressés sont conservés.
+- Abonnés : chaque lot écrit est aussi transmis aux callbacks enregistrés via
+  `subscribe()` (ex: moniteur de dérive), hors du chemin des requêtes. Une
+  exception d'un abonné n'interrompt ni l'écriture ni les autres abonnés :
+  elle est journalisée (logging, avec la trace) et comptée dans
+  `subscriber_errors`.
+
+Les compteurs sont modifiés depuis les threads des handlers (`log`) et depuis
+le thread d'écriture : ils sont protégés par un verrou.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+try:
+    import orjson
+
+    def _dumps(record: dict) -> bytes:
+        return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:  # pragma: no cover
+    def _dumps(record: dict) -> bytes:
+        return json.dumps(record, default=str).encode()
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogger:
+    def __init__(
+        self,
+        path: Path,
+        max_queue: int = 10_000,
+        batch_size: int = 1_000,
+        flush_interval: float = 1.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age_s: float = 24 * 3600,
+        backup_count: int = 30,
+        enabled: bool = True,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.backup_count = backup_count
+        self.enabled = enabled
+
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # compteurs ci-dessous
+        self._subscribers: List[Callable[[List[dict]], None]] = []
+        self._opened_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.subscriber_errors = 0
+
+    # ----------------------------------------------------
+    # Chemin des requêtes : O(1), jamais bloquant
+    # ----------------------------------------------------
+    def log(self, record: dict) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.logged += 1
+        return True
+
+    def subscribe(self, callback: Callable[[List[dict]], None]) -> None:
+        self._subscribers.append(callback)
+
+    # ----------------------------------------------------
+    # Tâche de fond
+    # ----------------------------------------------------
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            # un fichier par worker en mode multi-workers (api/serve.py)
+            worker_id = os.getenv("SERVE_WORKER_ID")
+            if worker_id is not None:
+                self.path = self.path.with_name(f"{self.path.stem}.w{worker_id}{self.path.suffix}")
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def flush(self) -> int:
+        """Vide la file par lots de `batch_size` ; retourne le nombre d'entrées écrites."""
+        total = 0
+        with self._write_lock:
+            while True:
+                batch = []
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not batch:
+                    break
+                self._write_batch(batch)
+                total += len(batch)
+                if len(batch) < self.batch_size:
+                    break
+        return total
+
+    def _write_batch(self, batch: List[dict]) -> None:
+        try:
+            self._maybe_rotate()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = b"\n".join(_dumps(r) for r in batch) + b"\n"
+            with open(self.path, "ab") as f:
+                f.write(data)
+            if self._opened_at is None:
+                self._opened_at = time.time()
+            with self._stats_lock:
+                self.written += len(batch)
+        except OSError:
+            logger.exception("Prediction log write failed (%d entries dropped)", len(batch))
+            with self._stats_lock:
+                self.write_errors += 1
+                self.dropped += len(batch)
+            return
+        for callback in self._subscribers:
+            try:
+                callback(batch)
+            except Exception:
+                logger.exception("Prediction log subscriber %r failed", callback)
+                with self._stats_lock:
+                    self.subscriber_errors += 1
+
+    # ----------------------------------------------------
+    # Rotation + compression
+    # ----------------------------------------------------
+    def _maybe_rotate(self) -> None:
+        if not self.path.exists():
+            self._opened_at = None
+            return
+        if self._opened_at is None:
+            self._opened_at = self.path.stat().st_mtime
+        too_big = self.path.stat().st_size >= self.max_bytes
+        too_old = time.time() - self._opened_at >= self.max_age_s
+        if too_big or too_old:
+            self.rotate()
+
+    def rotate(self) -> Optional[Path]:
+        if not self.path.exists():
+            return None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        rotated = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        os.replace(self.path, rotated)
+        self._opened_at = None
+        gz_path = rotated.with_name(rotated.name + ".gz")
+        with open(rotated, "rb") as src, gzip.open(gz_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+        with self._stats_lock:
+            self.rotations += 1
+
+        if self.backup_count > 0:
+            backups = sorted(self.path.parent.glob(f"{self.path.stem}-*{self.path.suffix}.gz"))
+            for old in backups[:-self.backup_count]:
+                old.unlink()
+        return gz_path
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "path": str(self.path),
+                "queued": self._queue.qsize(),
+                "logged": self.logged,
+                "written": self.written,
+                "dropped": self.dropped,
+                "rotations": self.rotations,
+                "write_errors": self.write_errors,
+                "subscriber_errors": self.subscriber_errors,
+            }
@@ -0,0 +1,292 @@
+#api/rate_limit.py
+"""
+Limitation de débit et ordonnancement équitable des requêtes d'inférence.
+
+Un seul client qui balaie des recommandations peut saturer le processus
+uvicorn et affamer les agriculteurs qui utilisent l'interface. Deux
+middlewares ASGI, sans stockage externe :
+
+- RateLimitMiddleware : un seau à jetons par (client, règle). Le client est
+  identifié par sa clé d'API (`X-API-Key`) si elle fait partie des clés
+  déclarées, sinon par son IP : une clé inventée ne donne pas de seau neuf. Chaque
+  règle donne un débit (jetons/s) et une rafale (capacité du seau) ; les
+  routes sans règle ne sont pas limitées. Seau vide : 429 + Retry-After.
+  Les seaux sont rechargés paresseusement à l'accès et gardés dans un LRU
+  borné : O(1) par requête.
+
+- FairQueueMiddleware : au plus `concurrency` requêtes d'inférence en cours.
+  Au-delà, chaque client a sa file et les places libérées sont distribuées
+  par Deficit Round Robin : à son tour, un client reçoit `quantum x poids`
+  crédits et passe tant que son crédit couvre le coût de sa prochaine requête
+  (coût par route, ex: /predict/batch plus cher que /predict). Un client qui
+  envoie 100 requêtes n'en fait donc pas attendre 100 aux autres. Files
+  bornées par client (429 au-delà), attente bornée (503). O(1) amorti.
+
+Les règles s'écrivent "route=valeur" séparées par des virgules ; une route
+finissant par '*' couvre le préfixe (ex: "/recommend/*=5:10"). La première
+règle qui correspond s'applique.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+# ========================================================
+# Règles par route + identité du client
+# ========================================================
+def parse_rules(spec: str, parse: Callable[[str], object] = float) -> List[Tuple[str, object]]:
+    """"/predict=20:40,/recommend/*=5:10" -> [("/predict", parse("20:40")), ...]"""
+    rules = []
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        route, _, value = part.rpartition("=")
+        if not route:
+            raise ValueError(f"Invalid rule {part!r}: expected route=value")
+        rules.append((route.strip(), parse(value.strip())))
+    return rules
+
+
+def parse_rate(value: str) -> Tuple[float, float]:
+    """"20:40" -> (20 jetons/s, rafale de 40) ; "20" -> rafale = débit."""
+    rate, _, burst = value.partition(":")
+    return float(rate), float(burst or rate)
+
+
+def match_rule(rules: List[Tuple[str, object]], path: str) -> Optional[Tuple[str, object]]:
+    for route, value in rules:
+        if path == route or (route.endswith("*") and path.startswith(route[:-1])):
+            return route, value
+    return None
+
+
+def client_id(scope, trusted_proxies: int = 0, api_keys: frozenset = frozenset()) -> str:
+    """
+    "key:<clé>" si X-API-Key est une clé déclarée, sinon "ip:<adresse>".
+    Derrière `trusted_proxies` proxies, l'adresse est la n-ième entrée de
+    X-Forwarded-For en partant de la droite (la première ajoutée par un proxy
+    de confiance) ; les entrées de gauche sont fournies par le client.
+    """
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+    if api_key and api_key in api_keys:
+        return "key:" + api_key
+    if trusted_proxies and b"x-forwarded-for" in headers:
+        hops = [h.strip() for h in headers[b"x-forwarded-for"].decode("latin-1").split(",") if h.strip()]
+        if len(hops) >= trusted_proxies:
+            return "ip:" + hops[-trusted_proxies]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, status: int, detail: str, retry_after: Optional[float] = None) -> None:
+    body = ('{"detail": "%s"}' % detail).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+# ========================================================
+# Seaux à jetons
+# ========================================================
+class TokenBucketLimiter:
+    def __init__(self, rules: List[Tuple[str, Tuple[float, float]]], max_buckets: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rules = rules
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, client: str, path: str) -> Optional[float]:
+        """None si la requête passe, sinon le délai (s) avant le prochain jeton."""
+        rule = match_rule(self.rules, path)
+        if rule is None:
+            return None
+        route, (rate, burst) = rule
+        now = self.clock()
+        key = (client, route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            self.allowed += 1
+            return None
+        self.limited += 1
+        return (1.0 - bucket[0]) / rate if rate > 0 else 3600.0
+
+    def reset(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {"rules": {route: {"rate_per_s": r, "burst": b} for route, (r, b) in self.rules},
+                "buckets": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: TokenBucketLimiter, trusted_proxies: int = 0,
+                 api_keys: frozenset = frozenset(), enabled: bool = True):
+        self.app = app
+        self.limiter = limiter
+        self.trusted_proxies = trusted_proxies
+        self.api_keys = frozenset(api_keys)
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if self.enabled and scope["type"] == "http":
+            client = client_id(scope, self.trusted_proxies, self.api_keys)
+            retry_after = self.limiter.acquire(client, scope["path"])
+            if retry_after is not None:
+                await _reject(send, 429, "Rate limit exceeded", retry_after)
+                return
+        await self.app(scope, receive, send)
+
+
+# ========================================================
+# File équitable (Deficit Round Robin)
+# ========================================================
+class QueueFull(Exception):
+    """File du client pleine."""
+
+
+class FairScheduler:
+    def __init__(self, concurrency: int, quantum: float = 1.0, max_queue_per_client: int = 64,
+                 weights: Optional[Dict[str, float]] = None):
+        # un crédit nul ou négatif ne couvrirait jamais une requête : _dispatch tournerait sans fin
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        if quantum <= 0:
+            raise ValueError(f"quantum must be > 0, got {quantum}")
+        bad = {client: w for client, w in (weights or {}).items() if not w > 0}
+        if bad:
+            raise ValueError(f"Fair queue weights must be > 0: {bad}")
+        self.concurrency = concurrency
+        self.quantum = quantum
+        self.max_queue_per_client = max_queue_per_client
+        self.weights = weights or {}
+        self._free = concurrency
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {}
+        self._deficit: Dict[str, float] = {}
+        self._active: Deque[str] = deque()  # clients ayant des requêtes en attente, dans l'ordre du tourniquet
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self, client: str, cost: float = 1.0, timeout: Optional[float] = None) -> None:
+        """Attend une place d'inférence ; QueueFull si la file du client est pleine, TimeoutError après `timeout`."""
+        if self._free > 0 and not self._active:
+            self._free -= 1
+            self.granted += 1
+            return
+        queue = self._queues.get(client)
+        if queue is None:
+            queue = self._queues[client] = deque()
+            self._deficit[client] = 0.0
+            self._active.append(client)
+        if len(queue) >= self.max_queue_per_client:
+            self.rejected += 1
+            raise QueueFull(client)
+        future = asyncio.get_running_loop().create_future()
+        queue.append((future, cost))
+        self.queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()  # place accordée au moment de l'abandon : on la rend
+            else:
+                future.cancel()  # retirée paresseusement de la file par _dispatch
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+
+    def release(self) -> None:
+        self._free += 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._free > 0 and self._active:
+            client = self._active[0]
+            queue = self._queues[client]
+            while queue and queue[0][0].done():  # requêtes abandonnées
+                queue.popleft()
+            if not queue:
+                self._drop(client)
+                continue
+            future, cost = queue[0]
+            if self._deficit[client] >= cost:
+                queue.popleft()
+                self._deficit[client] -= cost
+                self._free -= 1
+                self.granted += 1
+                future.set_result(None)
+                if not queue:
+                    self._drop(client)
+            else:
+                # tour du client épuisé : crédit du tour suivant, puis client suivant
+                self._deficit[client] += self.quantum * self.weights.get(client, 1.0)
+                self._active.rotate(-1)
+
+    def _drop(self, client: str) -> None:
+        self._active.popleft()
+        del self._queues[client]
+        del self._deficit[client]
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.concurrency - self._free,
+            "waiting": sum(len(q) for q in self._queues.values()),
+            "waiting_clients": len(self._active),
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+class FairQueueMiddleware:
+    def __init__(self, app, scheduler: FairScheduler, costs: List[Tuple[str, float]],
+                 timeout: Optional[float] = 30.0, trusted_proxies: int = 0,
+                 api_keys: frozenset = frozenset(), enabled: bool = True):
+        bad = {route: cost for route, cost in costs if not cost > 0}
+        if bad:
+            raise ValueError(f"Fair queue costs must be > 0: {bad}")
+        self.app = app
+        self.scheduler = scheduler
+        self.costs = costs
+        self.timeout = timeout
+        self.trusted_proxies = trusted_proxies
+        self.api_keys = frozenset(api_keys)
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        rule = match_rule(self.costs, scope["path"]) if self.enabled and scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.scheduler.acquire(client_id(scope, self.trusted_proxies, self.api_keys), rule[1], self.timeout)
+        except QueueFull:
+            await _reject(send, 429, "Too many queued requests for this client", retry_after=1)
+            return
+        except asyncio.TimeoutError:
+            await _reject(send, 503, "Inference queue timeout", retry_after=1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.scheduler.release()
@@ -0,0 +1,308 @@
+#api/response_cache.py
+"""
+Cache des réponses devant l'application ASGI (requêtes POST idempotentes).
+
+Beaucoup de clients interrogent `/recommend/yield` en boucle avec le même
+corps. Le middleware lit le corps, le canonicalise (JSON trié, sans espaces)
+et le hache avec la version de service et le chemin : deux requêtes égales à
+l'ordre des clés près tombent sur la même entrée. Une entrée trouvée est
+renvoyée telle quelle : ni inférence, ni sérialisation.
+
+- Stockage borné : LRU en mémoire (`max_entries`) et, en option, un second
+  niveau sur disque local (`disk_dir`) partagé entre workers et conservé au
+  redémarrage ; les entrées disque lues sont remontées en mémoire.
+- ETag : hash du corps de la réponse. Si `If-None-Match` correspond, la
+  réponse est un 304 sans corps.
+- Invalidation : la version de service (empreinte du modèle, des fichiers et
+  des variables qui déterminent les réponses, voir api/main.py) fait partie
+  de la clé et nomme le répertoire disque. Elle est fixée au démarrage : il
+  n'y a pas de rechargement à chaud, un nouveau modèle ou une nouvelle
+  configuration passe par un redémarrage, qui ignore la mémoire de l'ancien
+  processus et supprime les répertoires disque des autres versions.
+- Seules les réponses 200 JSON sont mises en cache ; un corps non JSON ou une
+  erreur passent sans cache.
+
+Les hits ne repassent pas par les handlers : le middleware appelle `on_hit`
+(chemin, corps de la requête, corps de la réponse, t0) après avoir répondu,
+pour que api/main.py les journalise comme l'appel qu'ils remplacent (journal
+des prédictions et moniteur de dérive).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    content_type: bytes
+    etag: bytes
+
+    def to_bytes(self) -> bytes:
+        return b"\n".join([self.etag, self.content_type, self.body])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        etag, content_type, body = data.split(b"\n", 2)
+        return cls(body=body, content_type=content_type, etag=etag)
+
+
+def canonical_body(body: bytes) -> Optional[bytes]:
+    """JSON trié et compact, ou None si le corps n'est pas du JSON."""
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def etag_matches(if_none_match: Optional[bytes], etag: bytes) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(b",")]
+    return b"*" in tags or any(t.removeprefix(b"W/") == etag for t in tags)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        version: str,
+        max_entries: int = 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        disk_dir: Optional[Path] = None,
+        disk_max_entries: int = 100_000,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_entries = disk_max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._disk_entries: Optional[int] = None  # compté au premier accès disque
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stored = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self.disk_errors = 0
+
+        self.version = version
+        self._drop_other_versions()
+
+    # ----------------------------------------------------
+    # Clé + invalidation
+    # ----------------------------------------------------
+    def key(self, path: str, query_string: bytes, body: bytes) -> Optional[str]:
+        canonical = canonical_body(body or b"{}")
+        if canonical is None:
+            return None
+        h = hashlib.sha256()
+        for part in (self.version.encode(), path.encode(), query_string, canonical):
+            h.update(part)
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _drop_other_versions(self) -> None:
+        """Supprime les entrées disque laissées par les autres versions (au démarrage)."""
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for old in self.disk_dir.iterdir():
+                if old.is_dir() and old.name != self.version:
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self.disk_dir is not None:
+            shutil.rmtree(self._version_dir(), ignore_errors=True)
+            self._disk_entries = 0
+
+    # ----------------------------------------------------
+    # Mémoire (boucle d'événements) + disque (thread)
+    # ----------------------------------------------------
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if self.disk_dir is not None:
+            entry = await asyncio.to_thread(self._disk_read, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_entry_bytes:
+            self.bypassed += 1
+            return
+        self._remember(key, entry)
+        self.stored += 1
+        if self.disk_dir is not None:
+            await asyncio.to_thread(self._disk_write, key, entry)
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _version_dir(self) -> Path:
+        return self.disk_dir / self.version
+
+    def _disk_path(self, key: str) -> Path:
+        return self._version_dir() / key[:2] / key
+
+    def _disk_read(self, key: str) -> Optional[CachedResponse]:
+        try:
+            return CachedResponse.from_bytes(self._disk_path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self.disk_errors += 1
+            return None
+
+    def _disk_write(self, key: str, entry: CachedResponse) -> None:
+        path = self._disk_path(key)
+        try:
+            if self._disk_entries is None:
+                self._disk_entries = sum(1 for _ in self._version_dir().glob("*/*")) if self._version_dir().exists() else 0
+            if self._disk_entries >= self.disk_max_entries:
+                self._disk_prune()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # écriture atomique : un autre worker ne lit jamais un fichier partiel
+            tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+            tmp.write_bytes(entry.to_bytes())
+            os.replace(tmp, path)
+            self._disk_entries += 1
+        except OSError:
+            self.disk_errors += 1
+
+    def _disk_prune(self) -> None:
+        """Supprime le plus ancien dixième des entrées disque (date de modification)."""
+        files = sorted(self._version_dir().glob("*/*"), key=lambda p: p.stat().st_mtime)
+        drop = files[:max(1, len(files) // 10)]
+        for f in drop:
+            f.unlink(missing_ok=True)
+        self._disk_entries = len(files) - len(drop)
+        self.evictions += len(drop)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "version": self.version,
+            "entries": len(self._entries),
+            "disk_dir": str(self.disk_dir) if self.disk_dir is not None else None,
+            "disk_entries": self._disk_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "disk_errors": self.disk_errors,
+        }
+
+
+class ResponseCacheMiddleware:
+    """Middleware ASGI : sert les POST de `paths` depuis `cache`, avec ETag / 304."""
+
+    def __init__(self, app, cache: ResponseCache, paths: Iterable[str],
+                 on_hit: Optional[Callable[[str, bytes, bytes, float], None]] = None):
+        self.app = app
+        self.cache = cache
+        self.paths = frozenset(paths)
+        self.on_hit = on_hit
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"] not in self.paths or not self.cache.enabled):
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        body = await _read_body(receive)
+        replay = _replay(body, receive)
+        key = self.cache.key(scope["path"], scope.get("query_string", b""), body)
+        if key is None:
+            self.cache.bypassed += 1
+            await self.app(scope, replay, send)
+            return
+
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        entry = await self.cache.get(key)
+        if entry is not None:
+            await self._respond(send, entry, if_none_match, b"HIT")
+            if self.on_hit is not None:
+                self.on_hit(scope["path"], body, entry.body, t0)
+            return
+
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        await self.app(scope, replay, capture)
+        start = messages[0]
+        content_type = dict(start.get("headers", [])).get(b"content-type", b"")
+        if start["status"] != 200 or not content_type.startswith(b"application/json"):
+            for message in messages:
+                await send(message)
+            return
+
+        response_body = b"".join(m.get("body", b"") for m in messages[1:])
+        etag = b'"' + hashlib.sha256(response_body).hexdigest()[:32].encode() + b'"'
+        entry = CachedResponse(body=response_body, content_type=content_type, etag=etag)
+        await self.cache.put(key, entry)
+        await self._respond(send, entry, if_none_match, b"MISS")
+
+    async def _respond(self, send, entry: CachedResponse, if_none_match: Optional[bytes], status: bytes) -> None:
+        headers = [(b"etag", entry.etag), (b"x-cache", status)]
+        if etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += [(b"content-type", entry.content_type), (b"content-length", str(len(entry.body)).encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """`receive` qui rend d'abord le corps déjà lu, puis délègue (déconnexion client)."""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
@@ -0,0 +1,289 @@
+#api/schemas.py
+"""
+Schémas Pydantic des requêtes et réponses de l'API.
+
+Partagés par api/main.py (validation FastAPI, doc OpenAPI) et
+api/local_backend.py (moteur en processus de l'interface) : les deux modes
+valident les mêmes champs avec les mêmes bornes et renvoient les mêmes 422.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+
+PriceUnit = Literal["eur_per_t", "eur_per_kg", "eur_per_hg"]
+
+class PredictRequest(BaseModel):
+    area: str = Field(..., description="Nom du pays")
+    item: str = Field(..., description="Type de culture")
+    year: int =  Field(..., ge=1900, le=2100, description="Année")
+    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes en mm")
+    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides en tonnes")
+    avg_temp: float = Field(..., description="Température moyenne en °C")
+    irrigation: bool = Field(default=False, description="Usage de l'irrigation")
+    fertilizer: bool = Field(default=False, description="Usage de la fertilisation")
+    # Prix facultatif (pour calculer le revenu)
+    price_value: Optional[float] = Field(default=None, description="Prix par culture (optionnel)")
+    price_unit: PriceUnit = Field(default="eur_per_t", description="Unité de prix")
+    quantiles: Optional[List[float]] = Field(
+        default=None,
+        description="Quantiles du rendement à estimer (optionnel, ex: [0.1, 0.5, 0.9]). Recalibrés sur la CV "
+                    "temporelle pour que [P10, P90] couvre 80 % des rendements ; couverture mesurée dans GET /health")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "area": "France",
+                "item": "maize",
+                "year": 2026,
+                "avg_rain_mm": 650.0,
+                "pesticides_tonnes": 5000.0,
+                "avg_temp": 12.5,
+                "irrigation": False,
+                "fertilizer": False,
+                "price_value": 0,
+                "price_unit": "eur_per_t"
+                
+            }
+        }
+
+class PredictResponse(BaseModel):
+    item: str
+    pred_yield_hg_ha: float
+    pred_yield_t_ha: float
+    revenue_per_ha: Optional[float] = None
+    quantiles: Optional[Dict[str, float]] = None
+
+
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "5000"))
+
+
+class PredictBatchRow(BaseModel):
+    area: str
+    item: str
+    year: int = Field(..., ge=1900, le=2100)
+    avg_rain_mm: float = Field(..., ge=0)
+    pesticides_tonnes: float = Field(..., ge=0)
+    avg_temp: float
+    irrigation: bool = False
+    fertilizer: bool = False
+
+
+class PredictBatchRequest(BaseModel):
+    """Bloc de scénarios scorés en un seul appel du modèle (interface : mode CSV en masse)."""
+    rows: List[PredictBatchRow] = Field(..., min_length=1, max_length=PREDICT_BATCH_MAX_ROWS)
+
+
+class PredictBatchResponse(BaseModel):
+    pred_yield_hg_ha: List[float]
+    pred_yield_t_ha: List[float]
+
+
+class ExplainResponse(BaseModel):
+    item: str
+    pred_yield_hg_ha: float
+    base_value: float = Field(..., description="Rendement moyen du modèle (hg/ha)")
+    contributions: Dict[str, float] = Field(..., description="Contribution de chaque variable (hg/ha)")
+    scenario_adjustment: float = Field(..., description="Effet irrigation / fertilisation (hg/ha)")
+    area_neighbors: Optional[Dict[str, float]] = Field(
+        default=None, description="Pays inconnu (AREA_FALLBACK=1) : voisins climatiques et leurs poids")
+
+
+class RecommendBaseRequest(BaseModel):
+    area: str = Field(..., description="Nom du pays")
+    year: int =  Field(..., ge=1900, le=2100, description="Année")
+    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes en mm")
+    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides en tonnes")
+    avg_temp: float = Field(..., description="Température moyenne en °C")
+    irrigation: bool = Field(default=False, description="Usage de l'irrigation")
+    fertilizer: bool = Field(default=False, description="Usage de la fertilisation")
+    top_k: int = Field(default=5, ge=1, le=20, description="Nombre de recommandations")
+    prices: Optional[dict] = Field(default=None, description="Prix par culture (optionnel)")
+    price_unit: str = Field(default="eur_per_t", description="Unité de prix")
+    quantiles: Optional[List[float]] = Field(default=None, description="Quantiles du rendement à estimer (optionnel, ex: [0.1, 0.5, 0.9])")
+
+
+class RecommendYieldRequest(RecommendBaseRequest):
+    """Recommandation triée par rendement (pas besoin de prix)."""
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "area": "France",
+                "year": 2026,
+                "avg_rain_mm": 650.0,
+                "pesticides_tonnes": 5000.0,
+                "avg_temp": 15,
+                "irrigation": False,
+                "fertilizer": False,
+                "top_k": 5,
+                }
+            }
+    pass
+
+
+class RecommendRevenueRequest(RecommendBaseRequest):
+    """Recommandation triée par revenu (prix requis)."""
+    prices: Dict[str, float] = Field(
+        ...,
+        description="Dictionnaire {item: prix} saisi par l'agriculteur"
+    )
+    price_unit: PriceUnit = Field(default="eur_per_t", description="Unité de prix")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "area": "France",
+                "year": 2026,
+                "avg_rain_mm": 650.0,
+                "pesticides_tonnes": 5000.0,
+                "avg_temp": 15,
+                "irrigation": False,
+                "fertilizer": False,
+                "top_k": 5,
+                "price_unit": "eur_per_t",
+                "prices": {
+                    "maize": 0,
+                    "rice, paddy": 0,
+                    "wheat": 0,
+                    "cassava": 0,
+                    "sorghum": 0,
+                    "potatoes": 0,
+                    "soybeans":0,
+                    "yams": 0,
+                    "sweet potatoes": 0,
+                    "plantains and others": 0
+                    }
+                }
+            }
+
+
+class RecommendRow(BaseModel):
+    item: str
+    pred_yield_hg_ha: float
+    pred_yield_t_ha: float
+    revenue_per_ha: Optional[float] = None
+    price_value: Optional[float] = None
+    price_unit: Optional[str] = None
+    quantiles: Optional[Dict[str, float]] = None
+
+
+class RecommendResponse(BaseModel):
+    results: List[RecommendRow]
+
+
+class PlanRequest(BaseModel):
+    """Meilleurs plans culture x irrigation x fertilisation par revenu net (prix requis)."""
+    area: str = Field(..., description="Nom du pays")
+    year: int =  Field(..., ge=1900, le=2100, description="Année")
+    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes en mm")
+    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides en tonnes")
+    avg_temp: float = Field(..., description="Température moyenne en °C")
+    prices: Dict[str, float] = Field(..., description="Dictionnaire {item: prix} saisi par l'agriculteur")
+    price_unit: PriceUnit = Field(default="eur_per_t", description="Unité de prix")
+    irrigation_cost_per_ha: float = Field(default=0.0, ge=0, description="Coût de l'irrigation (€/ha)")
+    fertilizer_cost_per_ha: float = Field(default=0.0, ge=0, description="Coût de la fertilisation (€/ha)")
+    budget_per_ha: Optional[float] = Field(default=None, ge=0, description="Budget maximal des pratiques (€/ha, optionnel)")
+    top_k: int = Field(default=5, ge=1, le=20, description="Nombre de plans")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "area": "France",
+                "year": 2026,
+                "avg_rain_mm": 650.0,
+                "pesticides_tonnes": 5000.0,
+                "avg_temp": 15,
+                "price_unit": "eur_per_t",
+                "prices": {"maize": 180, "wheat": 200, "potatoes": 50},
+                "irrigation_cost_per_ha": 250,
+                "fertilizer_cost_per_ha": 150,
+                "budget_per_ha": 300,
+                "top_k": 5
+                }
+            }
+
+
+# au plus une trajectoire par culture candidate : la grille cultures x années reste bornée
+CANDIDATE_ITEMS_PATH = Path(__file__).resolve().parent.parent / "inputs" / "candidate_items.json"
+MAX_HORIZON_ITEMS = len(json.loads(CANDIDATE_ITEMS_PATH.read_text(encoding="utf-8")))
+
+
+class HorizonRequest(BaseModel):
+    """Trajectoire de rendement année par année, pour une ou plusieurs cultures."""
+    area: str = Field(..., description="Nom du pays")
+    items: Optional[List[str]] = Field(default=None, max_length=MAX_HORIZON_ITEMS,
+                                       description="Cultures (défaut : toutes les cultures candidates)")
+    start_year: int = Field(..., ge=1900, le=2100, description="Première année")
+    end_year: int = Field(..., ge=1900, le=2100, description="Dernière année (incluse)")
+    avg_rain_mm: float = Field(..., ge=0, description="Précipitations moyennes la 1re année (mm)")
+    pesticides_tonnes: float = Field(..., ge=0, description="Pesticides la 1re année (tonnes)")
+    avg_temp: float = Field(..., description="Température moyenne la 1re année (°C)")
+    rain_trend_per_year: float = Field(default=0.0, description="Tendance linéaire des précipitations (mm/an)")
+    pesticides_trend_per_year: float = Field(default=0.0, description="Tendance linéaire des pesticides (tonnes/an)")
+    temp_trend_per_year: float = Field(default=0.0, description="Tendance linéaire de la température (°C/an)")
+    avg_rain_mm_by_year: Optional[List[float]] = Field(default=None, description="Trajectoire explicite des précipitations (une valeur par année)")
+    pesticides_tonnes_by_year: Optional[List[float]] = Field(default=None, description="Trajectoire explicite des pesticides (une valeur par année)")
+    avg_temp_by_year: Optional[List[float]] = Field(default=None, description="Trajectoire explicite de la température (une valeur par année)")
+    irrigation: bool = Field(default=False, description="Usage de l'irrigation")
+    fertilizer: bool = Field(default=False, description="Usage de la fertilisation")
+    quantiles: Optional[List[float]] = Field(default=None, description="Quantiles du rendement à estimer (optionnel, ex: [0.1, 0.9])")
+    stream: bool = Field(default=False, description="Réponse NDJSON : une ligne d'en-tête puis une ligne par culture")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "area": "France",
+                "items": ["maize", "wheat"],
+                "start_year": 2026,
+                "end_year": 2040,
+                "avg_rain_mm": 650.0,
+                "pesticides_tonnes": 5000.0,
+                "avg_temp": 12.5,
+                "temp_trend_per_year": 0.05
+                }
+            }
+
+
+class HorizonSeries(BaseModel):
+    item: str
+    pred_yield_hg_ha: List[float]
+    quantiles: Optional[Dict[str, List[float]]] = None
+
+
+class HorizonResponse(BaseModel):
+    area: str
+    years: List[int]
+    climate: Dict[str, List[float]]
+    series: List[HorizonSeries]
+
+
+MAX_HORIZON_YEARS = 100
+
+
+class JobPathRequest(BaseModel):
+    """Job sur un fichier déjà présent côté serveur (sous JOBS_INPUT_ROOT)."""
+    path: str = Field(..., description="Chemin relatif à JOBS_INPUT_ROOT")
+    format: Optional[Literal["csv", "jsonl", "parquet"]] = Field(default=None, description="Format d'entrée (défaut : extension)")
+    output_format: Literal["csv", "parquet"] = Field(default="csv", description="Format du fichier de résultat")
+
+
+class PlanRow(BaseModel):
+    item: str
+    irrigation: bool
+    fertilizer: bool
+    pred_yield_hg_ha: float
+    pred_yield_t_ha: float
+    price_value: float
+    price_unit: str
+    revenue_per_ha: float
+    practice_cost_per_ha: float
+    net_revenue_per_ha: float
+
+
+class PlanResponse(BaseModel):
+    results: List[PlanRow]
@@ -0,0 +1,213 @@
+#api/serve.py
+"""
+Lancement multi-workers de l'API (mode pré-fork).
+
+Le processus parent importe `api.main` une seule fois (modèle HGB, liste des
+cultures, tables de lookup), fige le tas Python (`gc.freeze`) puis forke N
+workers uvicorn qui partagent le même socket d'écoute. Les pages mémoire du
+modèle sont ainsi partagées en copy-on-write entre les workers.
+
+Usage :
+    python -m api.serve --host 0.0.0.0 --port 8000 --workers 4
+
+Sans `--workers`, le nombre de workers vient de WEB_CONCURRENCY ou, à défaut,
+du nombre de CPU réellement disponibles (affinité + quota cgroup).
+
+Les caches paresseux du prédicteur (forêts aplaties, lignes pré-binées, index
+des voisins) sont aussi construits dans le parent, avant `gc.freeze` :
+`scripts.predictor.build_serving_caches`.
+
+Restent propres à chaque worker (lifespan de api/main.py, après le fork) :
+- le préchauffage, qui ne fait plus que charger les noyaux et pools de threads ;
+- le JobRunner : tous les workers consomment la même file SQLite (un job
+  n'est réclamé que par un seul) ; JOBS_WORKERS=0 pour un worker dédié ;
+- le journal des prédictions et le moniteur de dérive : un fichier par
+  worker, et les scores de dérive de /metrics ne portent que sur le trafic
+  du worker qui répond.
+
+Un worker mort est relancé. S'il meurt moins de SERVE_MIN_UPTIME_S secondes
+après son lancement (ex: erreur au préchauffage), la relance attend 1, 2, 4...
+secondes ; après SERVE_MAX_CRASHES morts prématurées consécutives, le parent
+arrête tous les workers et sort en erreur plutôt que de reforker en boucle.
+"""
+
+import argparse
+import gc
+import math
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+CGROUP_CPU_MAX_PATH = Path("/sys/fs/cgroup/cpu.max")
+WORKER_MIN_UPTIME_S = float(os.getenv("SERVE_MIN_UPTIME_S", "30"))
+WORKER_MAX_CRASHES = int(os.getenv("SERVE_MAX_CRASHES", "5"))
+RESTART_BACKOFF_MAX_S = 30.0
+
+
+# ========================================================
+# Nombre de workers
+# ========================================================
+def cgroup_cpu_limit(path: Path = CGROUP_CPU_MAX_PATH) -> Optional[int]:
+    """Quota CPU du conteneur (cgroup v2, ex: `docker run --cpus=2`), ou None si illimité."""
+    try:
+        quota, period = path.read_text().split()[:2]
+    except (OSError, ValueError):
+        return None
+    if quota == "max":
+        return None
+    return max(1, math.ceil(int(quota) / int(period)))
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY si défini, sinon le nombre de CPU utilisables par le processus."""
+    env = os.getenv("WEB_CONCURRENCY")
+    if env:
+        return max(1, int(env))
+    try:
+        n_cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        n_cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        n_cpus = min(n_cpus, quota)
+    return max(1, n_cpus)
+
+
+# ========================================================
+# Socket partagé + workers
+# ========================================================
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    # le parent gère SIGINT/SIGTERM pour tout le groupe, uvicorn réinstalle ses propres handlers
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, log_level: str, worker_id: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # identifiant stable du worker (conservé en cas de redémarrage), ex: un journal par worker
+        os.environ["SERVE_WORKER_ID"] = str(worker_id)
+        code = 0
+        try:
+            _run_worker(app, sock, log_level)
+        except BaseException:
+            traceback.print_exc()
+            sys.stderr.flush()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def restart_delay(crashes: int, cap: float = RESTART_BACKOFF_MAX_S) -> float:
+    """Attente avant la relance après `crashes` morts prématurées consécutives : 0, 1, 2, 4... s."""
+    return 0.0 if crashes <= 0 else min(cap, 2.0 ** (crashes - 1))
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None, log_level: str = "info") -> int:
+    workers = workers or default_workers()
+
+    if workers > 1:
+        # 1 thread OpenMP par worker : évite la sur-souscription N workers x N threads
+        # (doit être fixé avant le chargement de sklearn / libgomp)
+        os.environ.setdefault("OMP_NUM_THREADS", "1")
+        os.environ.setdefault("NUMBA_NUM_THREADS", "1")  # idem pour PREDICTOR_ENGINE=numba
+
+    # Préchargement dans le parent : modèle + tables chargés une seule fois
+    from api.main import app
+
+    if workers == 1:
+        import uvicorn
+        uvicorn.run(app, host=host, port=port, log_level=log_level)
+        return 0
+
+    sock = _bind_socket(host, port)
+
+    # Caches du prédicteur construits une seule fois, avant le fork (NumPy seul,
+    # OMP_NUM_THREADS=1 : aucun pool de threads n'est créé dans le parent)
+    from scripts.predictor import build_serving_caches, model, quantile_models
+    built = build_serving_caches(model, quantile_models)
+    print(f"[serve] caches préconstruits dans le parent : {', '.join(built)}", flush=True)
+
+    # Objets du préchargement exclus du GC : le GC ne réécrit plus leurs en-têtes,
+    # donc les pages restent partagées après le fork
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {_spawn(app, sock, log_level, i): i for i in range(workers)}
+    started = {i: time.monotonic() for i in range(workers)}
+    crashes = {i: 0 for i in range(workers)}  # morts prématurées consécutives par worker
+    shutting_down = False
+    exit_code = 0
+
+    def _shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+    print(f"[serve] parent {os.getpid()} : {workers} workers sur {host}:{port} -> {list(children)}", flush=True)
+
+    # Supervision : un worker mort est remplacé tant qu'on ne s'arrête pas,
+    # avec un délai croissant s'il meurt peu après son lancement
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_id = children.pop(pid, None)
+        if shutting_down or worker_id is None:
+            continue
+        uptime = time.monotonic() - started[worker_id]
+        crashes[worker_id] = crashes[worker_id] + 1 if uptime < WORKER_MIN_UPTIME_S else 0
+        print(f"[serve] worker {worker_id} (pid {pid}) arrêté (code {os.waitstatus_to_exitcode(status)}) après {uptime:.1f} s", flush=True)
+        if crashes[worker_id] > WORKER_MAX_CRASHES:
+            print(f"[serve] worker {worker_id} : {crashes[worker_id]} arrêts prématurés consécutifs, "
+                  f"arrêt du serveur", file=sys.stderr, flush=True)
+            exit_code = 1
+            _shutdown(None, None)
+            continue
+        time.sleep(restart_delay(crashes[worker_id]))
+        if not shutting_down:
+            children[_spawn(app, sock, log_level, worker_id)] = worker_id
+            started[worker_id] = time.monotonic()
+    sock.close()
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serveur multi-workers de l'API de rendement.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="défaut : WEB_CONCURRENCY ou nb de CPU")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    return serve(host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#api/warmup.py
+"""
+Préchauffage de l'API au démarrage (lifespan), avant de se déclarer prête.
+
+Le premier appel de chaque route paie des coûts uniques : imports paresseux
+de sklearn / pandas, chargement des noyaux Numba, construction des caches du
+prédicteur (lignes pré-binées, forêts aplaties ou quantifiées), premières
+allocations. Le préchauffage appelle une fois chaque chemin d'inférence
+("froid"), puis `iterations` fois encore ("chaud"), et garde les deux latences
+pour /metrics.
+
+Modes (WARMUP_MODE) :
+- "blocking" (défaut) : le démarrage attend la fin du préchauffage ;
+- "background" : le serveur accepte les requêtes tout de suite, /ready répond
+  503 jusqu'à la fin du préchauffage ;
+- "off" : pas de préchauffage.
+
+Une erreur sur un chemin est notée dans `paths[chemin]["error"]` et n'interrompt
+pas les autres ; l'état final est alors "failed" (le service reste prêt).
+Les appels de préchauffage ne sont pas journalisés (`is_warming()`).
+Il s'exécute dans chaque worker, après le fork de api/serve.py : les pools de
+threads (Numba / OpenMP) ne sont jamais créés avant le fork.
+"""
+
+import asyncio
+import statistics
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+MODES = ("blocking", "background", "off")
+
+_warming: ContextVar[bool] = ContextVar("warming", default=False)
+
+
+def is_warming() -> bool:
+    """Vrai dans le thread du préchauffage (les requêtes réelles ne sont pas concernées)."""
+    return _warming.get()
+
+
+class Warmup:
+    def __init__(self, calls: Dict[str, Callable[[], object]], iterations: int = 3, mode: str = "blocking"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown warm-up mode {mode!r}. Available: {list(MODES)}")
+        self.calls = calls
+        self.iterations = iterations
+        self.mode = mode
+        self.state = "pending"  # pending | running | done | failed | disabled
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.paths: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        # un préchauffage en échec ne bloque pas le service : les routes restent utilisables
+        return self.state in ("done", "failed", "disabled")
+
+    async def start(self) -> None:
+        if self.mode == "off":
+            self.state = "disabled"
+        elif self.mode == "blocking":
+            await asyncio.to_thread(self.run)
+        else:
+            self._task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.run))
+
+    def run(self) -> None:
+        self.state = "running"
+        _warming.set(True)
+        t0 = time.perf_counter()
+        failed = []
+        try:
+            for name, fn in self.calls.items():
+                # un chemin en échec n'empêche pas de préchauffer les suivants
+                timings = []
+                try:
+                    for _ in range(1 + self.iterations):
+                        start = time.perf_counter()
+                        fn()
+                        timings.append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    self.paths[name] = {"error": error}
+                    failed.append(f"{name}: {error}")
+                    continue
+                warm = statistics.median(timings[1:]) if self.iterations else None
+                self.paths[name] = {
+                    "cold_ms": round(timings[0], 3),
+                    "warm_ms": round(warm, 3) if warm is not None else None,
+                }
+            self.error = "; ".join(failed) or None
+            self.state = "failed" if failed else "done"
+        finally:
+            self.seconds = round(time.perf_counter() - t0, 3)
+            _warming.set(False)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "ready": self.ready,
+            "seconds": self.seconds,
+            "iterations": self.iterations,
+            "error": self.error,
+            "paths": self.paths,
+        }
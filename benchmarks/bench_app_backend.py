@@ -0,0 +1,102 @@
+#benchmarks/bench_app_backend.py
+"""
+Benchmark des deux moteurs de l'interface Streamlit (api/app.py) : latence
+d'un appel vu de l'interface, pour /predict et /recommend/yield.
+
+- "http nouvelle connexion" : une connexion TCP par appel (ancien comportement
+  de l'interface avec requests.post)
+- "http keep-alive"          : connexion réutilisée (session poolée)
+- "en processus"             : api/local_backend.call, sans HTTP ni JSON
+
+Le serveur HTTP est démarré par le script (`python -m api.serve --workers 1`,
+sans limitation de débit ni cache des réponses, cf. bench_workers.SERVER_ENV) :
+les centaines d'appels identiques mesurent l'inférence, pas des 429 ou des hits de cache.
+
+Usage :
+    python -m benchmarks.bench_app_backend --n 500
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from api import local_backend
+from benchmarks.bench_workers import start_server, stop_server
+
+PAYLOADS = {
+    "/predict": {
+        "area": "france", "item": "maize", "year": 2026, "avg_rain_mm": 650.0,
+        "pesticides_tonnes": 5000.0, "avg_temp": 15.0, "irrigation": False, "fertilizer": False,
+    },
+    "/recommend/yield": {
+        "area": "france", "year": 2026, "avg_rain_mm": 650.0, "pesticides_tonnes": 5000.0,
+        "avg_temp": 15.0, "irrigation": False, "fertilizer": False, "top_k": 5,
+    },
+}
+HEADERS = {"Content-Type": "application/json"}
+
+
+def post(conn: http.client.HTTPConnection, endpoint: str, body: bytes) -> dict:
+    conn.request("POST", endpoint, body=body, headers=HEADERS)
+    resp = conn.getresponse()
+    data = resp.read()
+    assert resp.status == 200, data
+    return json.loads(data)
+
+
+def timed(fn: Callable[[], object], n: int) -> List[float]:
+    for _ in range(min(20, n)):
+        fn()
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def report(name: str, lat: List[float], ref: float = None) -> float:
+    med = statistics.median(lat) * 1e3
+    ratio = f"  (x{ref / med:.1f})" if ref else ""
+    print(f"  {name:<26} p50={med:8.3f} ms  p90={np.percentile(lat, 90) * 1e3:8.3f} ms{ratio}")
+    return med
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=500, help="appels par variante")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    proc = start_server(1, args.port)
+    try:
+        for endpoint, payload in PAYLOADS.items():
+            body = json.dumps(payload).encode()
+            status, local = local_backend.call(endpoint, payload)
+            conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=10)
+            remote = post(conn, endpoint, body)
+            conn.close()
+            assert status == 200 and remote == local, (remote, local)  # mêmes formes, mêmes valeurs
+
+            def fresh():
+                c = http.client.HTTPConnection("127.0.0.1", args.port, timeout=10)
+                post(c, endpoint, body)
+                c.close()
+
+            print(f"{endpoint} :")
+            ref = report("http nouvelle connexion", timed(fresh, args.n))
+            conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=10)  # keep-alive uvicorn : 5 s
+            report("http keep-alive", timed(lambda: post(conn, endpoint, body), args.n), ref)
+            report("en processus", timed(lambda: local_backend.call(endpoint, payload), args.n), ref)
+            conn.close()
+    finally:
+        stop_server(proc)
+
+
+if __name__ == "__main__":
+    main()
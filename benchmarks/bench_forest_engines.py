@@ -0,0 +1,91 @@
+#benchmarks/bench_forest_engines.py
+"""
+Débit des moteurs de traversée des arbres du modèle (PREDICTOR_ENGINE) :
+- "sklearn" : HistGradientBoostingRegressor.predict (boucle Cython, arbre par arbre)
+- "numpy"   : FlatForest.predict (traversée NumPy niveau par niveau)
+- "numba"   : scripts/compiled_forest.py (boucle compilée, parallèle sur les lignes)
+
+La mesure porte sur la traversée seule : les lignes sont tirées de
+clean_data.csv puis transformées une fois par le preprocessing du pipeline.
+Au-delà de `--block` lignes, la même matrice est rescorée bloc par bloc
+(la matrice dense de 1M lignes x 114 colonnes ferait ~0.9 Go).
+
+Chaque moteur est comparé au bit près à sklearn sur le premier bloc.
+
+Usage :
+    python -m benchmarks.bench_forest_engines --rows 1 1000 1000000
+    NUMBA_NUM_THREADS=4 python -m benchmarks.bench_forest_engines --engines sklearn numba
+"""
+
+import argparse
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+from scripts.compiled_forest import NUMBA_AVAILABLE, predict_compiled
+from scripts.data import FEATURE_COLS, load_dataset
+from scripts.flat_forest import FlatForest
+from scripts.predictor import model
+
+
+def engines(forest: FlatForest) -> Dict[str, Callable[[np.ndarray], np.ndarray]]:
+    out = {
+        "sklearn": lambda X: model[-1].predict(X),
+        "numpy": lambda X: forest.predict(X)[:, 0],
+    }
+    if NUMBA_AVAILABLE:
+        out["numba"] = lambda X: predict_compiled(forest, X)[:, 0]
+    return out
+
+
+def run(fn: Callable[[np.ndarray], np.ndarray], block: np.ndarray, n_rows: int, min_time: float) -> float:
+    """Secondes par appel de n_rows lignes (répété jusqu'à min_time pour les petits lots)."""
+    if n_rows <= len(block):
+        X = np.ascontiguousarray(block[:n_rows])
+        fn(X)
+        calls, start = 0, time.perf_counter()
+        while calls == 0 or time.perf_counter() - start < min_time:
+            fn(X)
+            calls += 1
+        return (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for lo in range(0, n_rows, len(block)):
+        fn(block[:min(len(block), n_rows - lo)])
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1000, 1_000_000])
+    parser.add_argument("--engines", nargs="+", default=["sklearn", "numpy", "numba"])
+    parser.add_argument("--block", type=int, default=100_000, help="lignes par bloc pour les gros lots")
+    parser.add_argument("--min-time", type=float, default=1.0, help="durée minimale de mesure (s) des petits lots")
+    args = parser.parse_args(argv)
+
+    df = load_dataset()[FEATURE_COLS].astype({"area": object, "item": object})
+    sample = df.sample(min(args.block, max(args.rows)), replace=True, random_state=0)
+    block = np.ascontiguousarray(model[:-1].transform(sample), dtype=np.float64)
+
+    forest = FlatForest([model[-1]])
+    available = engines(forest)
+    selected = [e for e in args.engines if e in available]
+    if "numba" in args.engines and "numba" not in available:
+        print("numba : non installé, ignoré")
+
+    reference = available["sklearn"](block[:1000])
+    for name in selected:
+        np.testing.assert_array_equal(available[name](block[:1000]), reference)
+    print(f"Parité au bit près avec sklearn : {', '.join(selected)}")
+
+    for n_rows in args.rows:
+        print(f"{n_rows} ligne(s) :")
+        ref = None
+        for name in selected:
+            seconds = run(available[name], block, n_rows, args.min_time)
+            ref = ref or seconds
+            print(f"  {name:<8} {seconds * 1e3:10.3f} ms  {n_rows / seconds:12,.0f} lignes/s  (x{ref / seconds:.1f})")
+
+
+if __name__ == "__main__":
+    main()
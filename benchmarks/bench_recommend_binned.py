@@ -0,0 +1,75 @@
+#benchmarks/bench_recommend_binned.py
+"""
+Latence de recommend_by_yield / recommend_by_revenue avec et sans les lignes
+pré-binées par pays (scripts/binned_rows.py, RECOMMEND_FAST_PATH) :
+- "pipeline" : DataFrame + ColumnTransformer + predict_points (PREDICTOR_ENGINE)
+- "binned"   : binning de 4 nombres + traversée binée uint8
+
+Les deux chemins sont d'abord comparés au bit près sur chaque pays.
+
+Usage :
+    python -m benchmarks.bench_recommend_binned
+    PREDICTOR_ENGINE=numba python -m benchmarks.bench_recommend_binned --min-time 2
+"""
+
+import argparse
+import time
+from typing import Callable
+
+import pandas as pd
+
+from api.main import CANDIDATE_ITEMS
+from scripts import predictor
+from scripts.predictor import model, recommend_by_revenue, recommend_by_yield
+
+CONTEXT = dict(year=2020, avg_rain_mm=1083.0, pesticides_tonnes=2000.0, avg_temp=26.0)
+PRICES = {it: 150.0 for it in CANDIDATE_ITEMS}
+
+
+def run(fn: Callable[[], object], min_time: float) -> float:
+    """Secondes par appel (répété jusqu'à min_time)."""
+    fn()
+    calls, start = 0, time.perf_counter()
+    while calls == 0 or time.perf_counter() - start < min_time:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--area", default="india")
+    parser.add_argument("--min-time", type=float, default=1.0, help="durée minimale de mesure (s) par cas")
+    args = parser.parse_args(argv)
+
+    calls = {
+        "recommend_by_yield": lambda: recommend_by_yield(
+            model, area=args.area, candidate_items=CANDIDATE_ITEMS, top_k=5, **CONTEXT),
+        "recommend_by_revenue": lambda: recommend_by_revenue(
+            model, area=args.area, candidate_items=CANDIDATE_ITEMS, prices=PRICES, top_k=5, **CONTEXT),
+    }
+
+    areas = list(model[0].named_transformers_["cat"][-1].categories_[0])
+    for fast in (True, False):
+        predictor.RECOMMEND_FAST_PATH = fast
+        frames = [recommend_by_yield(model, area=a, candidate_items=CANDIDATE_ITEMS, top_k=len(CANDIDATE_ITEMS),
+                                     **CONTEXT) for a in areas]
+        if fast:
+            reference = frames
+        else:
+            for a, b in zip(reference, frames):
+                pd.testing.assert_frame_equal(a, b)
+    print(f"Parité au bit près sur {len(areas)} pays ({len(CANDIDATE_ITEMS)} cultures), "
+          f"moteur {predictor.PREDICTOR_ENGINE}")
+
+    for name, fn in calls.items():
+        timings = {}
+        for label, fast in (("pipeline", False), ("binned", True)):
+            predictor.RECOMMEND_FAST_PATH = fast
+            timings[label] = run(fn, args.min_time)
+        print(f"{name:<21} pipeline {timings['pipeline'] * 1e3:7.2f} ms   binned {timings['binned'] * 1e3:7.2f} ms"
+              f"   (x{timings['pipeline'] / timings['binned']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
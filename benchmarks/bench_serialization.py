@@ -0,0 +1,121 @@
+#benchmarks/bench_serialization.py
+"""
+Benchmark du chemin de réponse rapide de /recommend/yield (top_k=20).
+
+Compare, à résultat de recommandation identique (20 lignes, moteur mocké pour
+isoler la sérialisation) :
+- "legacy" : iterrows -> RecommendRow -> RecommendResponse, revalidé par
+  FastAPI via response_model puis sérialisé avec json
+- "fast"   : lignes construites colonne par colonne + FastJSONResponse (orjson)
+
+puis la latence de bout en bout de l'endpoint réel avec le modèle.
+La limitation de débit et le cache des réponses sont désactivés : les
+requêtes identiques répétées donneraient sinon des 429 ou des hits de cache.
+
+Usage :
+    python -m benchmarks.bench_serialization --n 2000
+"""
+
+import argparse
+import os
+import statistics
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_workers import SERVER_ENV
+
+os.environ.update(SERVER_ENV)  # lu à l'import de api.main
+
+from api import main as api_main  # noqa: E402
+from api.main import RecommendResponse, RecommendRow, RecommendYieldRequest  # noqa: E402
+
+PAYLOAD = {
+    "area": "france",
+    "year": 2026,
+    "avg_rain_mm": 650.0,
+    "pesticides_tonnes": 5000.0,
+    "avg_temp": 15.0,
+    "irrigation": False,
+    "fertilizer": False,
+    "top_k": 20,
+}
+
+
+def fake_results(n_rows: int = 20) -> pd.DataFrame:
+    preds = np.linspace(90000, 10000, n_rows)
+    return pd.DataFrame({
+        "item": [f"crop_{i}" for i in range(n_rows)],
+        "pred_yield_hg_ha": preds,
+        "pred_yield_t_ha": preds / 10000,
+        "irrigation": False,
+        "fertilizer": False,
+    })
+
+
+def legacy_app() -> FastAPI:
+    """Réplique de l'ancienne route (avant le chemin rapide)."""
+    app = FastAPI()
+
+    @app.post("/recommend/yield", response_model=RecommendResponse)
+    def recommend_yield(req: RecommendYieldRequest):
+        df_out = api_main.recommend_by_yield(
+            api_main.model, area=req.area, year=req.year, avg_rain_mm=req.avg_rain_mm,
+            pesticides_tonnes=req.pesticides_tonnes, avg_temp=req.avg_temp,
+            candidate_items=api_main.CANDIDATE_ITEMS, irrigation=req.irrigation,
+            fertilizer=req.fertilizer, top_k=req.top_k)
+        results = [
+            RecommendRow(
+                item=str(r["item"]),
+                pred_yield_hg_ha=float(r["pred_yield_hg_ha"]),
+                pred_yield_t_ha=float(r["pred_yield_t_ha"]),
+            )
+            for _, r in df_out.iterrows()
+        ]
+        return RecommendResponse(results=results)
+
+    return app
+
+
+def time_client(client: TestClient, n: int) -> list:
+    for _ in range(20):
+        client.post("/recommend/yield", json=PAYLOAD)
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = client.post("/recommend/yield", json=PAYLOAD)
+        out.append(time.perf_counter() - t0)
+        assert resp.status_code == 200
+    return out
+
+
+def report(name: str, lat: list, ref: float = None) -> float:
+    med = statistics.median(lat) * 1e3
+    gain = f"  ({(med / ref - 1) * 100:+.0f}% vs legacy)" if ref else ""
+    print(f"  {name:<8} p50={med:7.3f} ms  p90={np.percentile(lat, 90) * 1e3:7.3f} ms{gain}")
+    return med
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=2000, help="requêtes par variante")
+    args = parser.parse_args(argv)
+
+    legacy, fast = TestClient(legacy_app()), TestClient(api_main.app)
+
+    print("Sérialisation seule (moteur mocké, 20 lignes) :")
+    with patch.object(api_main, "recommend_by_yield", return_value=fake_results(20)):
+        ref = report("legacy", time_client(legacy, args.n))
+        report("fast", time_client(fast, args.n), ref)
+
+    print("Bout en bout avec le modèle (top_k=20) :")
+    ref = report("legacy", time_client(legacy, args.n // 10))
+    report("fast", time_client(fast, args.n // 10), ref)
+
+
+if __name__ == "__main__":
+    main()
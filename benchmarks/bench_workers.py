@@ -0,0 +1,174 @@
+#benchmarks/bench_workers.py
+"""
+Benchmark du mode multi-workers (api/serve.py) : débit de 1 à N workers et
+surcoût mémoire par worker.
+
+Pour chaque nombre de workers, le script démarre `python -m api.serve`,
+envoie des requêtes /recommend/yield en keep-alive depuis plusieurs processus
+clients pendant `--duration` secondes, puis lit la mémoire de chaque worker
+dans /proc/<pid>/smaps_rollup :
+- RSS : mémoire résidente totale (inclut les pages partagées avec le parent)
+- USS : mémoire privée du worker = vrai surcoût par worker
+
+Usage :
+    python -m benchmarks.bench_workers --max-workers 4 --duration 10
+
+Les clients tournent sur la même machine : sur une petite machine ils
+consomment une partie des cœurs et sous-estiment le passage à l'échelle.
+Le serveur est lancé sans limitation de débit ni cache des réponses
+(SERVER_ENV) : on mesure l'inférence, pas des 429 ou des réponses en cache.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+PAYLOAD = json.dumps({
+    "area": "france",
+    "year": 2026,
+    "avg_rain_mm": 650.0,
+    "pesticides_tonnes": 5000.0,
+    "avg_temp": 15.0,
+    "irrigation": False,
+    "fertilizer": False,
+    "top_k": 5,
+}).encode()
+
+# les requêtes répétées du benchmark seraient sinon limitées (429) ou servies par le cache
+SERVER_ENV = {"RATE_LIMIT_ENABLED": "0", "RESPONSE_CACHE_ENABLED": "0"}
+
+
+# ========================================================
+# Serveur
+# ========================================================
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT_DIR,
+        env={**os.environ, **SERVER_ENV},
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"Le serveur ({workers} workers) n'a pas démarré sur le port {port}")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(x) for x in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS et USS (Private_Clean + Private_Dirty) en Mo, Linux uniquement."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":"):
+                fields[parts[0][:-1]] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {"rss_mb": fields.get("Rss", 0) / 1024, "uss_mb": uss / 1024}
+
+
+# ========================================================
+# Générateur de charge
+# ========================================================
+def _client(port: int, duration: float, queue) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        conn.request("POST", "/recommend/yield", body=PAYLOAD, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status == 200:
+            latencies.append(time.perf_counter() - t0)
+    queue.put(latencies)
+
+
+def run_load(port: int, concurrency: int, duration: float) -> Dict[str, float]:
+    queue = mp.Queue()
+    clients = [mp.Process(target=_client, args=(port, duration, queue)) for _ in range(concurrency)]
+    for c in clients:
+        c.start()
+    latencies = sorted(lat for _ in clients for lat in queue.get())
+    for c in clients:
+        c.join()
+    n = len(latencies)
+    return {
+        "requests": n,
+        "rps": n / duration,
+        "p50_ms": 1000 * latencies[n // 2] if n else float("nan"),
+        "p99_ms": 1000 * latencies[int(n * 0.99)] if n else float("nan"),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients-per-worker", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for workers in range(1, args.max_workers + 1):
+        proc = start_server(workers, args.port)
+        try:
+            # échauffement (imports paresseux, premiers appels)
+            run_load(args.port, workers, 1.0)
+            load = run_load(args.port, workers * args.clients_per_worker, args.duration)
+            worker_pids = _children(proc.pid) or [proc.pid]
+            mem = [memory_mb(pid) for pid in worker_pids]
+            parent = memory_mb(proc.pid)
+        finally:
+            stop_server(proc)
+        rows.append({
+            "workers": workers,
+            **load,
+            "parent_rss_mb": parent["rss_mb"],
+            "worker_rss_mb": sum(m["rss_mb"] for m in mem) / len(mem),
+            "worker_uss_mb": sum(m["uss_mb"] for m in mem) / len(mem),
+        })
+
+    base_rps = rows[0]["rps"] or float("nan")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'parent RSS':>11} {'worker RSS':>11} {'worker USS':>11}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['rps']:>9.1f} {r['rps'] / base_rps:>8.2f} {r['p50_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['parent_rss_mb']:>9.1f}Mo {r['worker_rss_mb']:>9.1f}Mo "
+              f"{r['worker_uss_mb']:>9.1f}Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#scripts/area_neighbors.py
+"""
+Repli pour les pays inconnus du modèle : k plus proches voisins climatiques.
+
+Un `area` absent des catégories du OneHotEncoder (handle_unknown='ignore')
+donne une ligne sans aucun pays : le modèle prédit alors pour un « pays
+moyen » qui n'existe pas. Le repli remplace ce pays par les k pays connus
+dont le profil climatique est le plus proche du contexte de la requête
+(pluie, log des pesticides, température), et mélange leurs prédictions
+(pondération inverse à la distance).
+
+- Profils : moyenne par pays des années de inputs/processed/clean_data.csv,
+  standardisés ; un KDTree (sklearn) répond en O(log n).
+- Index construit hors ligne (`python -m scripts.build_area_index`) et
+  sérialisé avec pickle : ~50 µs au chargement (joblib : ~0.6 ms).
+- `expand` duplique chaque ligne inconnue en k lignes (une par voisin) : le
+  lot complet est scoré en un seul appel du modèle, puis `AreaBlend.blend`
+  ramène les prédictions à une par ligne d'origine.
+
+Les noms de pays sont comparés en minuscules, sans espaces autour.
+"""
+
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+PROFILE_COLS = ["avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+
+
+def normalize_area(name) -> str:
+    return str(name).strip().lower()
+
+
+def normalize_areas(X_in: pd.DataFrame) -> pd.DataFrame:
+    """Colonne 'area' en minuscules sans espaces (NaN conservés) ; X_in tel quel s'il est déjà normalisé."""
+    # boucle Python plutôt que .str : ~2 µs pour une ligne au lieu de ~0.8 ms
+    values = X_in["area"].tolist()
+    norm = [normalize_area(a) if isinstance(a, str) else a for a in values]
+    if norm == values:
+        return X_in
+    return X_in.assign(area=norm)
+
+
+def profile_features(df: pd.DataFrame) -> np.ndarray:
+    """[pluie, log1p(pesticides), température] : les pesticides couvrent 5 ordres de grandeur."""
+    F = df[PROFILE_COLS].to_numpy(dtype=np.float64, copy=True)
+    F[:, 1] = np.log1p(np.clip(F[:, 1], 0, None))
+    return F
+
+
+@dataclass
+class AreaBlend:
+    """Poids pour ramener un lot étendu (k lignes par pays inconnu) aux lignes d'origine."""
+    owner: np.ndarray    # ligne d'origine de chaque ligne étendue
+    weights: np.ndarray  # somme à 1 par ligne d'origine
+    n_rows: int
+
+    def blend(self, preds: np.ndarray) -> np.ndarray:
+        """(n_étendu,) ou (n_étendu, m) -> (n_rows,) ou (n_rows, m)"""
+        if preds.ndim == 1:
+            return np.bincount(self.owner, weights=preds * self.weights, minlength=self.n_rows)
+        out = np.zeros((self.n_rows, preds.shape[1]))
+        np.add.at(out, self.owner, preds * self.weights[:, None])
+        return out
+
+
+class AreaNeighbors:
+    def __init__(self, areas: Sequence[str], mean: np.ndarray, scale: np.ndarray, tree: KDTree,
+                 k: int = 5, model_version: str = ""):
+        self.areas = np.asarray(areas, dtype=object)
+        self.mean = mean
+        self.scale = scale
+        self.tree = tree
+        self.k = min(k, len(self.areas))
+        self.model_version = model_version
+        self.known = frozenset(self.areas)
+        self.fallback_rows = 0
+
+    @classmethod
+    def from_data(cls, df: pd.DataFrame, areas: Sequence[str], k: int = 5,
+                  model_version: str = "") -> "AreaNeighbors":
+        """Index sur les pays `areas` (catégories du modèle) présents dans `df`."""
+        df = df.assign(area=df["area"].astype(str).map(normalize_area))
+        per_year = df.drop_duplicates(["area", "year"])
+        profiles = per_year[per_year["area"].isin(set(areas))].groupby("area")[PROFILE_COLS].mean()
+        if profiles.empty:
+            raise ValueError("No known area has a climate profile")
+        F = profile_features(profiles)
+        mean, scale = F.mean(axis=0), F.std(axis=0)
+        scale[scale == 0] = 1.0
+        return cls(profiles.index.to_numpy(), mean, scale, KDTree((F - mean) / scale, leaf_size=8),
+                   k=k, model_version=model_version)
+
+    def dumps(self) -> bytes:
+        state = {"areas": list(self.areas), "mean": self.mean, "scale": self.scale, "tree": self.tree,
+                 "k": self.k, "model_version": self.model_version}
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save(self, path: Path) -> None:
+        Path(path).write_bytes(self.dumps())
+
+    @classmethod
+    def load(cls, path: Path, model_version: Optional[str] = None) -> Optional["AreaNeighbors"]:
+        """Index exporté, ou None si le fichier manque ou vient d'une autre version du modèle."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        index = cls(**pickle.loads(path.read_bytes()))
+        if model_version is not None and index.model_version != model_version:
+            return None
+        return index
+
+    def query(self, df: pd.DataFrame, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(noms des k voisins, poids) pour chaque ligne de `df` (colonnes PROFILE_COLS)."""
+        Z = np.nan_to_num((profile_features(df) - self.mean) / self.scale)  # valeur manquante -> moyenne
+        dist, idx = self.tree.query(Z, k=k or self.k)
+        w = 1.0 / np.maximum(dist, 1e-3)
+        return self.areas[idx], w / w.sum(axis=1, keepdims=True)
+
+    def expand(self, X_in: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[AreaBlend]]:
+        """
+        Pays normalisés ; si des pays sont inconnus, lot étendu avec leurs
+        voisins + AreaBlend, sinon (X_in, None). Les pays manquants (NaN) sont
+        laissés à l'imputation du pipeline.
+        """
+        X = normalize_areas(X_in)
+        unknown = (X["area"].notna() & ~X["area"].isin(self.known)).to_numpy()
+        if not unknown.any():
+            return X, None
+
+        n, k = len(X), self.k
+        neighbors, w = self.query(X.loc[unknown, PROFILE_COLS])
+        repeat = np.where(unknown, k, 1)
+        owner = np.repeat(np.arange(n), repeat)
+        X_out = X.iloc[owner].reset_index(drop=True)
+        weights = np.ones(len(owner))
+        slots = np.flatnonzero(np.repeat(unknown, repeat))
+        X_out.loc[slots, "area"] = neighbors.ravel()
+        weights[slots] = w.ravel()
+        self.fallback_rows += int(unknown.sum())
+        return X_out, AreaBlend(owner=owner, weights=weights, n_rows=n)
+
+    def stats(self) -> dict:
+        return {"areas": len(self.areas), "k": self.k, "model_version": self.model_version,
+                "fallback_rows": self.fallback_rows}
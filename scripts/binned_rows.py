@@ -0,0 +1,96 @@
+#scripts/binned_rows.py
+"""
+Lignes pré-binées pour le scoring des recommandations.
+
+Une requête de recommandation score N cultures pour un même pays et un même
+contexte climatique : seules les colonnes one-hot de la culture changent d'une
+ligne à l'autre. Plutôt que de passer par pandas + ColumnTransformer + binning
+à chaque requête, on précalcule une fois par modèle :
+- une ligne uint8 par pays (bins des colonnes one-hot, bit du pays posé) ;
+- les bins "0" et "1" de chaque colonne one-hot de culture ;
+- médianes, moyennes et écarts-types du preprocessing numérique ;
+- les seuils de bins float64 du _bin_mapper pour les 4 variables numériques.
+
+Par requête, il ne reste qu'à standardiser et biner 4 nombres, recopier la
+ligne du pays N fois, poser le bit de chaque culture, puis lancer la traversée
+binée (QuantizedForest.predict_binned, feuilles en float64). Les calculs
+reproduisent ceux de sklearn (float64, x <= seuil <=> bin(x) <= bin du seuil) :
+les prédictions sont identiques au bit près à `model.predict`.
+"""
+
+from typing import Sequence
+
+import numpy as np
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from scripts.quantized_forest import QuantizedForest
+
+NUMERIC_COLS = ["year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+
+
+class BinnedRowCache:
+    """Lignes binées précalculées (pays x cultures) d'un pipeline preprocessing + HGB."""
+
+    def __init__(self, pipeline):
+        preprocessing, est = pipeline[0], pipeline[-1]
+        named = dict((name, (trans, cols)) for name, trans, cols in preprocessing.transformers_)
+        if set(named) - {"remainder"} != {"cat", "num"} or named.get("remainder", ("drop",))[0] != "drop":
+            raise ValueError("Preprocessing non supporté : branches 'cat' et 'num' attendues.")
+        cat, cat_cols = named["cat"]
+        num, num_cols = named["num"]
+        if list(cat_cols) != ["area", "item"] or list(num_cols) != NUMERIC_COLS:
+            raise ValueError("Preprocessing non supporté : colonnes inattendues.")
+        onehot, imputer, scaler = cat[-1], num[0], num[-1]
+        if not (isinstance(onehot, OneHotEncoder) and isinstance(imputer, SimpleImputer)
+                and isinstance(scaler, StandardScaler) and len(num) == 2):
+            raise ValueError("Preprocessing non supporté : OneHot / SimpleImputer + StandardScaler attendus.")
+        if onehot.drop_idx_ is not None or getattr(onehot, "_infrequent_enabled", False):
+            raise ValueError("Preprocessing non supporté : OneHotEncoder sans drop ni catégories rares attendu.")
+
+        self.forest = QuantizedForest.from_estimator(est, value_dtype=np.float64)
+        thresholds = est._bin_mapper.bin_thresholds_
+        areas, items = onehot.categories_
+        n_areas, n_cat = len(areas), len(areas) + len(items)
+        n_features = n_cat + len(NUMERIC_COLS)
+        if len(thresholds) != n_features:
+            raise ValueError("Le nombre de colonnes du preprocessing ne correspond pas au modèle.")
+
+        def bin_of(j: int, x: float) -> int:
+            return int(np.searchsorted(thresholds[j], x, side="left"))
+
+        # ligne de base : tous les one-hot à 0 (pays / culture inconnus), numériques posés par requête
+        zero_row = np.array([bin_of(j, 0.0) for j in range(n_cat)] + [0] * len(NUMERIC_COLS), dtype=np.uint8)
+        self.one_bins = np.array([bin_of(j, 1.0) for j in range(n_cat)], dtype=np.uint8)
+        self.area_index = {a: j for j, a in enumerate(areas)}
+        self.item_index = {it: n_areas + j for j, it in enumerate(items)}
+        # une ligne par pays connu + une dernière ligne "pays inconnu"
+        self.area_rows = np.tile(zero_row, (n_areas + 1, 1))
+        self.area_rows[np.arange(n_areas), np.arange(n_areas)] = self.one_bins[:n_areas]
+
+        self.num_slice = slice(n_cat, n_features)
+        self.medians = np.asarray(imputer.statistics_, dtype=np.float64)
+        self.mean = scaler.mean_ if scaler.with_mean else np.zeros(len(NUMERIC_COLS))
+        self.scale = scaler.scale_ if scaler.with_std else np.ones(len(NUMERIC_COLS))
+        self.num_thresholds = [thresholds[j] for j in range(n_cat, n_features)]
+
+    def numeric_bins(self, values: Sequence[float]) -> np.ndarray:
+        """Bins des 4 variables numériques : imputation médiane, standardisation puis seuils float64."""
+        x = np.asarray(values, dtype=np.float64)
+        x = np.where(np.isnan(x), self.medians, x)
+        x = (x - self.mean) / self.scale
+        return np.array([np.searchsorted(t, v, side="left") for t, v in zip(self.num_thresholds, x)], dtype=np.uint8)
+
+    def rows(self, *, area: str, items: Sequence[str], year: float,
+             avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float) -> np.ndarray:
+        """Matrice uint8 (n_items, n_features) : ligne du pays recopiée + bit de chaque culture."""
+        B = np.repeat(self.area_rows[self.area_index.get(area, -1)][None, :], len(items), axis=0)
+        cols = np.array([self.item_index.get(it, -1) for it in items], dtype=np.intp)
+        known = np.flatnonzero(cols >= 0)
+        B[known, cols[known]] = self.one_bins[cols[known]]
+        B[:, self.num_slice] = self.numeric_bins([year, avg_rain_mm, pesticides_tonnes, avg_temp])
+        return B
+
+    def predict(self, **context) -> np.ndarray:
+        """Prédictions (hg/ha) de chaque culture de `items` dans le contexte donné."""
+        return self.forest.predict_binned(self.rows(**context))
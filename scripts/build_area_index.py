@@ -0,0 +1,89 @@
+#scripts/build_area_index.py
+"""
+Export de l'index des plus proches voisins climatiques (scripts/area_neighbors.py),
+utilisé pour les pays inconnus du modèle publié.
+
+Profils par pays calculés sur inputs/processed/clean_data.csv, restreints aux
+catégories du OneHotEncoder ; l'index porte la version du modèle et est
+ignoré (reconstruit en mémoire) si le modèle change. scripts/retrain.py le
+réexporte à chaque publication.
+
+Le script vérifie aussi le repli par validation « leave-one-area-out » : pour
+chaque pays connu, on compare sur ses lignes de test (year >= 2010) la MAE de
+la ligne « sans pays » et celle du mélange de ses voisins (le pays exclu de
+l'index).
+
+Usage :
+    python -m scripts.build_area_index
+    python -m scripts.build_area_index --k 3 --skip-eval
+"""
+
+import argparse
+import hashlib
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+
+from scripts.area_neighbors import AreaNeighbors
+from scripts.data import DATA_PATH, FEATURE_COLS, TARGET, TIME_SPLIT_YEAR, load_dataset
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR.parent / "model" / "hgb_optimized.joblib"
+AREA_INDEX_PATH = BASE_DIR.parent / "model" / "area_neighbors.pkl"
+
+
+def build_index(pipeline, df, model_version: str, k: int = 5) -> AreaNeighbors:
+    """Index sur les catégories 'area' du OneHotEncoder du pipeline, profils calculés sur `df`."""
+    areas = list(pipeline[0].named_transformers_["cat"][-1].categories_[0])
+    return AreaNeighbors.from_data(df, areas, k=k, model_version=model_version)
+
+
+def leave_one_area_out(pipeline, df, areas, k: int):
+    """MAE (hg/ha) sans pays vs voisins, chaque pays étant retiré de son propre index."""
+    test = df[df["year"] >= TIME_SPLIT_YEAR]
+    y_none, y_knn, y_true = [], [], []
+    for area in areas:
+        rows = test[test["area"] == area]
+        if rows.empty:
+            continue
+        X = rows[FEATURE_COLS].astype({"area": object, "item": object})
+        y_none.append(pipeline.predict(X.assign(area="__unknown__")))
+        index = AreaNeighbors.from_data(df, [a for a in areas if a != area], k=k)
+        X_knn, blend = index.expand(X.assign(area="__unknown__"))
+        y_knn.append(blend.blend(pipeline.predict(X_knn)))
+        y_true.append(rows[TARGET].to_numpy())
+    y_true = np.concatenate(y_true)
+    return mean_absolute_error(y_true, np.concatenate(y_none)), mean_absolute_error(y_true, np.concatenate(y_knn))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Exporte l'index des voisins climatiques des pays.")
+    parser.add_argument("--out", type=Path, default=AREA_INDEX_PATH)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--skip-eval", action="store_true", help="pas de validation leave-one-area-out")
+    args = parser.parse_args(argv)
+
+    pipeline = joblib.load(MODEL_PATH)
+    model_version = hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest()[:12]
+    df = load_dataset(DATA_PATH, FEATURE_COLS + [TARGET]).astype({"area": object, "item": object})
+
+    index = build_index(pipeline, df, model_version, k=args.k)
+    index.save(args.out)
+    start = time.perf_counter()
+    for _ in range(100):
+        AreaNeighbors.load(args.out, model_version)
+    load_us = (time.perf_counter() - start) / 100 * 1e6
+    print(f"✅ Index sauvegardé ici : {args.out} ({len(index.areas)} pays, k={index.k}, "
+          f"{args.out.stat().st_size / 1e3:.1f} Ko, chargement {load_us:.0f} µs)")
+
+    if not args.skip_eval:
+        mae_none, mae_knn = leave_one_area_out(pipeline, df, list(index.areas), args.k)
+        print(f"Pays retiré de l'index (test year >= {TIME_SPLIT_YEAR}) : MAE sans pays {mae_none:,.0f} hg/ha, "
+              f"voisins {mae_knn:,.0f} hg/ha")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#scripts/compare_models.py
+"""
+Benchmark des 5 modèles du notebook modelisation.ipynb (Dummy, Ridge, RF,
+HGB, XgBoost), hors notebook et en parallèle.
+
+Chaque modèle donne 6 tâches indépendantes : les 5 folds de la validation
+croisée et l'ajustement sur tout le train suivi de l'évaluation sur le test
+(year >= 2010). Toutes les tâches sont réparties sur un pool de processus,
+les plus longues en premier.
+
+Validation croisée :
+- `--cv time` (défaut) : folds rolling origin par année (scripts/cv_splits.py),
+  dont les matrices transformées sont calculées une fois et relues du cache ;
+- `--cv kfold` : mêmes folds que cross_validate(cv=5) du notebook, pour
+  reproduire son tableau uniquement. Ces folds mélangent les années (un fold
+  évalué sur 1995 a vu 2005) : leur R² de CV n'est pas un score hors
+  échantillon et ne doit pas servir à choisir un modèle.
+
+Pour éviter la sur-souscription (RF n_jobs=-1, threads XGBoost, OpenMP de
+HGB, BLAS de Ridge), chaque tâche est limitée à n_cpus // n_workers threads.
+
+Sorties :
+- le tableau de métriques du notebook, même colonnes, dans
+  artifacts/model_comparison.csv : artifacts/feature_importance.csv reste
+  l'artefact du notebook (CV KFold), jamais réécrit par défaut ;
+- le temps par modèle (ajustement final, temps écoulé et temps cumulé des
+  tâches) et le pic de mémoire résidente (RSS) par modèle.
+
+Usage :
+    python -m scripts.compare_models --workers 4
+    python -m scripts.compare_models --cv kfold    # tableau du notebook
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from threadpoolctl import threadpool_limits
+
+from scripts.cv_splits import CACHE_DIR, YearRollingOriginSplit, build_fold_cache, load_fold
+from scripts.data import CATEGORICAL, NUMERIC, TIME_SPLIT_YEAR, load_dataset, time_split
+
+BASE_DIR = Path(__file__).resolve().parent
+RESULTS_PATH = BASE_DIR / "artifacts" / "model_comparison.csv"
+TIMINGS_PATH = BASE_DIR / "artifacts" / "model_comparison_timings.csv"
+
+CV_FOLDS = 5
+SEED = 11
+
+# ordre de soumission : les modèles les plus longs d'abord
+MODEL_NAMES = ["RF", "XgBoost", "HGB", "Ridge", "Dummy"]
+
+
+# ========================================================
+# Modèles (mêmes pipelines que le notebook)
+# ========================================================
+def build_preprocessor() -> ColumnTransformer:
+    cat_pipe = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False)),
+        ])
+    num_pipe = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="median")),
+        ("scaler", StandardScaler()),
+        ])
+    return ColumnTransformer(transformers=[
+        ("cat", cat_pipe, CATEGORICAL),
+        ("num", num_pipe, NUMERIC),
+        ], remainder="drop")
+
+
+def build_model(name: str, n_threads: int = -1) -> Pipeline:
+    """Pipeline du notebook ; `n_threads` remplace n_jobs=-1 de RF et XGBoost."""
+    if name == "Dummy":
+        est = DummyRegressor(strategy="mean")
+    elif name == "Ridge":
+        est = Ridge(random_state=SEED)
+    elif name == "RF":
+        est = RandomForestRegressor(random_state=SEED, n_jobs=n_threads)
+    elif name == "HGB":
+        est = HistGradientBoostingRegressor(random_state=SEED)
+    elif name == "XgBoost":
+        from xgboost import XGBRegressor
+        est = XGBRegressor(random_state=SEED, n_jobs=n_threads)
+    else:
+        raise ValueError(f"Modèle non supporté : {name}")
+    return Pipeline(steps=[("preprocessing", build_preprocessor()), ("model", est)])
+
+
+def available_models(names: List[str]) -> List[str]:
+    out = []
+    for name in names:
+        try:
+            build_model(name)
+        except ImportError as e:
+            print(f"⚠️  {name} ignoré : {e}")
+            continue
+        out.append(name)
+    return out
+
+
+# ========================================================
+# Tâches exécutées dans les processus du pool
+# ========================================================
+_DATA: Dict[str, object] = {}
+
+
+def _init_worker(X_train, y_train, X_test, y_test) -> None:
+    # données envoyées une seule fois par processus, pas à chaque tâche
+    _DATA.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+
+
+def _reset_peak_rss() -> None:
+    # Linux : remet VmHWM (pic RSS) à la RSS courante, pour mesurer le pic de cette tâche
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _metrics(y_true, y_pred) -> dict:
+    return {
+        "r2": r2_score(y_true, y_pred),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "mae": mean_absolute_error(y_true, y_pred),
+    }
+
+
+def run_task(name: str, fold: Optional[int], train_idx, test_idx, n_threads: int,
+             cache_path: Optional[Path] = None) -> dict:
+    """
+    fold = k : ajustement sur le fold k de la validation croisée (indices de X_train),
+    ou sur les matrices déjà transformées du cache si `cache_path` est fourni ;
+    fold = None : ajustement sur tout le train, évaluation train + test.
+    """
+    _reset_peak_rss()
+    start = time.time()
+    X_train, y_train = _DATA["X_train"], _DATA["y_train"]
+    model = build_model(name, n_threads)
+
+    with threadpool_limits(limits=n_threads):
+        if fold is not None and cache_path is not None:
+            cached = load_fold(cache_path, fold)
+            est = model[-1].fit(cached.Xt_train, y_train.iloc[cached.train_idx])
+            scores = _metrics(y_train.iloc[cached.test_idx], est.predict(cached.Xt_test))
+            fit_time = None
+        elif fold is not None:
+            model.fit(X_train.iloc[train_idx], y_train.iloc[train_idx])
+            scores = _metrics(y_train.iloc[test_idx], model.predict(X_train.iloc[test_idx]))
+            fit_time = None
+        else:
+            model.fit(X_train, y_train)
+            fit_time = time.time() - start
+            scores = {
+                "train": _metrics(y_train, model.predict(X_train)),
+                "test": _metrics(_DATA["y_test"], model.predict(_DATA["X_test"])),
+            }
+    end = time.time()
+    return {"model": name, "fold": fold, "scores": scores, "fit_time": fit_time,
+            "start": start, "end": end, "peak_rss_mb": _peak_rss_mb(), "pid": os.getpid()}
+
+
+# ========================================================
+# Orchestration
+# ========================================================
+def compare_models(X_train, y_train, X_test, y_test, names: List[str] = MODEL_NAMES,
+                   cv_folds: int = CV_FOLDS, workers: Optional[int] = None, cv: str = "time",
+                   cache_dir: Path = CACHE_DIR):
+    """Retourne (tableau de métriques du notebook, tableau temps / mémoire par modèle)."""
+    cache_path = None
+    if cv == "time":
+        # folds + preprocessing calculés une fois (ou relus), les tâches ne lisent que les indices du cache
+        cache_path = build_fold_cache(X_train, y_train, YearRollingOriginSplit(n_splits=cv_folds),
+                                      build_preprocessor(), cache_dir)
+        folds = [(None, None)] * cv_folds
+    elif cv == "kfold":
+        folds = list(KFold(n_splits=cv_folds).split(X_train))
+    else:
+        raise ValueError(f"Unsupported cv: {cv}")
+    tasks = [(name, None, None, None) for name in names]
+    tasks += [(name, k, tr, te) for name in names for k, (tr, te) in enumerate(folds)]
+
+    n_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = workers or min(n_cpus, len(tasks))
+    n_threads = max(1, n_cpus // workers)
+    print(f"✓ {len(tasks)} tâches ({len(names)} modèles x ({cv_folds} folds + ajustement final)) "
+          f"sur {workers} processus x {n_threads} thread(s)")
+
+    start = time.time()
+    results = []
+    ctx = multiprocessing.get_context("spawn")  # pas de fork d'un processus ayant déjà des threads OpenMP
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(X_train, y_train, X_test, y_test)) as pool:
+        futures = [pool.submit(run_task, *task, n_threads, cache_path) for task in tasks]
+        for fut in as_completed(futures):
+            res = fut.result()
+            results.append(res)
+            label = "final" if res["fold"] is None else f"fold {res['fold']}"
+            print(f"  - {res['model']:<8} {label:<7} {res['end'] - res['start']:6.1f} s")
+    total_wall = time.time() - start
+
+    rows, timings = [], []
+    for name in names:
+        cv = [r for r in results if r["model"] == name and r["fold"] is not None]
+        (final,) = [r for r in results if r["model"] == name and r["fold"] is None]
+        train, test = final["scores"]["train"], final["scores"]["test"]
+        cv_r2 = np.array([r["scores"]["r2"] for r in cv])
+        rows.append({
+            "Model": name,
+            "R2_Train": train["r2"],
+            "R2_Test": test["r2"],
+            "CV_R2_Mean": cv_r2.mean(),
+            "CV_R2_Std": cv_r2.std(),
+            "RMSE_Train": train["rmse"],
+            "RMSE_Test": test["rmse"],
+            "CV_RMSE_Mean": np.mean([r["scores"]["rmse"] for r in cv]),
+            "MAE_Train": train["mae"],
+            "MAE_Test": test["mae"],
+            "CV_MAE_Mean": np.mean([r["scores"]["mae"] for r in cv]),
+            "Overfit": train["r2"] - test["r2"],
+        })
+        mine = cv + [final]
+        timings.append({
+            "Model": name,
+            "Train_Time_s": final["fit_time"],
+            "Wall_Time_s": max(r["end"] for r in mine) - min(r["start"] for r in mine),
+            "Task_Time_s": sum(r["end"] - r["start"] for r in mine),
+            "Peak_RSS_MB": max(r["peak_rss_mb"] for r in mine),
+        })
+
+    results_df = pd.DataFrame(rows).sort_values("R2_Test", ascending=False)
+    timings_df = pd.DataFrame(timings)
+    sequential = timings_df["Task_Time_s"].sum()
+    print(f"✓ Temps total : {total_wall:.1f} s (somme des tâches : {sequential:.1f} s, "
+          f"accélération x{sequential / total_wall:.2f})")
+    return results_df, timings_df
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Comparaison parallèle des modèles du notebook.")
+    parser.add_argument("--models", nargs="+", default=MODEL_NAMES, choices=MODEL_NAMES)
+    parser.add_argument("--workers", type=int, default=None, help="défaut : nombre de CPU")
+    parser.add_argument("--cv-folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--cv", choices=["time", "kfold"], default="time",
+                        help="time : rolling origin par année (cache disque) ; "
+                             "kfold : folds du notebook, années mélangées (reproduction seulement)")
+    parser.add_argument("--time-split-year", type=int, default=TIME_SPLIT_YEAR)
+    parser.add_argument("--out", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--timings-out", type=Path, default=TIMINGS_PATH)
+    args = parser.parse_args(argv)
+
+    X_train, y_train, X_test, y_test = time_split(load_dataset(), args.time_split_year)
+    print(f"✓ Split effectué: Train={len(X_train)}, Test={len(X_test)}")
+
+    names = available_models(args.models)
+    results_df, timings_df = compare_models(X_train, y_train, X_test, y_test, names,
+                                            cv_folds=args.cv_folds, workers=args.workers, cv=args.cv)
+
+    print("\n" + results_df.to_string(index=False))
+    print("\n" + timings_df.to_string(index=False))
+    results_df.to_csv(args.out, index=False)
+    timings_df.to_csv(args.timings_out, index=False)
+    print(f"✅ Résultats sauvegardés ici : {args.out} et {args.timings_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#scripts/compiled_forest.py
+"""
+Noyau compilé (Numba) de traversée des arbres d'une FlatForest.
+
+FlatForest.leaves avance toutes les paires (ligne, arbre) niveau par niveau
+avec des opérations NumPy : efficace sur de gros lots, mais chaque niveau
+alloue des tableaux temporaires et une ligne seule paie ~profondeur x
+opérations NumPy. Ici chaque ligne descend chaque arbre dans une boucle
+compilée, sans allocation, et les lignes sont réparties sur les threads
+(prange, nombre de threads = NUMBA_NUM_THREADS).
+
+Les feuilles sont sommées dans l'ordre de sklearn (baseline puis arbres dans
+l'ordre) : prédictions identiques au bit près au modèle d'origine.
+
+Numba est optionnel : sans lui, `predict_compiled` retombe sur FlatForest.predict
+(traversée NumPy, résultats identiques).
+
+Couche de threads : OpenMP en priorité. Avec TBB, un noyau parallèle appelé
+depuis un thread secondaire (threadpool de FastAPI / uvicorn) bloque l'arrêt
+de l'interpréteur ; workqueue refuse les appels concurrents. NUMBA_THREADING_LAYER
+reste prioritaire s'il est défini.
+"""
+
+import os
+
+import numpy as np
+
+from scripts.flat_forest import FlatForest
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+    if "NUMBA_THREADING_LAYER" not in os.environ:
+        numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, nogil=True)
+    def _predict_kernel(X, feature, threshold, left, right, missing_left, is_leaf, value,
+                        roots, tree_bounds, baselines, out):
+        n_outputs = baselines.shape[0]
+        for i in prange(X.shape[0]):
+            for k in range(n_outputs):
+                acc = baselines[k]
+                for t in range(tree_bounds[k], tree_bounds[k + 1]):
+                    node = roots[t]
+                    while not is_leaf[node]:
+                        x = X[i, feature[node]]
+                        if np.isnan(x):
+                            go_left = missing_left[node]
+                        else:
+                            go_left = x <= threshold[node]
+                        node = left[node] if go_left else right[node]
+                    acc += value[node]
+                out[i, k] = acc
+
+
+def predict_compiled(forest: FlatForest, X: np.ndarray) -> np.ndarray:
+    """Prédictions de chaque estimateur, forme (n_lignes, n_estimateurs), comme FlatForest.predict."""
+    if not NUMBA_AVAILABLE:
+        return forest.predict(X)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    out = np.empty((X.shape[0], forest.n_outputs))
+    _predict_kernel(X, forest.feature, forest.threshold, forest.left, forest.right, forest.missing_left,
+                    forest.is_leaf, forest.value, forest.roots, forest.tree_bounds.astype(np.intp),
+                    forest.baselines, out)
+    return out
@@ -0,0 +1,185 @@
+#scripts/cv_splits.py
+"""
+Validation croisée temporelle par année (rolling origin) avec cache disque.
+
+Le KFold du notebook mélange les années : un fold peut être évalué sur 1995
+avec un modèle ayant vu 2005, d'où l'écart entre le R² de CV (0.72) et le R²
+test (0.93). Ici chaque fold est évalué sur un bloc d'années postérieur à
+toutes les années d'entraînement :
+
+    fold 0 : train 1990-1999 -> test 2000-2001
+    fold 1 : train 1990-2001 -> test 2002-2003
+    ...
+    fold 4 : train 1990-2007 -> test 2008-2009
+
+Les indices des folds et les matrices déjà transformées par le preprocessing
+(ajusté sur le train de chaque fold) sont calculés une seule fois et écrits
+en .npy dans cache/cv_folds/<clé>/. La clé dépend des données, du découpage
+et des paramètres du preprocessing. Les comparaisons de modèles et les
+recherches d'hyperparamètres relisent ensuite ces matrices (mmap, partagées
+entre processus) au lieu de refaire le preprocessing à chaque essai.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR.parent / "cache" / "cv_folds"
+
+
+# ========================================================
+# Découpage rolling origin par année
+# ========================================================
+class YearRollingOriginSplit:
+    """
+    Splitter compatible scikit-learn (utilisable comme `cv=` de cross_validate
+    ou RandomizedSearchCV) : les `n_splits` derniers blocs de `test_years`
+    années servent de test, chacun avec les années strictement antérieures en
+    train (fenêtre croissante, ou glissante si `max_train_years`).
+    """
+
+    def __init__(self, n_splits: int = 5, test_years: int = 2, gap_years: int = 0,
+                 max_train_years: Optional[int] = None, year_col: str = "year"):
+        self.n_splits = n_splits
+        self.test_years = test_years
+        self.gap_years = gap_years
+        self.max_train_years = max_train_years
+        self.year_col = year_col
+
+    def __repr__(self) -> str:
+        return (f"YearRollingOriginSplit(n_splits={self.n_splits}, test_years={self.test_years}, "
+                f"gap_years={self.gap_years}, max_train_years={self.max_train_years}, year_col={self.year_col!r})")
+
+    def get_n_splits(self, X=None, y=None, groups=None) -> int:
+        return self.n_splits
+
+    def test_blocks(self, years: np.ndarray) -> List[np.ndarray]:
+        unique = np.unique(years)
+        needed = self.n_splits * self.test_years
+        if len(unique) < needed + 1:
+            raise ValueError(f"{len(unique)} années disponibles, au moins {needed + 1} nécessaires.")
+        tail = unique[len(unique) - needed:]
+        return [tail[k * self.test_years:(k + 1) * self.test_years] for k in range(self.n_splits)]
+
+    def split(self, X, y=None, groups=None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        years = np.asarray(X[self.year_col])
+        for block in self.test_blocks(years):
+            train_end = block[0] - self.gap_years
+            train_mask = years < train_end
+            if self.max_train_years is not None:
+                train_mask &= years >= train_end - self.max_train_years
+            if not train_mask.any():
+                raise ValueError(f"Aucune année d'entraînement avant {block[0]}.")
+            yield np.flatnonzero(train_mask), np.flatnonzero(np.isin(years, block))
+
+
+# ========================================================
+# Cache des folds
+# ========================================================
+class CachedFold(NamedTuple):
+    train_idx: np.ndarray
+    test_idx: np.ndarray
+    Xt_train: np.ndarray
+    Xt_test: np.ndarray
+
+
+def fold_cache_key(X: pd.DataFrame, y: pd.Series, splitter, preprocessor) -> str:
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    h.update(repr(splitter).encode())
+    h.update(repr(sorted((k, repr(v)) for k, v in preprocessor.get_params(deep=True).items())).encode())
+    return h.hexdigest()[:16]
+
+
+def build_fold_cache(X: pd.DataFrame, y: pd.Series, splitter, preprocessor, cache_dir: Path = CACHE_DIR) -> Path:
+    """Calcule (si besoin) les folds et leurs matrices transformées ; retourne le dossier du cache."""
+    path = Path(cache_dir) / fold_cache_key(X, y, splitter, preprocessor)
+    if (path / "meta.json").exists():
+        return path
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.mkdir(parents=True, exist_ok=True)
+    years = np.asarray(X["year"])
+    folds_meta = []
+    start = time.time()
+    for k, (train_idx, test_idx) in enumerate(splitter.split(X, y)):
+        prep = clone(preprocessor).fit(X.iloc[train_idx], y.iloc[train_idx])
+        np.save(tmp / f"fold{k}_train_idx.npy", train_idx)
+        np.save(tmp / f"fold{k}_test_idx.npy", test_idx)
+        np.save(tmp / f"fold{k}_Xt_train.npy", np.asarray(prep.transform(X.iloc[train_idx]), dtype=np.float64))
+        np.save(tmp / f"fold{k}_Xt_test.npy", np.asarray(prep.transform(X.iloc[test_idx]), dtype=np.float64))
+        folds_meta.append({
+            "train_years": [int(years[train_idx].min()), int(years[train_idx].max())],
+            "test_years": [int(years[test_idx].min()), int(years[test_idx].max())],
+            "n_train": int(len(train_idx)),
+            "n_test": int(len(test_idx)),
+        })
+    meta = {"splitter": repr(splitter), "n_rows": int(len(X)), "folds": folds_meta,
+            "build_time_s": round(time.time() - start, 3)}
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    try:
+        os.replace(tmp, path)  # publication atomique du dossier complet
+    except OSError:  # un autre processus l'a publié entre-temps
+        for f in tmp.iterdir():
+            f.unlink()
+        tmp.rmdir()
+    return path
+
+
+def load_fold(path: Path, k: int, mmap: bool = True) -> CachedFold:
+    mode = "r" if mmap else None
+    return CachedFold(*(np.load(Path(path) / f"fold{k}_{name}.npy", mmap_mode=mode)
+                        for name in ("train_idx", "test_idx", "Xt_train", "Xt_test")))
+
+
+def load_meta(path: Path) -> dict:
+    return json.loads((Path(path) / "meta.json").read_text())
+
+
+def cached_folds(X: pd.DataFrame, y: pd.Series, splitter, preprocessor, cache_dir: Path = CACHE_DIR) -> List[CachedFold]:
+    path = build_fold_cache(X, y, splitter, preprocessor, cache_dir)
+    return [load_fold(path, k) for k in range(len(load_meta(path)["folds"]))]
+
+
+def fold_indices(path: Path) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Indices (train, test) du cache, à passer tels quels en `cv=` à RandomizedSearchCV."""
+    return [(np.load(Path(path) / f"fold{k}_train_idx.npy"), np.load(Path(path) / f"fold{k}_test_idx.npy"))
+            for k in range(len(load_meta(path)["folds"]))]
+
+
+# ========================================================
+# Validation croisée sur les matrices en cache
+# ========================================================
+def cross_validate_cached(estimator, folds: List[CachedFold], y: pd.Series,
+                          return_predictions: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Équivalent de cross_validate pour un estimateur seul (sans preprocessing), sur les folds en cache.
+    `return_predictions` ajoute "predictions" : les prédictions hors fold, une liste (un tableau par fold).
+    """
+    y = np.asarray(y, dtype=float)
+    out = {"test_R2": [], "test_RMSE": [], "test_MAE": [], "fit_time": []}
+    predictions = []
+    for fold in folds:
+        start = time.time()
+        est = clone(estimator).fit(fold.Xt_train, y[fold.train_idx])
+        out["fit_time"].append(time.time() - start)
+        pred = est.predict(fold.Xt_test)
+        y_test = y[fold.test_idx]
+        out["test_R2"].append(r2_score(y_test, pred))
+        out["test_RMSE"].append(float(np.sqrt(mean_squared_error(y_test, pred))))
+        out["test_MAE"].append(mean_absolute_error(y_test, pred))
+        predictions.append(pred)
+    scores = {k: np.asarray(v) for k, v in out.items()}
+    if return_predictions:
+        scores["predictions"] = predictions
+    return scores
@@ -0,0 +1,71 @@
+#scripts/data.py
+"""
+Chargement typé et compact de inputs/processed/clean_data.csv, pour
+l'entraînement et les jobs d'analyse / de précalcul.
+
+Lu tel quel, le CSV donne des colonnes 'area' et 'item' en object et des
+numériques en int64 / float64, plus 'area_code' et 'item_code' qui doublonnent
+'area' et 'item'. Le chargeur compact :
+- type 'area' et 'item' en category (groupby plus rapides, ~1 octet par ligne) ;
+- passe 'year' en int16 ;
+- garde les variables climatiques et la cible en float64 : ce sont les valeurs
+  que voit l'API, l'entraînement et l'évaluation les voient donc aussi ;
+- ne lit pas les colonnes *_code.
+
+Sur les 28 242 lignes : 5.2 Mo -> 1.0 Mo en mémoire (x5), groupby
+(area, item) ~1.5x plus rapides.
+
+`float32=True` passe en plus le climat en float32 (0.7 Mo, x7.6), pour les
+analyses en mémoire seulement : 16.37 lu en float32 vaut 16.3700008, et un
+seuil d'arbre tombant exactement sur une valeur peut basculer (le modèle
+publié a un R² test de 0.95743 sur ces données au lieu de 0.95757). Ne pas
+s'en servir pour ajuster ou évaluer un modèle.
+"""
+
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_PATH = BASE_DIR.parent / "inputs" / "processed" / "clean_data.csv"
+
+FEATURE_COLS = ["area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+CATEGORICAL = ["area", "item"]
+NUMERIC = ["year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+TARGET = "hg/ha_yield"
+CODE_COLS = ["area_code", "item_code"]
+TIME_SPLIT_YEAR = 2010
+
+COMPACT_DTYPES = {
+    "area": "category",
+    "item": "category",
+    "year": "int16",
+    "avg_rain_mm": "float64",
+    "pesticides_tonnes": "float64",
+    "avg_temp": "float64",
+    TARGET: "float64",
+}
+# analyses en mémoire uniquement (voir plus haut)
+FLOAT32_DTYPES = {**COMPACT_DTYPES, "avg_rain_mm": "float32", "pesticides_tonnes": "float32", "avg_temp": "float32"}
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Applique les types compacts aux colonnes présentes (sans les colonnes *_code)."""
+    df = df.drop(columns=[c for c in CODE_COLS if c in df.columns])
+    return df.astype({c: t for c, t in COMPACT_DTYPES.items() if c in df.columns})
+
+
+def load_dataset(path: Path = DATA_PATH, columns: Optional[Sequence[str]] = None,
+                 float32: bool = False) -> pd.DataFrame:
+    """Lit le CSV directement dans les types compacts (toutes les colonnes utiles par défaut)."""
+    wanted = list(columns) if columns is not None else FEATURE_COLS + [TARGET]
+    dtypes = FLOAT32_DTYPES if float32 else COMPACT_DTYPES
+    return pd.read_csv(path, usecols=wanted, dtype={c: t for c, t in dtypes.items() if c in wanted})
+
+
+def time_split(df: pd.DataFrame, time_split_year: int = TIME_SPLIT_YEAR):
+    """(X_train, y_train, X_test, y_test) : train = year < time_split_year, test = le reste."""
+    train_mask = df["year"] < time_split_year
+    X, y = df[FEATURE_COLS], df[TARGET]
+    return X[train_mask], y[train_mask], X[~train_mask], y[~train_mask]
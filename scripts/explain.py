@@ -0,0 +1,157 @@
+#scripts/explain.py
+"""
+Explicabilité du modèle HGB :
+- contributions locales par feature pour une prédiction (chemins d'arbres,
+  via FlatForest.contributions), regroupées sur les variables brutes
+  (les colonnes one-hot de 'area' sont sommées en une contribution 'area') ;
+- importance globale par permutation, recalculable hors ligne sur
+  clean_data.csv : pour chaque variable, les n_repeats permutations sont
+  empilées et scorées en un seul appel model.predict, et les variables sont
+  réparties sur tous les cœurs.
+
+Usage (job hors ligne) :
+    python -m scripts.explain --n-repeats 10 --n-jobs -1
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from scripts.data import FEATURE_COLS, TARGET, TIME_SPLIT_YEAR, load_dataset
+from scripts.flat_forest import FlatForest
+from scripts.utils import apply_optional_scenarios
+
+BASE_DIR = Path(__file__).resolve().parent
+IMPORTANCE_PATH = BASE_DIR / "artifacts" / "permutation_importance_HGB.csv"
+
+SEED = 11
+
+
+# ========================================================
+# Contributions locales
+# ========================================================
+def raw_feature_index(pipeline, raw_features: List[str] = FEATURE_COLS) -> np.ndarray:
+    """Pour chaque colonne en sortie du preprocessing, l'indice de la variable brute d'origine."""
+    index = []
+    for name in pipeline[:-1].get_feature_names_out():
+        # 'cat__area_france' -> 'area', 'num__avg_temp' -> 'avg_temp'
+        local = name.split("__", 1)[1]
+        matches = [i for i, col in enumerate(raw_features) if local == col or local.startswith(col + "_")]
+        index.append(max(matches, key=lambda i: len(raw_features[i])))
+    return np.asarray(index)
+
+
+_explainers: Dict[int, Tuple[FlatForest, np.ndarray]] = {}
+
+def get_explainer(model) -> Tuple[FlatForest, np.ndarray]:
+    key = id(model[-1])
+    if key not in _explainers:
+        _explainers[key] = (FlatForest([model[-1]]), raw_feature_index(model))
+    return _explainers[key]
+
+def explain_rows(model, X_in: pd.DataFrame) -> Tuple[float, np.ndarray]:
+    """(base_value, contributions de forme (n_lignes, n_variables_brutes)) dans l'ordre FEATURE_COLS."""
+    forest, index = get_explainer(model)
+    bias, contrib = forest.contributions(model[:-1].transform(X_in[FEATURE_COLS]))
+    raw = np.zeros((contrib.shape[0], len(FEATURE_COLS)))
+    np.add.at(raw.T, index, contrib.T)
+    return bias, raw
+
+def explain_prediction(
+    model, *,
+    area: str, item: str, year: int,
+    avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float,
+    irrigation: bool = False, fertilizer: bool = False) -> dict:
+    """
+    Décompose une prédiction : base_value + somme des contributions
+    + scenario_adjustment (irrigation / fertilisation) = pred_yield_hg_ha.
+
+    Pays inconnu avec AREA_FALLBACK=1 : comme pour predict_points, la ligne est
+    expliquée pour chacun des voisins climatiques et les contributions sont
+    mélangées avec les mêmes poids (la somme reste égale à la prédiction) ;
+    `area_neighbors` donne alors les voisins et leurs poids.
+    """
+    from scripts.predictor import resolve_areas  # import paresseux : charge le modèle publié
+
+    X_in = pd.DataFrame([{
+        "area": area,
+        "item": item,
+        "year": year,
+        "avg_rain_mm": avg_rain_mm,
+        "pesticides_tonnes": pesticides_tonnes,
+        "avg_temp": avg_temp
+        }])
+    X_in, area_blend = resolve_areas(model, X_in)  # même casse et même repli que predict_points
+    bias, raw = explain_rows(model, X_in)
+    neighbors = None
+    if area_blend is not None:
+        neighbors = dict(zip(X_in["area"].tolist(), area_blend.weights.tolist()))
+        raw = area_blend.blend(raw)
+    model_pred = bias + float(raw[0].sum())
+    pred = apply_optional_scenarios(model_pred, irrigation=irrigation, fertilizer=fertilizer, item=item, area=area)
+    return {
+        "item": item,
+        "pred_yield_hg_ha": pred,
+        "base_value": float(bias),
+        "contributions": dict(zip(FEATURE_COLS, raw[0].tolist())),
+        "scenario_adjustment": pred - model_pred,
+        "area_neighbors": neighbors,
+    }
+
+
+# ========================================================
+# Importance globale par permutation (job hors ligne)
+# ========================================================
+def _permuted_scores(model, X: pd.DataFrame, y: np.ndarray, col: str, n_repeats: int, seed: int) -> np.ndarray:
+    """MAE après permutation de `col`, pour chaque répétition, en un seul appel predict."""
+    rng = np.random.RandomState(seed)
+    n = len(X)
+    stacked = pd.concat([X] * n_repeats, ignore_index=True)
+    perms = np.concatenate([rng.permutation(n) for _ in range(n_repeats)])
+    stacked[col] = X[col].to_numpy()[perms]
+    errors = np.abs(model.predict(stacked) - np.tile(y, n_repeats))
+    return errors.reshape(n_repeats, n).mean(axis=1)
+
+def permutation_importance_parallel(
+    model, X: pd.DataFrame, y: pd.Series,
+    n_repeats: int = 10, n_jobs: int = -1, random_state: int = SEED) -> pd.DataFrame:
+    """Même sortie que sklearn.inspection.permutation_importance (scoring MAE), variables en parallèle."""
+    y = np.asarray(y, dtype=float)
+    base_mae = float(np.mean(np.abs(model.predict(X) - y)))
+    seeds = np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size=len(X.columns))
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_permuted_scores)(model, X, y, col, n_repeats, seed) for col, seed in zip(X.columns, seeds)
+    )
+    drops = np.array(scores) - base_mae
+    return pd.DataFrame({
+        "feature": X.columns,
+        "importance_mean": drops.mean(axis=1),
+        "importance_std": drops.std(axis=1),
+    }).sort_values("importance_mean", ascending=False)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Importance globale par permutation du modèle HGB.")
+    parser.add_argument("--n-repeats", type=int, default=10)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="-1 = tous les cœurs")
+    parser.add_argument("--all-rows", action="store_true", help="toutes les lignes au lieu du split test (year >= 2010)")
+    parser.add_argument("--out", type=Path, default=IMPORTANCE_PATH)
+    args = parser.parse_args(argv)
+
+    from scripts.predictor import model
+
+    df = load_dataset()
+    if not args.all_rows:
+        df = df[df["year"] >= TIME_SPLIT_YEAR]
+    perm_df = permutation_importance_parallel(model, df[FEATURE_COLS], df[TARGET], args.n_repeats, args.n_jobs)
+    perm_df.to_csv(args.out, index=False)
+    print(perm_df.to_string(index=False))
+    print(f"✅ Importance sauvegardée ici : {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#scripts/flat_forest.py
+"""
+Parcours vectorisé des arbres de plusieurs HistGradientBoostingRegressor.
+
+Tous les arbres des estimateurs fournis (ex: modèle ponctuel + variantes
+quantiles) sont aplatis dans des tables de noeuds contiguës (une colonne par
+attribut : feature, seuil, fils gauche/droit...). Une seule traversée NumPy
+score alors toutes les lignes sur tous les arbres de tous les modèles, au lieu
+de la boucle Python de sklearn sur chaque arbre de chaque modèle.
+
+Les feuilles sont sommées dans le même ordre que sklearn (baseline puis arbres
+dans l'ordre), les prédictions sont donc identiques au bit près.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+
+class FlatForest:
+    """Arbres de un ou plusieurs HGB aplatis en tables de noeuds structure-of-arrays."""
+
+    def __init__(self, estimators: Sequence[object]):
+        feature, threshold, left, right, missing_left, is_leaf, value = [], [], [], [], [], [], []
+        roots, tree_counts = [], []
+        offset = 0
+        for est in estimators:
+            if est._predictors and len(est._predictors[0]) != 1:
+                raise ValueError("FlatForest ne supporte que les régressions à une sortie.")
+            for (predictor,) in est._predictors:
+                nodes = predictor.nodes
+                if nodes["is_categorical"].any():
+                    raise ValueError("Les splits catégoriels natifs ne sont pas supportés.")
+                leaf = nodes["is_leaf"].astype(bool)
+                feature.append(np.where(leaf, 0, nodes["feature_idx"]))
+                threshold.append(nodes["num_threshold"])
+                left.append(nodes["left"].astype(np.intp) + offset)
+                right.append(nodes["right"].astype(np.intp) + offset)
+                missing_left.append(nodes["missing_go_to_left"].astype(bool))
+                is_leaf.append(leaf)
+                value.append(nodes["value"])
+                roots.append(offset)
+                offset += len(nodes)
+            tree_counts.append(len(est._predictors))
+
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        self.missing_left = np.concatenate(missing_left)
+        self.is_leaf = np.concatenate(is_leaf)
+        self.value = np.concatenate(value).astype(np.float64)
+        self.count = np.concatenate([
+            predictor.nodes["count"] for est in estimators for (predictor,) in est._predictors
+        ]).astype(np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.tree_bounds = np.concatenate([[0], np.cumsum(tree_counts)])
+        self.baselines = np.array([float(np.ravel(est._baseline_prediction)[0]) for est in estimators])
+        self.n_features = int(estimators[0].n_features_in_)
+
+        self._expected = None
+
+    @property
+    def n_outputs(self) -> int:
+        return len(self.baselines)
+
+    @property
+    def expected_value(self) -> np.ndarray:
+        """
+        Valeur moyenne de chaque noeud sur les données d'entraînement : valeur
+        pour une feuille, moyenne des fils pondérée par leurs effectifs sinon.
+        (Les noeuds internes de sklearn ne stockent pas cette espérance.)
+        """
+        if self._expected is None:
+            expected = np.where(self.is_leaf, self.value, 0.0)
+            internal = np.flatnonzero(~self.is_leaf)
+            # dans chaque arbre les fils ont un indice supérieur au parent :
+            # un parcours à rebours remonte les feuilles vers la racine
+            for i in internal[::-1]:
+                l, r = self.left[i], self.right[i]
+                expected[i] = (expected[l] * self.count[l] + expected[r] * self.count[r]) / (self.count[l] + self.count[r])
+            self._expected = expected
+        return self._expected
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Indice (global) de la feuille atteinte, forme (n_lignes, n_arbres)."""
+        flat = np.ascontiguousarray(X, dtype=np.float64).ravel()
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        nodes = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * self.n_features, n_trees)
+        has_nan = bool(np.isnan(flat).any())
+
+        # Ensemble actif : seules les paires (ligne, arbre) pas encore en feuille avancent
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            nd = nodes[active]
+            x = flat[row_offset[active] + self.feature[nd]]
+            go_left = x <= self.threshold[nd]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[nd], go_left)
+            nxt = np.where(go_left, self.left[nd], self.right[nd])
+            nodes[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict(self, X: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+        """Prédictions de chaque estimateur, forme (n_lignes, n_estimateurs)."""
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty((X.shape[0], self.n_outputs))
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            values = self.value[self.leaves(chunk)]
+            for k, (lo, hi) in enumerate(zip(self.tree_bounds[:-1], self.tree_bounds[1:])):
+                # baseline puis arbres dans l'ordre : même ordre de sommation que sklearn
+                terms = np.column_stack([np.full(len(chunk), self.baselines[k]), values[:, lo:hi]])
+                out[start:start + len(chunk), k] = np.cumsum(terms, axis=1)[:, -1]
+        return out
+
+    def contributions(self, X: np.ndarray, output: int = 0) -> tuple:
+        """
+        Contributions par chemin d'arbre (méthode de Saabas) pour l'estimateur `output`.
+
+        À chaque split traversé, l'écart d'espérance entre le fils atteint et
+        le noeud est attribué à la feature du split. Retourne (bias, contrib)
+        avec bias = baseline + espérance des racines (même valeur pour toutes
+        les lignes) et contrib de forme (n_lignes, n_features), telles que
+        bias + contrib.sum(axis=1) = prédiction.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        lo, hi = self.tree_bounds[output], self.tree_bounds[output + 1]
+        roots = self.roots[lo:hi]
+        expected = self.expected_value
+        flat = np.ascontiguousarray(X).ravel()
+        n_rows, n_trees = X.shape[0], len(roots)
+
+        nodes = np.tile(roots, n_rows)
+        row = np.repeat(np.arange(n_rows, dtype=np.intp), n_trees)
+        contrib = np.zeros((n_rows, self.n_features))
+        has_nan = bool(np.isnan(flat).any())
+
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            nd = nodes[active]
+            f = self.feature[nd]
+            x = flat[row[active] * self.n_features + f]
+            go_left = x <= self.threshold[nd]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[nd], go_left)
+            nxt = np.where(go_left, self.left[nd], self.right[nd])
+            np.add.at(contrib, (row[active], f), expected[nxt] - expected[nd])
+            nodes[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+
+        bias = self.baselines[output] + expected[roots].sum()
+        return bias, contrib
@@ -0,0 +1,99 @@
+#scripts/practice_effects.py
+"""
+Effets des pratiques (irrigation, fertilisation) sur le rendement, par
+culture et par groupe de pays, chargés depuis inputs/practice_effects.json :
+
+    {
+      "default": {"irrigation_hg_ha": 12000, "fertilizer_hg_ha": 15000},
+      "area_groups": {"sahel": ["niger", "mali", "chad"]},
+      "effects": [
+        {"item": "maize", "area_group": "*", "irrigation_hg_ha": 18000},
+        {"item": "*", "area_group": "sahel", "irrigation_hg_ha": 25000},
+        {"item": "maize", "area_group": "sahel", "fertilizer_hg_ha": 9000}
+      ]
+    }
+
+Priorité : (culture, groupe) > (*, groupe) > (culture, *) > default ; un
+champ absent d'une ligne garde la valeur moins spécifique. Les pays hors
+groupe et les cultures absentes de la table prennent les valeurs par défaut.
+
+La table est compilée au chargement en un tableau NumPy
+[pratique, groupe, culture] : appliquer les effets à n cultures est un gather
+vectorisé, sans branchement Python par ligne.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+PRACTICE_EFFECTS_PATH = BASE_DIR.parent / "inputs" / "practice_effects.json"
+
+PRACTICES = ["irrigation_hg_ha", "fertilizer_hg_ha"]
+ANY = "*"
+
+
+def _norm(name: str) -> str:
+    return str(name).strip().lower()
+
+
+class PracticeEffects:
+    def __init__(self, default: Dict[str, float], area_groups: Dict[str, List[str]], effects: List[dict]):
+        items = sorted({_norm(e["item"]) for e in effects if _norm(e.get("item", ANY)) != ANY})
+        groups = sorted({_norm(g) for g in area_groups})
+        # dernier indice = "autres cultures" / indice 0 = "autres pays"
+        self.item_index = {it: j for j, it in enumerate(items)}
+        self.other_item = len(items)
+        group_index = {g: i + 1 for i, g in enumerate(groups)}
+        self.group_of = {_norm(a): group_index[_norm(g)] for g, areas in area_groups.items() for a in areas}
+
+        table = np.empty((len(PRACTICES), len(groups) + 1, len(items) + 1))
+        for p, practice in enumerate(PRACTICES):
+            table[p] = float(default[practice])
+
+        def specificity(e):
+            return (_norm(e.get("area_group", ANY)) != ANY, _norm(e.get("item", ANY)) != ANY)
+
+        for e in sorted(effects, key=specificity):
+            item, group = _norm(e.get("item", ANY)), _norm(e.get("area_group", ANY))
+            if group != ANY and group not in group_index:
+                raise ValueError(f"Unknown area_group in practice effects: {group}")
+            cols = slice(None) if item == ANY else self.item_index[item]
+            rows = slice(None) if group == ANY else group_index[group]
+            for p, practice in enumerate(PRACTICES):
+                if practice in e:
+                    table[p, rows, cols] = float(e[practice])
+        self.table = table
+
+    @classmethod
+    def load(cls, path: Path = PRACTICE_EFFECTS_PATH) -> "PracticeEffects":
+        if not path.exists():
+            raise FileNotFoundError(f"practice_effects.json not found at {path}.")
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        return cls(cfg["default"], cfg.get("area_groups", {}), cfg.get("effects", []))
+
+    def item_indices(self, items: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.item_index.get(_norm(it), self.other_item) for it in items),
+                           dtype=np.intp, count=len(items))
+
+    def effects(self, items: Sequence[str], area: str) -> np.ndarray:
+        """Effets (hg/ha) de forme (2, n_items) : ligne 0 irrigation, ligne 1 fertilisation."""
+        return self.table[:, self.group_of.get(_norm(area), 0), self.item_indices(items)]
+
+    def adjustment(self, items: Sequence[str], area: str, irrigation=False, fertilizer=False) -> np.ndarray:
+        """Ajustement additif par culture ; irrigation / fertilizer : booléens ou tableaux diffusables."""
+        irr, fert = self.effects(items, area)
+        return irr * np.asarray(irrigation, dtype=float) + fert * np.asarray(fertilizer, dtype=float)
+
+
+_default_effects = None
+
+def get_practice_effects() -> PracticeEffects:
+    """Table par défaut (inputs/practice_effects.json), chargée une seule fois."""
+    global _default_effects
+    if _default_effects is None:
+        _default_effects = PracticeEffects.load()
+    return _default_effects
@@ -1,16 +1,24 @@
 #scripts/predictor.py
 
+import hashlib
+import json
+import os
 import sys
+import warnings
 from pathlib import Path
-from scripts.utils import apply_optional_scenarios, compute_revenue_per_ha
+from scripts.utils import compute_revenue_per_ha
+from scripts.flat_forest import FlatForest
+from scripts.compiled_forest import NUMBA_AVAILABLE, predict_compiled
+from scripts.quantized_forest import QuantizedForest
+from scripts.binned_rows import BinnedRowCache
+from scripts.area_neighbors import AreaNeighbors, normalize_area, normalize_areas
+from scripts.practice_effects import get_practice_effects
+from scripts.data import DATA_PATH, FEATURE_COLS, load_dataset
 
+import numpy as np
 import pandas as pd
 import joblib
-from typing import List
-
-
-COEF_IRRIGATION_HG_HA = 12000
-COEF_FERTILIZATION_HG_HA = 15000
+from typing import Dict, List, Optional, Sequence, Tuple
 
 
 # ========================================================
@@ -23,6 +31,227 @@ BASE_DIR = Path(__file__).resolve().parent
 MODEL_PATH = BASE_DIR.parent / "model" / "hgb_optimized.joblib"
 # chargement du modèle
 model = joblib.load(MODEL_PATH)
+# version = empreinte du fichier (identique au model_version du manifeste de scripts/retrain.py)
+MODEL_VERSION = hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest()[:12]
+
+# Variantes quantiles (P10/P50/P90), entraînées par scripts/train_quantiles.py
+QUANTILE_MODELS_PATH = BASE_DIR.parent / "model" / "hgb_quantiles.joblib"
+
+def load_quantile_models(path: Path = QUANTILE_MODELS_PATH) -> Dict[float, object]:
+    """{quantile: HistGradientBoostingRegressor} ou {} si les variantes n'ont pas été entraînées."""
+    if not path.exists():
+        return {}
+    return joblib.load(path)
+
+quantile_models = load_quantile_models()
+
+def load_quantile_manifest(path: Path = QUANTILE_MODELS_PATH.with_suffix(".manifest.json")) -> dict:
+    """Décalages de recalibration et couverture mesurée sur le test, ou {} sans manifeste."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+quantile_manifest = load_quantile_manifest()
+
+# Effets irrigation / fertilisation par (culture, groupe de pays), compilés en tableaux NumPy
+practice_effects = get_practice_effects()
+
+# ========================================================
+# Quantiles : une seule transformation, un seul passage
+# ========================================================
+def quantile_label(q: float) -> str:
+    """0.1 -> 'p10'"""
+    return f"p{int(round(q * 100))}"
+
+_fused_forests: Dict[tuple, Tuple[FlatForest, List[float]]] = {}
+
+def get_fused_forest(model, quantile_models: Dict[float, object]) -> Tuple[FlatForest, List[float]]:
+    """Arbres du modèle ponctuel + de toutes les variantes quantiles, aplatis une fois puis mis en cache."""
+    levels = sorted(quantile_models)
+    key = (id(model[-1]), tuple(id(quantile_models[q]) for q in levels))
+    if key not in _fused_forests:
+        _fused_forests[key] = (FlatForest([model[-1]] + [quantile_models[q] for q in levels]), levels)
+    return _fused_forests[key]
+
+# ========================================================
+# Moteur de traversée des arbres
+# ========================================================
+# "sklearn" : model.predict ; "numpy" : FlatForest (traversée NumPy) ;
+# "numba" : noyau compilé de scripts/compiled_forest.py. Prédictions identiques.
+# "quantized" : entrées binées uint8 (scripts/quantized_forest.py), écarts
+# d'arrondi float32 ; les quantiles passent alors par la traversée float64.
+ENGINES = ("sklearn", "numpy", "numba", "quantized")
+QUANTIZED_MODEL_PATH = BASE_DIR.parent / "model" / "hgb_quantized.npz"
+
+def resolve_engine(name: str) -> str:
+    name = (name or "sklearn").lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown predictor engine {name!r}. Available: {list(ENGINES)}")
+    if name == "numba" and not NUMBA_AVAILABLE:
+        warnings.warn("PREDICTOR_ENGINE=numba mais Numba n'est pas installé : repli sur la traversée NumPy.")
+        return "numpy"
+    return name
+
+PREDICTOR_ENGINE = resolve_engine(os.getenv("PREDICTOR_ENGINE", "sklearn"))
+
+_quantized_forests: Dict[int, QuantizedForest] = {}
+
+def get_quantized_forest(pipeline) -> QuantizedForest:
+    """Variante exportée par scripts/quantize_model.py si elle correspond au modèle publié, sinon construite en mémoire."""
+    key = id(pipeline[-1])
+    if key not in _quantized_forests:
+        forest = None
+        if pipeline[-1] is model[-1]:
+            forest = QuantizedForest.load(QUANTIZED_MODEL_PATH, MODEL_VERSION)
+        _quantized_forests[key] = forest or QuantizedForest.from_estimator(pipeline[-1])
+    return _quantized_forests[key]
+
+# Recommandations : lignes pré-binées par pays (scripts/binned_rows.py), identiques
+# au bit près à model.predict ; RECOMMEND_FAST_PATH=0 repasse par predict_points.
+RECOMMEND_FAST_PATH = os.getenv("RECOMMEND_FAST_PATH", "1") != "0"
+
+_binned_rows: Dict[int, Optional[BinnedRowCache]] = {}
+
+def get_binned_rows(pipeline) -> Optional[BinnedRowCache]:
+    """Lignes pré-binées du pipeline, ou None si son preprocessing n'a pas la forme attendue."""
+    key = id(pipeline[-1])
+    if key not in _binned_rows:
+        try:
+            _binned_rows[key] = BinnedRowCache(pipeline)
+        except ValueError as e:
+            warnings.warn(f"Lignes pré-binées indisponibles ({e}) : recommandations via predict_points.")
+            _binned_rows[key] = None
+    return _binned_rows[key]
+
+# Pays inconnus du modèle : AREA_FALLBACK=1 les remplace par les k pays connus
+# au profil climatique le plus proche (scripts/area_neighbors.py, index exporté
+# par scripts/build_area_index.py). Désactivé par défaut : en validation
+# leave-one-area-out, la ligne "sans pays" du OneHotEncoder reste meilleure en
+# moyenne. Les noms de pays sont toujours passés en minuscules.
+AREA_FALLBACK = os.getenv("AREA_FALLBACK", "0") != "0"
+AREA_NEIGHBORS_K = int(os.getenv("AREA_NEIGHBORS_K", "5"))
+AREA_INDEX_PATH = BASE_DIR.parent / "model" / "area_neighbors.pkl"
+
+_area_neighbors: Dict[int, Optional[AreaNeighbors]] = {}
+
+def get_area_neighbors(pipeline) -> Optional[AreaNeighbors]:
+    """Index exporté s'il correspond au modèle publié, sinon construit depuis clean_data.csv ; None si impossible."""
+    key = id(pipeline[-1])
+    if key not in _area_neighbors:
+        index = None
+        if pipeline[-1] is model[-1]:
+            index = AreaNeighbors.load(AREA_INDEX_PATH, MODEL_VERSION)
+        if index is None:
+            try:
+                areas = pipeline[0].named_transformers_["cat"][-1].categories_[0]
+                index = AreaNeighbors.from_data(load_dataset(DATA_PATH, FEATURE_COLS), areas)
+            except (AttributeError, KeyError, IndexError, OSError, ValueError) as e:
+                warnings.warn(f"Repli des pays inconnus indisponible ({e}).")
+        if index is not None:
+            index.k = min(AREA_NEIGHBORS_K, len(index.areas))
+        _area_neighbors[key] = index
+    return _area_neighbors[key]
+
+def resolve_areas(model, X_in: pd.DataFrame):
+    """(lot à scorer, AreaBlend ou None) : pays en minuscules, pays inconnus remplacés par leurs voisins."""
+    index = get_area_neighbors(model) if AREA_FALLBACK else None
+    if index is None:
+        return normalize_areas(X_in), None
+    return index.expand(X_in)
+
+def build_serving_caches(model, quantile_models: Dict[float, object]) -> List[str]:
+    """
+    Construit d'avance les caches paresseux utilisés par l'API : forêts
+    aplaties (modèle ponctuel, + quantiles), forêt quantifiée si
+    PREDICTOR_ENGINE=quantized, lignes pré-binées, index des voisins si
+    AREA_FALLBACK. Appelé par api/serve.py dans le parent, avant gc.freeze()
+    et le fork : les workers partagent ces tableaux en copy-on-write au lieu
+    d'en construire chacun une copie. NumPy uniquement, aucun pool de threads.
+    """
+    built = ["fused_forest"]
+    get_fused_forest(model, {})
+    if quantile_models:
+        get_fused_forest(model, quantile_models)
+        built.append("fused_forest[quantiles]")
+    if PREDICTOR_ENGINE == "quantized":
+        get_quantized_forest(model)
+        built.append("quantized_forest")
+    if RECOMMEND_FAST_PATH and get_binned_rows(model) is not None:
+        built.append("binned_rows")
+    if AREA_FALLBACK and get_area_neighbors(model) is not None:
+        built.append("area_neighbors")
+    return built
+
+def forest_predict(forest: FlatForest, Xt: np.ndarray, engine: Optional[str] = None) -> np.ndarray:
+    if (engine or PREDICTOR_ENGINE) in ("numba", "quantized") and NUMBA_AVAILABLE:
+        return predict_compiled(forest, Xt)
+    return forest.predict(Xt)
+
+def predict_points(model, X_in: pd.DataFrame, engine: Optional[str] = None) -> np.ndarray:
+    """Prédiction ponctuelle du pipeline avec le moteur choisi (PREDICTOR_ENGINE par défaut)."""
+    X_in, area_blend = resolve_areas(model, X_in)
+    preds = _predict_points(model, X_in, engine)
+    return area_blend.blend(preds) if area_blend is not None else preds
+
+def _predict_points(model, X_in: pd.DataFrame, engine: Optional[str] = None) -> np.ndarray:
+    engine = engine or PREDICTOR_ENGINE
+    if engine == "sklearn":
+        return model.predict(X_in).astype(float)
+    if engine == "quantized":
+        return get_quantized_forest(model).predict(model[:-1].transform(X_in))
+    forest, _ = get_fused_forest(model, {})
+    return forest_predict(forest, model[:-1].transform(X_in), engine)[:, 0]
+
+def predict_with_quantiles(
+    model, X_in: pd.DataFrame,
+    quantile_models: Dict[float, object], quantiles: Sequence[float]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Prédiction ponctuelle + quantiles en un passage : le preprocessing du
+    pipeline est appliqué une seule fois, puis une seule traversée (FlatForest)
+    score la matrice sur les arbres du modèle ponctuel et de chaque quantile.
+    Les quantiles sont triés ligne par ligne pour éviter les croisements.
+    """
+    missing = [q for q in quantiles if float(q) not in quantile_models]
+    if missing:
+        raise ValueError(f"Unsupported quantiles: {missing}. Available: {sorted(quantile_models)}")
+
+    forest, levels = get_fused_forest(model, quantile_models)
+    X_in, area_blend = resolve_areas(model, X_in)
+    preds = forest_predict(forest, model[:-1].transform(X_in))
+    if area_blend is not None:
+        preds = area_blend.blend(preds)
+
+    qs = sorted(float(q) for q in quantiles)
+    q_preds = np.sort(preds[:, [1 + levels.index(q) for q in qs]], axis=1)
+    return preds[:, 0], {quantile_label(q): q_preds[:, j] for j, q in enumerate(qs)}
+
+def _predict_items(model, X_in: pd.DataFrame, quantile_models=None, quantiles=None):
+    if quantiles:
+        return predict_with_quantiles(model, X_in, quantile_models or {}, quantiles)
+    return predict_points(model, X_in), {}
+
+def _score_items(model, *, area: str, items: Sequence[str], year: int,
+                 avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float,
+                 quantile_models=None, quantiles=None):
+    """Rendement de base de chaque culture pour un même pays et un même contexte climatique."""
+    area = normalize_area(area)
+    binned = get_binned_rows(model) if RECOMMEND_FAST_PATH and not quantiles else None
+    # pays inconnu : repli par voisins via predict_points (un seul lot de k x cultures lignes)
+    if (binned is not None and area not in binned.area_index
+            and AREA_FALLBACK and get_area_neighbors(model) is not None):
+        binned = None
+    if binned is not None:
+        return binned.predict(area=area, items=items, year=year, avg_rain_mm=avg_rain_mm,
+                              pesticides_tonnes=pesticides_tonnes, avg_temp=avg_temp), {}
+    X_in = pd.DataFrame([{
+        "area": area,
+        "item": it,
+        "year": year,
+        "avg_rain_mm": avg_rain_mm,
+        "pesticides_tonnes": pesticides_tonnes,
+        "avg_temp": avg_temp
+    } for it in items])
+    return _predict_items(model, X_in, quantile_models, quantiles)
 
 # ========================================================
 # Moteur de Prediction + 2 recommenders (yield vs revenue)
@@ -40,8 +269,58 @@ def predict_yield_hg_ha(
         "pesticides_tonnes": pesticides_tonnes,
         "avg_temp": avg_temp
         }])
-    base_pred = float(model.predict(X_in)[0])
-    return apply_optional_scenarios(base_pred, irrigation=irrigation, fertilizer=fertilizer)
+    base_pred = float(predict_points(model, X_in)[0])
+    return base_pred + float(practice_effects.adjustment([item], area, irrigation, fertilizer)[0])
+
+def predict_yield_quantiles_hg_ha(
+    model, quantile_models, *,
+    area: str, item: str, year: int,
+    avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float,
+    quantiles: Sequence[float],
+    irrigation: bool = False, fertilizer: bool = False ) -> Tuple[float, Dict[str, float]]:
+    """Comme predict_yield_hg_ha, avec en plus les quantiles demandés {'p10': ..., 'p90': ...}."""
+    X_in = pd.DataFrame([{
+        "area": area,
+        "item": item,
+        "year": year,
+        "avg_rain_mm": avg_rain_mm,
+        "pesticides_tonnes": pesticides_tonnes,
+        "avg_temp": avg_temp
+        }])
+    base_preds, q_preds = predict_with_quantiles(model, X_in, quantile_models, quantiles)
+    adj = float(practice_effects.adjustment([item], area, irrigation, fertilizer)[0])
+    return float(base_preds[0]) + adj, {label: float(v[0]) + adj for label, v in q_preds.items()}
+
+# ========================================================
+# Lots de scénarios
+# ========================================================
+TRUE_STRINGS = ("1", "true", "yes", "oui")
+
+def _flag_column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Colonne booléenne optionnelle (False si absente) ; accepte 1/0, true/false, yes/no, oui/non."""
+    if name not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    col = df[name]
+    if col.dtype == object:
+        return col.astype(str).str.strip().str.lower().isin(TRUE_STRINGS).to_numpy()
+    return col.fillna(False).astype(bool).to_numpy()
+
+def predict_frame(model, df: pd.DataFrame) -> np.ndarray:
+    """
+    Rendement (hg/ha) de chaque ligne d'un lot de scénarios, en un seul
+    predict_points. Colonnes requises : FEATURE_COLS ; 'irrigation' et
+    'fertilizer' optionnelles. Les effets des pratiques sont ajoutés pays par pays.
+    """
+    missing = [c for c in FEATURE_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}. Required: {FEATURE_COLS}")
+    X_in = df[FEATURE_COLS].astype({"area": object, "item": object})
+    preds = predict_points(model, X_in)
+    irrigation, fertilizer = _flag_column(df, "irrigation"), _flag_column(df, "fertilizer")
+    items = X_in["item"].to_numpy()
+    for area, idx in X_in.groupby("area", sort=False).indices.items():
+        preds[idx] += practice_effects.adjustment(items[idx], area, irrigation[idx], fertilizer[idx])
+    return preds
 
 # ========================================================
 # Moteur de Recommendation ( Hg/ha yield & rentabilité)
@@ -52,18 +331,14 @@ def recommend_by_yield(
     avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float,
     candidate_items: list[str],
     irrigation: bool = False, fertilizer: bool = False,
-    top_k: int = 5) -> pd.DataFrame:
-    X_in = pd.DataFrame([{
-        "area": area,
-        "item": it,
-        "year": year,
-        "avg_rain_mm": avg_rain_mm,
-        "pesticides_tonnes": pesticides_tonnes,
-        "avg_temp": avg_temp
-    } for it in candidate_items])
-
-    base_preds = model.predict(X_in).astype(float)
-    adj = (COEF_IRRIGATION_HG_HA if irrigation else 0.0) + (COEF_FERTILIZATION_HG_HA if fertilizer else 0.0)
+    top_k: int = 5,
+    quantile_models: Optional[Dict[float, object]] = None,
+    quantiles: Optional[Sequence[float]] = None) -> pd.DataFrame:
+    base_preds, q_preds = _score_items(
+        model, area=area, items=candidate_items, year=year, avg_rain_mm=avg_rain_mm,
+        pesticides_tonnes=pesticides_tonnes, avg_temp=avg_temp,
+        quantile_models=quantile_models, quantiles=quantiles)
+    adj = practice_effects.adjustment(candidate_items, area, irrigation, fertilizer)
     preds = base_preds + adj
 
     out = pd.DataFrame({
@@ -71,7 +346,8 @@ def recommend_by_yield(
         "pred_yield_hg_ha": preds,
         "pred_yield_t_ha": preds / 10000,
         "irrigation": irrigation,
-        "fertilizer": fertilizer
+        "fertilizer": fertilizer,
+        **{label: v + adj for label, v in q_preds.items()}
     }).sort_values("pred_yield_hg_ha", ascending=False)
 
     return out.head(top_k).reset_index(drop=True)
@@ -84,24 +360,20 @@ def recommend_by_revenue(
     prices: dict[str, float],
     price_unit: str = "eur_per_t",
     irrigation: bool = False, fertilizer: bool = False,
-    top_k: int = 5
+    top_k: int = 5,
+    quantile_models: Optional[Dict[float, object]] = None,
+    quantiles: Optional[Sequence[float]] = None
 ) -> pd.DataFrame:
     # garder uniquement les items dont l'agriculteur a fourni le prix
     items = [it for it in candidate_items if it in prices]
     if len(items) == 0:
         raise ValueError("No candidate items have a provided price. Provide prices like {'maize': 180, ...}.")
 
-    X_in = pd.DataFrame([{
-        "area": area,
-        "item": it,
-        "year": year,
-        "avg_rain_mm": avg_rain_mm,
-        "pesticides_tonnes": pesticides_tonnes,
-        "avg_temp": avg_temp
-    } for it in items])
-
-    base_preds = model.predict(X_in).astype(float)
-    adj = (COEF_IRRIGATION_HG_HA if irrigation else 0.0) + (COEF_FERTILIZATION_HG_HA if fertilizer else 0.0)
+    base_preds, q_preds = _score_items(
+        model, area=area, items=items, year=year, avg_rain_mm=avg_rain_mm,
+        pesticides_tonnes=pesticides_tonnes, avg_temp=avg_temp,
+        quantile_models=quantile_models, quantiles=quantiles)
+    adj = practice_effects.adjustment(items, area, irrigation, fertilizer)
     preds = base_preds + adj
 
     out = pd.DataFrame({
@@ -111,7 +383,8 @@ def recommend_by_revenue(
         "price_value": [prices[it] for it in items],
         "price_unit": price_unit,
         "irrigation": irrigation,
-        "fertilizer": fertilizer
+        "fertilizer": fertilizer,
+        **{label: v + adj for label, v in q_preds.items()}
     })
 
     out["revenue_per_ha"] = out.apply(
@@ -119,4 +392,112 @@ def recommend_by_revenue(
         axis=1)
 
     out = out.sort_values("revenue_per_ha", ascending=False)
-    return out.head(top_k).reset_index(drop=True)
\ No newline at end of file
+    return out.head(top_k).reset_index(drop=True)
+
+# ========================================================
+# Optimiseur what-if : culture x irrigation x fertilisation
+# ========================================================
+PRACTICE_COMBOS = [(False, False), (True, False), (False, True), (True, True)]
+
+def optimize_practices(
+    model, *,
+    area: str, year: int,
+    avg_rain_mm: float, pesticides_tonnes: float, avg_temp: float,
+    candidate_items: list[str],
+    prices: dict[str, float],
+    price_unit: str = "eur_per_t",
+    irrigation_cost: float = 0.0, fertilizer_cost: float = 0.0,
+    budget: Optional[float] = None,
+    top_k: int = 5) -> pd.DataFrame:
+    """
+    Meilleurs plans (culture, irrigation, fertilisation) par revenu net/ha
+    = revenu/ha - coût des pratiques/ha, parmi les plans dont le coût tient
+    dans `budget`. Les effets des pratiques étant additifs, un seul
+    predict_points (une ligne par culture) suffit : les 4 combinaisons sont
+    obtenues par broadcast, sans re-scorer le modèle.
+    """
+    items = [it for it in candidate_items if it in prices]
+    if len(items) == 0:
+        raise ValueError("No candidate items have a provided price. Provide prices like {'maize': 180, ...}.")
+
+    X_in = pd.DataFrame({
+        "area": area,
+        "item": items,
+        "year": year,
+        "avg_rain_mm": avg_rain_mm,
+        "pesticides_tonnes": pesticides_tonnes,
+        "avg_temp": avg_temp
+    })
+    base_preds = predict_points(model, X_in)
+
+    irrigation = np.array([irr for irr, _ in PRACTICE_COMBOS])
+    fertilizer = np.array([fert for _, fert in PRACTICE_COMBOS])
+    # (n_items, 4) : effets propres à chaque culture x combinaison de pratiques
+    irr_effect, fert_effect = practice_effects.effects(items, area)
+    adj = np.outer(irr_effect, irrigation) + np.outer(fert_effect, fertilizer)
+    cost = irrigation * irrigation_cost + fertilizer * fertilizer_cost
+
+    # (n_items, 4) : le revenu est linéaire en rendement, un facteur €/hg par culture
+    price_values = np.array([prices[it] for it in items], dtype=float)
+    revenue_per_hg = np.array([compute_revenue_per_ha(1.0, p, price_unit) for p in price_values])
+    preds = base_preds[:, None] + adj
+    revenue = preds * revenue_per_hg[:, None]
+    net = revenue - cost[None, :]
+
+    n_items, n_combos = preds.shape
+    out = pd.DataFrame({
+        "item": np.repeat(items, n_combos),
+        "irrigation": np.tile(irrigation, n_items),
+        "fertilizer": np.tile(fertilizer, n_items),
+        "pred_yield_hg_ha": preds.ravel(),
+        "pred_yield_t_ha": preds.ravel() / 10_000,
+        "price_value": np.repeat(price_values, n_combos),
+        "price_unit": price_unit,
+        "revenue_per_ha": revenue.ravel(),
+        "practice_cost_per_ha": np.tile(cost, n_items),
+        "net_revenue_per_ha": net.ravel(),
+    })
+    if budget is not None:
+        out = out[out["practice_cost_per_ha"] <= budget]
+
+    out = out.sort_values("net_revenue_per_ha", ascending=False, kind="stable")
+    return out.head(top_k).reset_index(drop=True)
+
+# ========================================================
+# Trajectoire pluriannuelle (horizon)
+# ========================================================
+def climate_trajectory(base: float, years: np.ndarray, trend_per_year: float = 0.0,
+                       values: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Valeurs année par année : `values` si fourni, sinon tendance linéaire base + trend * (année - 1re année)."""
+    if values is not None:
+        if len(values) != len(years):
+            raise ValueError(f"Expected {len(years)} yearly values, got {len(values)}.")
+        return np.asarray(values, dtype=float)
+    return base + trend_per_year * (years - years[0]).astype(float)
+
+def forecast_horizon(
+    model, *,
+    area: str, items: Sequence[str], years: np.ndarray,
+    avg_rain_mm: np.ndarray, pesticides_tonnes: np.ndarray, avg_temp: np.ndarray,
+    irrigation: bool = False, fertilizer: bool = False,
+    quantile_models: Optional[Dict[float, object]] = None,
+    quantiles: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Rendement de chaque culture pour chaque année de l'horizon, les variables
+    climatiques suivant leur trajectoire annuelle. Les n_items x n_années
+    lignes sont scorées en un seul appel ; retourne des tableaux
+    (n_items, n_années) : prédiction ponctuelle et {label: quantile}.
+    """
+    n_items, n_years = len(items), len(years)
+    X_in = pd.DataFrame({
+        "area": area,
+        "item": np.repeat(np.asarray(items, dtype=object), n_years),
+        "year": np.tile(years, n_items),
+        "avg_rain_mm": np.tile(avg_rain_mm, n_items),
+        "pesticides_tonnes": np.tile(pesticides_tonnes, n_items),
+        "avg_temp": np.tile(avg_temp, n_items)
+    })
+    base_preds, q_preds = _predict_items(model, X_in, quantile_models, quantiles)
+    adj = practice_effects.adjustment(items, area, irrigation, fertilizer)[:, None]
+    preds = base_preds.reshape(n_items, n_years) + adj
+    return preds, {label: v.reshape(n_items, n_years) + adj for label, v in q_preds.items()}
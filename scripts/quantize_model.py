@@ -0,0 +1,114 @@
+#scripts/quantize_model.py
+"""
+Export de la variante uint8 / float32 du modèle (scripts/quantized_forest.py)
+et rapport de comparaison avec le modèle publié :
+- précision sur le split temporel (year >= 2010) : R², MAE, écart max ;
+- débit de scoring (lignes/s) sur `--rows` lignes transformées ;
+- mémoire : tables de noeuds, matrice d'entrée par ligne, pic RSS du scoring.
+
+Le rapport est aussi écrit en JSON dans scripts/artifacts/quantization_report.json.
+
+Usage :
+    python -m scripts.quantize_model                 # export + rapport
+    PREDICTOR_ENGINE=quantized python -m api.serve   # servir la variante
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from scripts.compare_models import _peak_rss_mb, _reset_peak_rss
+from scripts.compiled_forest import NUMBA_AVAILABLE, predict_compiled
+from scripts.data import DATA_PATH, FEATURE_COLS, TARGET, TIME_SPLIT_YEAR, time_split
+from scripts.flat_forest import FlatForest
+from scripts.quantized_forest import QuantizedForest
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR.parent / "model" / "hgb_optimized.joblib"
+QUANTIZED_MODEL_PATH = BASE_DIR.parent / "model" / "hgb_quantized.npz"
+REPORT_PATH = BASE_DIR / "artifacts" / "quantization_report.json"
+
+
+def measure(fn: Callable[[np.ndarray], np.ndarray], X: np.ndarray) -> Dict[str, float]:
+    """Débit et pic RSS (au-delà de l'existant) du scoring de X."""
+    fn(X[:1000])  # compilation / premiers appels hors mesure
+    _reset_peak_rss()
+    before = _peak_rss_mb()
+    start = time.perf_counter()
+    fn(X)
+    seconds = time.perf_counter() - start
+    return {"rows_per_s": X.shape[0] / seconds, "peak_rss_delta_mb": _peak_rss_mb() - before}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Exporte la variante quantifiée du modèle HGB et mesure les écarts.")
+    parser.add_argument("--out", type=Path, default=QUANTIZED_MODEL_PATH)
+    parser.add_argument("--rows", type=int, default=200_000, help="lignes scorées pour le débit et la mémoire")
+    parser.add_argument("--time-split-year", type=int, default=TIME_SPLIT_YEAR)
+    args = parser.parse_args(argv)
+
+    pipeline = joblib.load(MODEL_PATH)
+    model_version = hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest()[:12]
+    est = pipeline[-1]
+    quantized = QuantizedForest.from_estimator(est, model_version=model_version)
+    quantized.save(args.out)
+    print(f"✅ Variante quantifiée sauvegardée ici : {args.out} ({args.out.stat().st_size / 1e6:.2f} Mo)")
+
+    # Précision : valeurs float64 du CSV, comme celles que reçoit l'API
+    df = pd.read_csv(DATA_PATH, usecols=FEATURE_COLS + [TARGET])
+    _, _, X_test, y_test = time_split(df, args.time_split_year)
+    Xt_test = np.asarray(pipeline[:-1].transform(X_test), dtype=np.float64)
+    ref = est.predict(Xt_test)
+    pred = quantized.predict(Xt_test)
+    accuracy = {
+        "r2_reference": r2_score(y_test, ref),
+        "r2_quantized": r2_score(y_test, pred),
+        "mae_reference": mean_absolute_error(y_test, ref),
+        "mae_quantized": mean_absolute_error(y_test, pred),
+        "max_abs_diff_hg_ha": float(np.abs(pred - ref).max()),
+        "share_rows_diff_over_1_hg_ha": float(np.mean(np.abs(pred - ref) > 1.0)),
+    }
+
+    # Débit et mémoire sur --rows lignes (test répété)
+    X_big = np.ascontiguousarray(np.resize(Xt_test, (args.rows, Xt_test.shape[1])))
+    flat = FlatForest([est])
+    B_big = quantized.bin(X_big)
+    engines = {"sklearn": (est.predict, X_big), "quantized": (quantized.predict, X_big),
+               "quantized_prebinned": (quantized.predict_binned, B_big)}
+    if NUMBA_AVAILABLE:
+        engines["numba"] = (lambda X: predict_compiled(flat, X), X_big)
+    throughput = {name: measure(fn, X) for name, (fn, X) in engines.items()}
+
+    sklearn_nodes = sum(p.nodes.nbytes for (p,) in est._predictors)
+    memory = {
+        "node_tables_bytes_reference": int(sklearn_nodes),
+        "node_tables_bytes_quantized": int(quantized.nbytes),
+        "input_bytes_per_row_float64": int(Xt_test.shape[1] * 8),
+        "input_bytes_per_row_uint8": int(Xt_test.shape[1]),
+    }
+
+    report = {"model_version": model_version, "test_rows": int(len(y_test)), "accuracy": accuracy,
+              "throughput": throughput, "memory": memory, "numba": NUMBA_AVAILABLE}
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+
+    print(f"✓ R² test : {accuracy['r2_reference']:.6f} -> {accuracy['r2_quantized']:.6f}, "
+          f"MAE : {accuracy['mae_reference']:,.1f} -> {accuracy['mae_quantized']:,.1f} hg/ha, "
+          f"écart max {accuracy['max_abs_diff_hg_ha']:,.1f} hg/ha")
+    for name, m in throughput.items():
+        print(f"✓ {name:<19} {m['rows_per_s']:>10,.0f} lignes/s, pic RSS +{m['peak_rss_delta_mb']:.0f} Mo")
+    print(f"✓ Tables de noeuds : {sklearn_nodes / 1e6:.2f} Mo -> {quantized.nbytes / 1e6:.2f} Mo ; "
+          f"entrée : {memory['input_bytes_per_row_float64']} -> {memory['input_bytes_per_row_uint8']} octets/ligne")
+    print(f"✅ Rapport : {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#scripts/quantized_forest.py
+"""
+Variante en précision réduite du modèle HGB : entrées binées en uint8.
+
+HistGradientBoostingRegressor apprend sur des features discrétisées par son
+_bin_mapper (au plus 255 bins + 1 bin "manquant" par feature) ; chaque split
+stocke son seuil en bin (`bin_threshold`) en plus du seuil réel. Comme
+x <= bin_thresholds_[f][b]  <=>  bin(x) <= b, une ligne binée descend les
+arbres exactement comme la ligne d'origine.
+
+La variante stocke :
+- les seuils de bins en float32 (entrées converties en float32 avant binning) ;
+- les entrées binées en uint8 (8x moins de mémoire que la matrice float64) ;
+- des tables de noeuds compactes : feature et seuil en uint8, fils en int32,
+  valeurs des feuilles en float32 (~15 octets par noeud au lieu de ~60) ;
+la somme des feuilles reste en float64.
+
+Écarts avec le modèle d'origine : un x juste au-dessus d'un seuil peut être
+arrondi en float32 sur ce seuil (bin inférieur), et les valeurs des feuilles
+sont arrondies en float32. `python -m scripts.quantize_model` exporte la
+variante et mesure l'écart de précision, le débit et la mémoire.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from scripts.compiled_forest import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from numba import njit, prange
+
+    @njit(parallel=True, cache=True, nogil=True)
+    def _bin_kernel(X, thresholds, n_thresholds, missing_bin, out):
+        for i in prange(X.shape[0]):
+            for j in range(X.shape[1]):
+                x = np.float32(X[i, j])
+                if np.isnan(x):
+                    out[i, j] = missing_bin
+                    continue
+                # plus petit b tel que x <= seuil[b] (même convention que sklearn)
+                lo, hi = 0, n_thresholds[j]
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if x <= thresholds[j, mid]:
+                        hi = mid
+                    else:
+                        lo = mid + 1
+                out[i, j] = lo
+
+    @njit(parallel=True, cache=True, nogil=True)
+    def _predict_binned_kernel(B, feature, bin_threshold, left, right, missing_left, is_leaf, value,
+                               roots, baseline, missing_bin, out):
+        for i in prange(B.shape[0]):
+            acc = baseline
+            for t in range(roots.shape[0]):
+                node = roots[t]
+                while not is_leaf[node]:
+                    b = B[i, feature[node]]
+                    if b == missing_bin:
+                        go_left = missing_left[node]
+                    else:
+                        go_left = b <= bin_threshold[node]
+                    node = left[node] if go_left else right[node]
+                acc += np.float64(value[node])
+            out[i] = acc
+
+
+class QuantizedForest:
+    """Arbres d'un HGB en tables compactes, scorés sur des entrées binées uint8."""
+
+    ARRAYS = ("thresholds", "n_thresholds", "feature", "bin_threshold", "left", "right",
+              "missing_left", "is_leaf", "value", "roots")
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.baseline = float(arrays["baseline"])
+        self.missing_bin = int(arrays["missing_bin"])
+        self.model_version = str(arrays.get("model_version", ""))
+
+    @classmethod
+    def from_estimator(cls, est, model_version: str = "", value_dtype=np.float32) -> "QuantizedForest":
+        """`value_dtype=np.float64` garde les feuilles exactes (traversée binée identique au bit près)."""
+        if est._predictors and len(est._predictors[0]) != 1:
+            raise ValueError("QuantizedForest ne supporte que les régressions à une sortie.")
+        mapper = est._bin_mapper
+        if mapper.missing_values_bin_idx_ > 255:
+            raise ValueError("Plus de 256 bins par feature : non représentable en uint8.")
+        n_features = len(mapper.bin_thresholds_)
+        n_thresholds = np.array([len(t) for t in mapper.bin_thresholds_], dtype=np.int32)
+        thresholds = np.full((n_features, max(1, n_thresholds.max())), np.inf, dtype=np.float32)
+        for j, t in enumerate(mapper.bin_thresholds_):
+            thresholds[j, :len(t)] = t
+
+        fields = {k: [] for k in ("feature", "bin_threshold", "left", "right", "missing_left", "is_leaf", "value")}
+        roots, offset = [], 0
+        for (predictor,) in est._predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("Les splits catégoriels natifs ne sont pas supportés.")
+            leaf = nodes["is_leaf"].astype(bool)
+            fields["feature"].append(np.where(leaf, 0, nodes["feature_idx"]))
+            fields["bin_threshold"].append(nodes["bin_threshold"])
+            fields["left"].append(nodes["left"].astype(np.int64) + offset)
+            fields["right"].append(nodes["right"].astype(np.int64) + offset)
+            fields["missing_left"].append(nodes["missing_go_to_left"].astype(bool))
+            fields["is_leaf"].append(leaf)
+            fields["value"].append(nodes["value"])
+            roots.append(offset)
+            offset += len(nodes)
+
+        feature_dtype = np.uint8 if n_features <= 256 else np.uint16
+        return cls(
+            thresholds=thresholds,
+            n_thresholds=n_thresholds,
+            feature=np.concatenate(fields["feature"]).astype(feature_dtype),
+            bin_threshold=np.concatenate(fields["bin_threshold"]).astype(np.uint8),
+            left=np.concatenate(fields["left"]).astype(np.int32),
+            right=np.concatenate(fields["right"]).astype(np.int32),
+            missing_left=np.concatenate(fields["missing_left"]),
+            is_leaf=np.concatenate(fields["is_leaf"]),
+            value=np.concatenate(fields["value"]).astype(value_dtype),
+            roots=np.asarray(roots, dtype=np.int32),
+            baseline=float(np.ravel(est._baseline_prediction)[0]),
+            missing_bin=mapper.missing_values_bin_idx_,
+            model_version=model_version,
+        )
+
+    # ----------------------------------------------------
+    # Export / chargement (.npz)
+    # ----------------------------------------------------
+    def save(self, path: Path) -> None:
+        np.savez(path, baseline=self.baseline, missing_bin=self.missing_bin,
+                 model_version=self.model_version, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path: Path, model_version: Optional[str] = None) -> Optional["QuantizedForest"]:
+        """Variante exportée, ou None si le fichier manque ou vient d'une autre version du modèle."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            forest = cls(**{k: data[k] for k in data.files})
+        if model_version is not None and forest.model_version != model_version:
+            return None
+        return forest
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    # ----------------------------------------------------
+    # Binning + traversée
+    # ----------------------------------------------------
+    def bin(self, X: np.ndarray) -> np.ndarray:
+        """Matrice uint8 des bins (bin "manquant" pour NaN), valeurs arrondies en float32."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        out = np.empty(X.shape, dtype=np.uint8)
+        if NUMBA_AVAILABLE:
+            _bin_kernel(X, self.thresholds, self.n_thresholds, self.missing_bin, out)
+            return out
+        for j in range(X.shape[1]):
+            col = X[:, j].astype(np.float32)
+            out[:, j] = np.searchsorted(self.thresholds[j, :self.n_thresholds[j]], col, side="left")
+            out[np.isnan(col), j] = self.missing_bin
+        return out
+
+    def predict_binned(self, B: np.ndarray) -> np.ndarray:
+        B = np.ascontiguousarray(B, dtype=np.uint8)
+        out = np.empty(B.shape[0])
+        if NUMBA_AVAILABLE:
+            _predict_binned_kernel(B, self.feature, self.bin_threshold, self.left, self.right, self.missing_left,
+                                   self.is_leaf, self.value, self.roots, self.baseline, self.missing_bin, out)
+            return out
+        n_rows, n_trees = B.shape[0], len(self.roots)
+        flat = B.ravel()
+        nodes = np.tile(self.roots.astype(np.intp), n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * B.shape[1], n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            nd = nodes[active]
+            b = flat[row_offset[active] + self.feature[nd]]
+            go_left = np.where(b == self.missing_bin, self.missing_left[nd], b <= self.bin_threshold[nd])
+            nxt = np.where(go_left, self.left[nd], self.right[nd])
+            nodes[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        # baseline puis arbres dans l'ordre, comme sklearn
+        terms = np.column_stack([np.full(n_rows, self.baseline),
+                                 self.value[nodes.reshape(n_rows, n_trees)].astype(np.float64)])
+        return np.cumsum(terms, axis=1)[:, -1]
+
+    def predict(self, X: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Prédictions à partir de la matrice transformée par le preprocessing (binée par blocs)."""
+        X = np.asarray(X)
+        out = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], chunk_size):
+            out[start:start + chunk_size] = self.predict_binned(self.bin(X[start:start + chunk_size]))
+        return out
@@ -0,0 +1,311 @@
+#scripts/retrain.py
+"""
+Réentraînement incrémental du modèle HGB publié, sans relancer le notebook.
+
+1. Détection des nouvelles lignes de inputs/processed/clean_data.csv par
+   rapport au manifeste du modèle publié (hash de chaque ligne).
+2. Réajustement de la seule configuration HGB retenue, avec les
+   hyperparamètres du modèle publié (pas de benchmark ni de RandomizedSearch) :
+   - mode "refit"      : nouvel ajustement avec ces hyperparamètres ;
+   - mode "warm-start" : preprocessing figé, `--extra-iter` arbres ajoutés au
+     modèle publié (warm_start de sklearn), dans la limite de `--max-total-iter`
+     arbres au total ; au-delà, il faut repartir d'un refit. Le candidat de
+     validation part de la variante « train seul » du modèle publié
+     (`.train.joblib`, années < time_split_year), pas du modèle publié lui-même
+     s'il a appris les années de test ; sans cette variante, le warm-start est
+     refusé.
+3. Validation sur le split temporel (train : year < time_split_year, test :
+   year >= time_split_year) et comparaison au R² test du modèle publié, tel
+   qu'enregistré dans son manifeste (mesuré avant l'ajustement final) ; la
+   publication est refusée si le R² test baisse de plus de `--max-r2-drop`.
+   Le modèle publié n'est jamais réévalué sur ces années : avec
+   `--final-fit all`, il les a apprises et son score serait in-sample.
+   En mode refit, la configuration est aussi validée par `--cv-folds` folds
+   rolling origin sur les années d'entraînement (scripts/cv_splits.py,
+   matrices en cache), avec le même seuil sur le R² moyen de CV.
+4. Ajustement final (toutes les lignes par défaut) et publication atomique
+   (fichier temporaire + os.replace) du modèle et de son manifeste (années
+   apprises : `fit_years`), du modèle validé en `.train.joblib` si le modèle
+   final a aussi appris les années de test, puis
+   réexport de l'index des voisins climatiques (model/area_neighbors.pkl,
+   lié à la version du modèle) pour le repli des pays inconnus.
+
+Usage :
+    python -m scripts.retrain                      # ne fait rien s'il n'y a pas de nouvelles lignes
+    python -m scripts.retrain --mode warm-start --extra-iter 100
+    python -m scripts.retrain --init-manifest      # enregistre les données actuelles comme déjà apprises
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from scripts.build_area_index import build_index
+from scripts.cv_splits import CACHE_DIR, YearRollingOriginSplit, cached_folds, cross_validate_cached
+from scripts.data import DATA_PATH, FEATURE_COLS, TARGET, TIME_SPLIT_YEAR, compact, load_dataset, time_split
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR.parent / "model" / "hgb_optimized.joblib"
+
+
+# ========================================================
+# Manifeste : quelles lignes le modèle publié a-t-il vues ?
+# ========================================================
+def manifest_paths(model_path: Path):
+    return model_path.with_suffix(".manifest.json"), model_path.with_suffix(".rows.npy")
+
+def train_model_path(model_path: Path) -> Path:
+    """Variante du modèle publié ajustée sur les seules années < time_split_year (base du warm-start)."""
+    return model_path.with_suffix(".train.joblib")
+
+def area_index_path(model_path: Path) -> Path:
+    return model_path.parent / "area_neighbors.pkl"
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash 64 bits de chaque ligne (features + cible), calculé sur les types compacts de scripts/data.py."""
+    return pd.util.hash_pandas_object(compact(df[FEATURE_COLS + [TARGET]]), index=False).to_numpy()
+
+def new_rows_mask(df: pd.DataFrame, known_hashes: np.ndarray) -> np.ndarray:
+    return ~np.isin(row_hashes(df), known_hashes)
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_known_hashes(model_path: Path) -> np.ndarray:
+    _, rows_path = manifest_paths(model_path)
+    if not rows_path.exists():
+        return np.empty(0, dtype=np.uint64)
+    return np.load(rows_path)
+
+
+# ========================================================
+# Publication atomique
+# ========================================================
+def _atomic_write(path: Path, write) -> None:
+    """Écrit dans un fichier temporaire du même dossier puis le renomme (os.replace est atomique)."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def publish(model, df: pd.DataFrame, model_path: Path, metrics: dict, write_model: bool = True,
+            fit_years=None, train_model=None, time_split_year: int = TIME_SPLIT_YEAR) -> dict:
+    """
+    Publie le modèle + manifeste ; l'ancien modèle est conservé en .prev.joblib.
+    `fit_years` : années apprises par le modèle (toutes celles de `df` par défaut).
+    `train_model` : variante ajustée sur les années < time_split_year, publiée à
+    côté pour valider les warm-start suivants hors échantillon.
+    """
+    manifest_path, rows_path = manifest_paths(model_path)
+    if write_model:
+        if model_path.exists():
+            shutil.copy2(model_path, model_path.with_suffix(".prev.joblib"))
+        _atomic_write(model_path, lambda f: joblib.dump(model, f))
+        train_path = train_model_path(model_path)
+        if train_model is not None:
+            _atomic_write(train_path, lambda f: joblib.dump(train_model, f))
+        else:
+            train_path.unlink(missing_ok=True)  # variante de la version précédente
+
+    _atomic_write(rows_path, lambda f: np.save(f, np.sort(row_hashes(df))))
+    manifest = {
+        "model_version": file_sha256(model_path)[:12],
+        "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "n_rows": int(len(df)),
+        "years": [int(df["year"].min()), int(df["year"].max())],
+        "fit_years": [int(y) for y in (fit_years or (df["year"].min(), df["year"].max()))],
+        "train_model_split_year": time_split_year if train_model is not None else None,
+        "params": {k: v for k, v in model[-1].get_params().items() if isinstance(v, (int, float, str, bool, type(None)))},
+        "metrics": metrics,
+    }
+    _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    if write_model:
+        # l'ancien index porte l'ancienne version : sans réexport, l'API le reconstruirait en pleine requête
+        index = build_index(model, df, manifest["model_version"])
+        _atomic_write(area_index_path(model_path), lambda f: f.write(index.dumps()))
+    return manifest
+
+
+# ========================================================
+# Réajustement
+# ========================================================
+MAX_TOTAL_ITER = 2000
+
+def fit_candidate(published, X: pd.DataFrame, y: pd.Series, mode: str = "refit", extra_iter: int = 100,
+                  max_total_iter: int = MAX_TOTAL_ITER):
+    """Ajuste la configuration publiée sur (X, y), sans recherche d'hyperparamètres."""
+    if mode == "refit":
+        return clone(published).fit(X, y)
+    if mode == "warm-start":
+        # preprocessing figé (mêmes colonnes one-hot) : seuls des arbres sont ajoutés
+        candidate = copy.deepcopy(published)
+        est = candidate[-1]
+        room = max_total_iter - est.n_iter_
+        if room <= 0:
+            raise ValueError(f"Published model already has {est.n_iter_} trees (max {max_total_iter}): "
+                             "use --mode refit")
+        est.set_params(warm_start=True, max_iter=est.n_iter_ + min(extra_iter, room))
+        est.fit(candidate[:-1].transform(X), y)
+        return candidate
+    raise ValueError(f"Unsupported mode: {mode}")
+
+def warm_start_base(published, model_path: Path, time_split_year: int):
+    """
+    Modèle de départ du candidat de validation en warm-start. Le modèle publié
+    s'il n'a appris aucune année >= time_split_year, sinon sa variante train
+    seul ; sans elle, ValueError : le R² test serait in-sample.
+    """
+    manifest_path, _ = manifest_paths(model_path)
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    fit_years = manifest.get("fit_years") or manifest.get("years")
+    if fit_years is not None and fit_years[1] < time_split_year:
+        return published
+    train_path = train_model_path(model_path)
+    if manifest.get("train_model_split_year") == time_split_year and train_path.exists():
+        return joblib.load(train_path)
+    raise ValueError(f"Published model has learned years >= {time_split_year} and has no train-only variant "
+                     "to validate a warm start out of sample: use --mode refit")
+
+def reference_metrics(published, model_path: Path, X_train: pd.DataFrame, y_train: pd.Series,
+                      X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    """
+    Score hors échantillon du modèle publié : les métriques de son manifeste
+    (calculées avant l'ajustement final), sinon sa configuration réajustée
+    sur les seules années d'entraînement.
+    """
+    manifest_path, _ = manifest_paths(model_path)
+    if manifest_path.exists():
+        metrics = json.loads(manifest_path.read_text()).get("metrics") or {}
+        if "R2_test" in metrics:
+            return metrics
+    return evaluate(clone(published).fit(X_train, y_train), X_test, y_test)
+
+def time_cv(published, X_train: pd.DataFrame, y_train: pd.Series, n_splits: int = 5,
+            cache_dir: Path = CACHE_DIR) -> dict:
+    """
+    Validation croisée rolling origin de la configuration publiée sur les années
+    d'entraînement : preprocessing réajusté par fold, matrices relues du cache.
+    """
+    folds = cached_folds(X_train, y_train, YearRollingOriginSplit(n_splits=n_splits), clone(published[0]), cache_dir)
+    r2 = cross_validate_cached(clone(published[-1]), folds, y_train)["test_R2"]
+    return {"CV_R2_mean": float(r2.mean()), "CV_R2_std": float(r2.std())}
+
+def evaluate(model, X: pd.DataFrame, y: pd.Series) -> dict:
+    pred = model.predict(X)
+    return {
+        "R2_test": float(r2_score(y, pred)),
+        "RMSE_test": float(np.sqrt(mean_squared_error(y, pred))),
+        "MAE_test": float(mean_absolute_error(y, pred)),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Réentraînement incrémental du modèle HGB publié.")
+    parser.add_argument("--data", type=Path, default=DATA_PATH)
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument("--mode", choices=["refit", "warm-start"], default="refit")
+    parser.add_argument("--extra-iter", type=int, default=100, help="arbres ajoutés en mode warm-start")
+    parser.add_argument("--max-total-iter", type=int, default=MAX_TOTAL_ITER,
+                        help="nombre maximal d'arbres du modèle en mode warm-start")
+    parser.add_argument("--time-split-year", type=int, default=TIME_SPLIT_YEAR)
+    parser.add_argument("--final-fit", choices=["all", "train"], default="all",
+                        help="lignes du modèle publié : toutes (défaut) ou seulement year < time_split_year")
+    parser.add_argument("--max-r2-drop", type=float, default=0.01)
+    parser.add_argument("--cv-folds", type=int, default=5,
+                        help="folds rolling origin de la validation en mode refit (0 : pas de CV)")
+    parser.add_argument("--force", action="store_true", help="réentraîner même sans nouvelles lignes")
+    parser.add_argument("--init-manifest", action="store_true",
+                        help="enregistre les données actuelles comme déjà apprises, sans réentraîner")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    df = load_dataset(args.data)
+    published = joblib.load(args.model)
+
+    X_train, y_train, X_test, y_test = time_split(df, args.time_split_year)
+    if args.init_manifest:
+        # pas de manifeste à relire : configuration réajustée sur le train (score hors échantillon)
+        metrics = evaluate(clone(published).fit(X_train, y_train), X_test, y_test)
+        if args.cv_folds:
+            metrics.update(time_cv(published, X_train, y_train, args.cv_folds))
+        manifest = publish(published, df, args.model, metrics, write_model=False)
+        print(f"✓ Manifeste initialisé ({manifest['n_rows']} lignes, version {manifest['model_version']})")
+        return 0
+
+    new_mask = new_rows_mask(df, load_known_hashes(args.model))
+    n_new = int(new_mask.sum())
+    if n_new:
+        years = sorted(df.loc[new_mask, "year"].unique().tolist())
+        print(f"✓ {n_new} nouvelles lignes détectées (années : {years})")
+    elif not args.force:
+        print("✓ Aucune nouvelle ligne : le modèle publié est à jour.")
+        return 0
+
+    X, y = df[FEATURE_COLS], df[TARGET]
+
+    # Validation sur le split temporel, comparée au modèle publié
+    try:
+        base = warm_start_base(published, args.model, args.time_split_year) if args.mode == "warm-start" else published
+        validated = fit_candidate(base, X_train, y_train, args.mode, args.extra_iter, args.max_total_iter)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    metrics = evaluate(validated, X_test, y_test)
+    reference = reference_metrics(published, args.model, X_train, y_train, X_test, y_test)
+    print(f"✓ Validation (year >= {args.time_split_year}) : R²={metrics['R2_test']:.4f} "
+          f"(publié : {reference['R2_test']:.4f}), MAE={metrics['MAE_test']:,.0f} hg/ha")
+    if metrics["R2_test"] < reference["R2_test"] - args.max_r2_drop:
+        print(f"✗ R² en baisse de plus de {args.max_r2_drop} : publication annulée.")
+        return 1
+
+    # en warm-start, les arbres s'ajoutent au modèle publié : pas de configuration à revalider par fold
+    if args.mode == "refit" and args.cv_folds:
+        metrics.update(time_cv(published, X_train, y_train, args.cv_folds))
+        print(f"✓ CV rolling origin ({args.cv_folds} folds, year < {args.time_split_year}) : "
+              f"R²={metrics['CV_R2_mean']:.4f} ± {metrics['CV_R2_std']:.4f}"
+              + (f" (publié : {reference['CV_R2_mean']:.4f})" if "CV_R2_mean" in reference else ""))
+        if "CV_R2_mean" in reference and metrics["CV_R2_mean"] < reference["CV_R2_mean"] - args.max_r2_drop:
+            print(f"✗ R² de CV en baisse de plus de {args.max_r2_drop} : publication annulée.")
+            return 1
+
+    if args.final_fit == "all":
+        final = fit_candidate(published, X, y, args.mode, args.extra_iter, args.max_total_iter)
+        manifest = publish(final, df, args.model, metrics, train_model=validated,
+                           time_split_year=args.time_split_year)
+    else:
+        manifest = publish(validated, df, args.model, metrics,
+                           fit_years=(X_train["year"].min(), X_train["year"].max()),
+                           time_split_year=args.time_split_year)
+    print(f"✅ Modèle {manifest['model_version']} publié ici : {args.model} ({time.time() - start:.0f} s)")
+    print("   Pensez à réentraîner les quantiles : python -m scripts.train_quantiles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
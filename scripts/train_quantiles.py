@@ -0,0 +1,171 @@
+#scripts/train_quantiles.py
+"""
+Entraînement des variantes quantiles (P10 / P50 / P90) du modèle HGB.
+
+Les variantes réutilisent :
+- le preprocessing déjà ajusté de `hgb_optimized.joblib` (même OneHotEncoder /
+  StandardScaler), ce qui permet au serveur de ne transformer l'entrée qu'une
+  seule fois pour le modèle ponctuel et tous les quantiles ;
+- les hyperparamètres optimisés du modèle ponctuel, avec loss="quantile".
+
+Validation : chaque niveau est aussi évalué par `--cv-folds` folds rolling
+origin sur les années d'entraînement (scripts/cv_splits.py, preprocessing
+réajusté par fold et matrices relues du cache), en plus du split temporel.
+
+Recalibration (conformal, par niveau) : la perte quantile seule sous-couvre
+sur les années futures (P10-P90 : 57 % sur le test au lieu de 80 %). Pour
+chaque niveau q, le décalage est le quantile q des résidus y - prédiction
+hors fold de la CV ; il est ajouté à la constante initiale de l'estimateur
+(`_baseline_prediction`, lue aussi par scripts/flat_forest.py), sans changer
+le format du fichier ni le chemin de prédiction. Décalage appliqué exposé
+dans `conformal_offset_`. `--no-calibration` garde les quantiles bruts.
+
+Le manifeste `hgb_quantiles.manifest.json` (à côté des modèles) garde les
+décalages et la couverture mesurée sur le test ; l'API la sert dans /health.
+
+Usage :
+    python -m scripts.train_quantiles --quantiles 0.1 0.5 0.9
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from scripts.cv_splits import CACHE_DIR, YearRollingOriginSplit, cached_folds, cross_validate_cached
+from scripts.data import TIME_SPLIT_YEAR, load_dataset, time_split
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_PATH = BASE_DIR.parent / "model" / "hgb_optimized.joblib"
+QUANTILE_MODELS_PATH = BASE_DIR.parent / "model" / "hgb_quantiles.joblib"
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def pinball_loss(y_true, y_pred, q: float) -> float:
+    diff = y_true - y_pred
+    return float(np.mean(np.maximum(q * diff, (q - 1) * diff)))
+
+
+def train_quantile_models(pipeline, X_train: pd.DataFrame, y_train: pd.Series, quantiles) -> dict:
+    """Ajuste un HGB quantile par niveau, sur la matrice transformée par le preprocessing du pipeline."""
+    Xt_train = pipeline[:-1].transform(X_train)
+    models = {}
+    for q in quantiles:
+        est = clone(pipeline[-1]).set_params(loss="quantile", quantile=q)
+        models[float(q)] = est.fit(Xt_train, y_train)
+    return models
+
+
+def oof_quantile_predictions(pipeline, X_train: pd.DataFrame, y_train: pd.Series, quantiles, n_splits: int = 5,
+                             cache_dir: Path = CACHE_DIR) -> Dict[float, List[Tuple[np.ndarray, np.ndarray]]]:
+    """{quantile: [(y du fold de test, prédiction hors fold)]} sur les folds rolling origin en cache."""
+    folds = cached_folds(X_train, y_train, YearRollingOriginSplit(n_splits=n_splits), clone(pipeline[0]), cache_dir)
+    y = y_train.to_numpy()
+    oof = {}
+    for q in quantiles:
+        est = clone(pipeline[-1]).set_params(loss="quantile", quantile=q)
+        preds = cross_validate_cached(est, folds, y, return_predictions=True)["predictions"]
+        oof[float(q)] = [(y[fold.test_idx], p) for fold, p in zip(folds, preds)]
+    return oof
+
+
+def quantile_scores(oof: Dict[float, List[Tuple[np.ndarray, np.ndarray]]]) -> pd.DataFrame:
+    """Pinball et part des observations <= quantile, par niveau et par fold."""
+    return pd.DataFrame([{"quantile": q, "fold": k, "pinball": pinball_loss(y_test, p, q),
+                          "below": float(np.mean(y_test <= p))}
+                         for q, folds in oof.items() for k, (y_test, p) in enumerate(folds)])
+
+
+def cross_validate_quantiles(pipeline, X_train: pd.DataFrame, y_train: pd.Series, quantiles,
+                             n_splits: int = 5, cache_dir: Path = CACHE_DIR) -> pd.DataFrame:
+    """Pinball et part des observations <= quantile, par niveau et par fold rolling origin."""
+    return quantile_scores(oof_quantile_predictions(pipeline, X_train, y_train, quantiles, n_splits, cache_dir))
+
+
+def conformal_offsets(oof: Dict[float, List[Tuple[np.ndarray, np.ndarray]]]) -> Dict[float, float]:
+    """Décalage par niveau q : quantile q des résidus hors fold (y - prédiction), tous folds confondus."""
+    offsets = {}
+    for q, folds in oof.items():
+        residuals = np.concatenate([y_test - p for y_test, p in folds])
+        offsets[q] = float(np.quantile(residuals, q))
+    return offsets
+
+
+def calibrate(models: dict, offsets: Dict[float, float]) -> dict:
+    """Ajoute le décalage de chaque niveau à la constante initiale de son estimateur (en place)."""
+    for q, est in models.items():
+        offset = offsets.get(q, 0.0)
+        est._baseline_prediction = est._baseline_prediction + offset
+        est.conformal_offset_ = offset
+    return models
+
+
+def manifest_path(models_path: Path) -> Path:
+    return models_path.with_suffix(".manifest.json")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Entraîne les variantes quantiles du modèle HGB.")
+    parser.add_argument("--quantiles", type=float, nargs="+", default=list(DEFAULT_QUANTILES))
+    parser.add_argument("--time-split-year", type=int, default=TIME_SPLIT_YEAR)
+    parser.add_argument("--cv-folds", type=int, default=5, help="folds rolling origin (0 : pas de CV)")
+    parser.add_argument("--no-calibration", action="store_true",
+                        help="pas de recalibration conformal sur les prédictions hors fold de la CV")
+    parser.add_argument("--out", type=Path, default=QUANTILE_MODELS_PATH)
+    args = parser.parse_args(argv)
+    if not args.cv_folds and not args.no_calibration:
+        parser.error("la recalibration utilise la CV : --cv-folds > 0 ou --no-calibration")
+
+    X_train, y_train, X_test, y_test = time_split(load_dataset(), args.time_split_year)
+
+    pipeline = joblib.load(MODEL_PATH)
+    offsets = {}
+    if args.cv_folds:
+        oof = oof_quantile_predictions(pipeline, X_train, y_train, args.quantiles, args.cv_folds)
+        summary = quantile_scores(oof).groupby("quantile")[["pinball", "below"]].mean()
+        for q, row in summary.iterrows():
+            print(f"✓ CV rolling origin ({args.cv_folds} folds) q={q:.2f} : pinball={row['pinball']:,.0f} hg/ha, "
+                  f"part des observations <= quantile={row['below']:.3f}")
+        if not args.no_calibration:
+            offsets = conformal_offsets(oof)
+            for q, offset in offsets.items():
+                print(f"✓ Recalibration q={q:.2f} : décalage {offset:+,.0f} hg/ha")
+
+    models = calibrate(train_quantile_models(pipeline, X_train, y_train, args.quantiles), offsets)
+
+    # Évaluation sur le split temporel (year >= time_split_year)
+    Xt_test = pipeline[:-1].transform(X_test)
+    preds = {q: m.predict(Xt_test) for q, m in models.items()}
+    test_below = {}
+    for q, p in preds.items():
+        test_below[q] = float(np.mean(y_test.to_numpy() <= p))
+        print(f"✓ q={q:.2f} : pinball={pinball_loss(y_test.to_numpy(), p, q):,.0f} hg/ha, "
+              f"part des observations <= quantile={test_below[q]:.3f}")
+    q_lo, q_hi = min(preds), max(preds)
+    coverage = float(np.mean((y_test >= preds[q_lo]) & (y_test <= preds[q_hi])))
+    print(f"✓ Couverture [{q_lo:.2f}, {q_hi:.2f}] sur le test : {coverage:.3f}")
+
+    joblib.dump(models, args.out, compress=3)
+    manifest = {
+        "model_version": hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest()[:12],
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "time_split_year": args.time_split_year,
+        "calibrated": bool(offsets),
+        "conformal_offsets": {str(q): round(v, 3) for q, v in offsets.items()},
+        "test_below": {str(q): round(v, 4) for q, v in test_below.items()},
+        "test_coverage": {"interval": [q_lo, q_hi], "target": round(q_hi - q_lo, 4), "measured": round(coverage, 4)},
+    }
+    manifest_path(args.out).write_text(json.dumps(manifest, indent=2))
+    print(f"✅ Modèles quantiles sauvegardés ici : {args.out} (manifeste : {manifest_path(args.out).name})")
+
+
+if __name__ == "__main__":
+    main()
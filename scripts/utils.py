@@ -35,17 +35,17 @@ def save_pred_vs_true_plot(y_true, y_pred, out_path):
 # Fonction pour ajouter l'effet de l'irrigation et fertilization sur le rendement 
 #================================================================================
 
-def apply_optional_scenarios(yield_hg_ha: float, irrigation: bool = False, fertilizer: bool = False) -> float:
+def apply_optional_scenarios(yield_hg_ha: float, irrigation: bool = False, fertilizer: bool = False,
+                             item: str = None, area: str = None) -> float:
     """
     Post-ajustement additif (what-if) pour irrigation/fertilisation.
-    Hypothèse: effet moyen constant, additif.
+    Hypothèse: effet additif, par culture et groupe de pays, lu dans
+    inputs/practice_effects.json (valeurs par défaut si item/area non fournis).
     """
-    adj = 0.0
-    if irrigation:
-        adj += 12000
-    if fertilizer:
-        adj += 15000
-    return yield_hg_ha + adj
+    from scripts.practice_effects import get_practice_effects
+
+    adj = get_practice_effects().adjustment([item], area, irrigation, fertilizer)[0]
+    return yield_hg_ha + float(adj)
 
 #================================================================================
 # Fonction pour ajuster le prix vs unité de rendement
@@ -6,7 +6,10 @@ from unittest.mock import Mock, patch
 import json
 from pathlib import Path
 import sys
-from api.main import (app, PredictRequest, RecommendRevenueRequest, load_candidate_items, CANDIDATE_ITEMS )
+import numpy as np
+import pandas as pd
+from api.main import (app, PredictRequest, RecommendRevenueRequest, load_candidate_items, CANDIDATE_ITEMS, frame_to_rows,
+                      response_cache, rate_limiter )
 from scripts.predictor import model
 from scripts.utils import compute_revenue_per_ha
 
@@ -14,6 +17,13 @@ from scripts.utils import compute_revenue_per_ha
 # Création du client de test
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def reset_middleware_state():
+    """Vide le cache des réponses (handlers mockés) et les seaux de la limitation de débit entre deux tests"""
+    response_cache.clear()
+    rate_limiter.reset()
+
 # ---------------------------------------------------------
 # Tests unitaires pour les fonctions utilitaires
 # ---------------------------------------------------------
@@ -141,6 +151,14 @@ class TestHealthEndpoint:
         assert "endpoints" in data
         assert "/predict" in data["endpoints"]
 
+    def test_health_reports_quantile_coverage(self):
+        """Couverture [P10, P90] lue dans le manifeste des quantiles, pas codée en dur"""
+        from scripts.train_quantiles import QUANTILE_MODELS_PATH, manifest_path
+
+        coverage = client.get("/health").json()["quantile_coverage"]
+        assert coverage == json.loads(manifest_path(QUANTILE_MODELS_PATH).read_text())["test_coverage"]
+        assert coverage["target"] == 0.8 and 0 < coverage["measured"] <= 1
+
 class TestPredictEndpoint:
     """Tests pour l'endpoint /predict"""
     
@@ -255,12 +273,10 @@ class TestRecommendYieldEndpoint:
     def test_recommend_yield_success(self, mock_recommend):
         """Test de recommandation par rendement"""
         # Mock du résultat
-        mock_df = Mock()
-        mock_df.iterrows.return_value = [
-            (0, {"item": "maize", "pred_yield_hg_ha": 15000.0, "pred_yield_t_ha": 1.5}),
-            (1, {"item": "wheat", "pred_yield_hg_ha": 12000.0, "pred_yield_t_ha": 1.2})
-        ]
-        mock_recommend.return_value = mock_df
+        mock_recommend.return_value = pd.DataFrame([
+            {"item": "maize", "pred_yield_hg_ha": 15000.0, "pred_yield_t_ha": 1.5},
+            {"item": "wheat", "pred_yield_hg_ha": 12000.0, "pred_yield_t_ha": 1.2}
+        ])
         
         request_data = {
             "area": "France",
@@ -316,18 +332,14 @@ class TestRecommendRevenueEndpoint:
     def test_recommend_revenue_success(self, mock_recommend):
         """Test de recommandation par revenu"""
         # Mock du résultat
-        mock_df = Mock()
-        mock_df.iterrows.return_value = [
-            (0, {
-                "item": "maize", 
-                "pred_yield_hg_ha": 15000.0, 
-                "pred_yield_t_ha": 1.5,
-                "revenue_per_ha": 300.0,
-                "price_value": 200.0,
-                "price_unit": "eur_per_t"
-            })
-        ]
-        mock_recommend.return_value = mock_df
+        mock_recommend.return_value = pd.DataFrame([{
+            "item": "maize",
+            "pred_yield_hg_ha": 15000.0,
+            "pred_yield_t_ha": 1.5,
+            "revenue_per_ha": 300.0,
+            "price_value": 200.0,
+            "price_unit": "eur_per_t"
+        }])
         
         request_data = {
             "area": "France",
@@ -420,6 +432,1124 @@ class TestRecommendRevenueEndpoint:
         assert response.status_code == 500
 
 
+# ---------------------------------------------------------
+# Tests de la sérialisation rapide
+# ---------------------------------------------------------
+
+def test_frame_to_rows():
+    """Les lignes sont construites colonne par colonne avec des types JSON natifs"""
+    df = pd.DataFrame({
+        "item": ["maize", "wheat"],
+        "pred_yield_hg_ha": [15000.0, 12000.0],
+        "pred_yield_t_ha": [1.5, 1.2],
+        "irrigation": [False, False],
+    })
+    rows = frame_to_rows(df, ["item", "pred_yield_hg_ha", "pred_yield_t_ha"])
+
+    assert rows == [
+        {"item": "maize", "pred_yield_hg_ha": 15000.0, "pred_yield_t_ha": 1.5},
+        {"item": "wheat", "pred_yield_hg_ha": 12000.0, "pred_yield_t_ha": 1.2},
+    ]
+    assert type(rows[0]["pred_yield_hg_ha"]) is float
+
+
+def test_recommend_schema_in_openapi():
+    """Le schéma de réponse reste documenté malgré le contournement de response_model"""
+    schema = client.get("/openapi.json").json()
+    response_schema = schema["paths"]["/recommend/yield"]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert response_schema["$ref"].endswith("/RecommendResponse")
+
+
+# ---------------------------------------------------------
+# Tests des quantiles (P10/P50/P90)
+# ---------------------------------------------------------
+
+class TestQuantiles:
+    """Tests des intervalles de rendement par modèles quantiles"""
+
+    base_request = {
+        "area": "france",
+        "year": 2010,
+        "avg_rain_mm": 867.0,
+        "pesticides_tonnes": 60000.0,
+        "avg_temp": 11.5,
+        "irrigation": True,
+        "fertilizer": False,
+    }
+
+    def test_predict_with_quantiles(self):
+        """Quantiles ordonnés et ajustés comme la prédiction ponctuelle"""
+        request_data = {**self.base_request, "item": "maize", "quantiles": [0.9, 0.1, 0.5]}
+        response = client.post("/predict", json=request_data)
+
+        assert response.status_code == 200
+        q = response.json()["quantiles"]
+        assert list(q) == ["p10", "p50", "p90"]
+        assert q["p10"] <= q["p50"] <= q["p90"]
+
+    def test_quantiles_share_one_transform(self):
+        """Le preprocessing n'est appliqué qu'une fois pour le modèle ponctuel et les quantiles"""
+        from scripts.predictor import predict_with_quantiles, quantile_models
+
+        X_in = pd.DataFrame([{**{k: self.base_request[k] for k in ["area", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]},
+                              "item": it} for it in ["maize", "wheat"]])
+        with patch.object(type(model[0]), "transform", autospec=True, side_effect=type(model[0]).transform) as spy:
+            base, qs = predict_with_quantiles(model, X_in, quantile_models, [0.1, 0.9])
+
+        assert spy.call_count == 1
+        assert base.tolist() == pytest.approx(model.predict(X_in).tolist())
+        assert (qs["p10"] <= qs["p90"]).all()
+
+    def test_flat_forest_matches_sklearn(self):
+        """La traversée aplatie donne exactement les prédictions de sklearn"""
+        from scripts.flat_forest import FlatForest
+        from scripts.predictor import quantile_models
+
+        X_in = pd.DataFrame([{**{k: self.base_request[k] for k in ["area", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]},
+                              "item": it} for it in CANDIDATE_ITEMS])
+        Xt = model[:-1].transform(X_in)
+        forest = FlatForest([model[-1], quantile_models[0.1]])
+        preds = forest.predict(Xt)
+
+        assert (preds[:, 0] == model[-1].predict(Xt)).all()
+        assert (preds[:, 1] == quantile_models[0.1].predict(Xt)).all()
+
+    def test_recommend_with_quantiles(self):
+        """Chaque ligne de recommandation porte ses quantiles, les champs absents valent None"""
+        request_data = {**self.base_request, "top_k": 3, "quantiles": [0.1, 0.9]}
+        response = client.post("/recommend/yield", json=request_data)
+
+        assert response.status_code == 200
+        rows = response.json()["results"]
+        assert len(rows) == 3
+        for row in rows:
+            assert set(row["quantiles"]) == {"p10", "p90"}
+            assert row["revenue_per_ha"] is None
+
+    def test_unsupported_quantile(self):
+        """Un quantile sans modèle entraîné est refusé en 400"""
+        request_data = {**self.base_request, "item": "maize", "quantiles": [0.25]}
+        response = client.post("/predict", json=request_data)
+
+        assert response.status_code == 400
+
+
+# ---------------------------------------------------------
+# Tests de l'explicabilité
+# ---------------------------------------------------------
+
+class TestExplain:
+    """Tests de /explain et de l'importance par permutation"""
+
+    request_data = {
+        "area": "belgium",
+        "item": "potatoes",
+        "year": 2010,
+        "avg_rain_mm": 847.0,
+        "pesticides_tonnes": 6000.0,
+        "avg_temp": 10.5,
+        "irrigation": False,
+        "fertilizer": True,
+    }
+
+    def test_explain_contributions_sum_to_prediction(self):
+        """base_value + contributions + ajustement = prédiction de /predict"""
+        response = client.post("/explain", json=self.request_data)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["contributions"]) == {"area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"}
+        total = data["base_value"] + sum(data["contributions"].values()) + data["scenario_adjustment"]
+        assert total == pytest.approx(data["pred_yield_hg_ha"])
+        assert data["scenario_adjustment"] == 15000
+
+        predicted = client.post("/predict", json=self.request_data).json()
+        assert data["pred_yield_hg_ha"] == pytest.approx(predicted["pred_yield_hg_ha"])
+
+    def test_permutation_importance_parallel(self):
+        """Une variable ignorée par le modèle a une importance nulle"""
+        from scripts.explain import permutation_importance_parallel
+
+        X = pd.DataFrame([{**self.request_data, "item": it, "year": 2000 + i}
+                          for i, it in enumerate(CANDIDATE_ITEMS)])[["area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]]
+        y = model.predict(X)
+        imp = permutation_importance_parallel(model, X, y, n_repeats=3, n_jobs=1).set_index("feature")
+
+        assert imp.loc["avg_temp", "importance_mean"] == 0
+        assert imp.loc["item", "importance_mean"] > 0
+
+
+# ---------------------------------------------------------
+# Tests du réentraînement incrémental
+# ---------------------------------------------------------
+
+class TestRetrain:
+    """Tests de la détection de nouvelles lignes et de la publication (scripts/retrain.py)"""
+
+    @staticmethod
+    def _frame(years):
+        return pd.DataFrame({
+            "area": "france", "item": "maize", "year": years,
+            "avg_rain_mm": 867.0, "pesticides_tonnes": 60000.0, "avg_temp": 11.5,
+            "hg/ha_yield": [90000.0 + y for y in years],
+        })
+
+    def test_new_rows_mask(self):
+        """Seules les lignes absentes du manifeste sont détectées"""
+        from scripts.retrain import new_rows_mask, row_hashes
+
+        known = row_hashes(self._frame([2010, 2011, 2012]))
+        mask = new_rows_mask(self._frame([2011, 2012, 2013, 2014]), known)
+        assert mask.tolist() == [False, False, True, True]
+
+    def test_publish_is_atomic_and_writes_manifest(self, tmp_path):
+        """Le modèle est remplacé via un fichier temporaire, l'ancien est conservé"""
+        from scripts.retrain import publish, load_known_hashes
+
+        model_path = tmp_path / "hgb.joblib"
+        model_path.write_bytes(b"old model")
+        df = self._frame([2012, 2013])
+
+        manifest = publish(model, df, model_path, {"R2_test": 0.95})
+
+        assert (tmp_path / "hgb.prev.joblib").read_bytes() == b"old model"
+        assert json.loads((tmp_path / "hgb.manifest.json").read_text())["model_version"] == manifest["model_version"]
+        assert manifest["years"] == [2012, 2013]
+        assert len(load_known_hashes(model_path)) == 2
+        assert not list(tmp_path.glob(".*.tmp"))
+        # index des voisins réexporté avec la version publiée
+        from scripts.area_neighbors import AreaNeighbors
+        assert AreaNeighbors.load(tmp_path / "area_neighbors.pkl", manifest["model_version"]) is not None
+
+    def test_reference_is_manifest_score_and_warm_start_is_capped(self, tmp_path):
+        """La référence est le R² test du manifeste (pas une réévaluation in-sample) ; warm-start borné"""
+        from scripts.retrain import fit_candidate, publish, reference_metrics
+
+        model_path = tmp_path / "hgb.joblib"
+        df = self._frame([2008, 2009, 2010, 2011])
+        publish(model, df, model_path, {"R2_test": 0.95})
+        assert reference_metrics(model, model_path, None, None, None, None)["R2_test"] == 0.95
+
+        with pytest.raises(ValueError, match="refit"):
+            fit_candidate(model, df, df["hg/ha_yield"], "warm-start", extra_iter=10,
+                          max_total_iter=model[-1].n_iter_)
+
+    def test_warm_start_validates_from_train_only_model(self, tmp_path):
+        """Modèle publié ayant appris les années de test : le warm-start part de sa variante train seul, ou est refusé"""
+        from sklearn.base import clone
+        from scripts.retrain import publish, train_model_path, warm_start_base
+
+        model_path = tmp_path / "hgb.joblib"
+        df = self._frame([2008, 2009, 2010, 2011])
+        publish(model, df, model_path, {"R2_test": 0.95}, time_split_year=2010)
+        with pytest.raises(ValueError, match="refit"):
+            warm_start_base(model, model_path, 2010)
+
+        train_only = clone(model).set_params(model__max_iter=5).fit(df.iloc[:2], df["hg/ha_yield"].iloc[:2])
+        manifest = publish(model, df, model_path, {"R2_test": 0.95}, train_model=train_only, time_split_year=2010)
+        assert manifest["fit_years"] == [2008, 2011] and manifest["train_model_split_year"] == 2010
+        assert warm_start_base(model, model_path, 2010)[-1].n_iter_ == train_only[-1].n_iter_
+        with pytest.raises(ValueError, match="refit"):
+            warm_start_base(model, model_path, 2009)  # variante d'un autre split
+
+        # modèle publié ajusté sur le train seul (--final-fit train) : il sert lui-même de base
+        publish(model, df, model_path, {"R2_test": 0.95}, fit_years=(2008, 2009), time_split_year=2010)
+        assert not train_model_path(model_path).exists()
+        assert warm_start_base(model, model_path, 2010) is model
+
+
+# ---------------------------------------------------------
+# Tests du lancement multi-workers
+# ---------------------------------------------------------
+
+class TestServeWorkers:
+    """Tests du calcul du nombre de workers (api/serve.py)"""
+
+    def test_cgroup_cpu_limit(self, tmp_path):
+        """Quota cgroup v2 : arrondi au CPU supérieur, 'max' = illimité"""
+        from api.serve import cgroup_cpu_limit
+
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("150000 100000\n")
+        assert cgroup_cpu_limit(cpu_max) == 2
+
+        cpu_max.write_text("max 100000\n")
+        assert cgroup_cpu_limit(cpu_max) is None
+
+        assert cgroup_cpu_limit(tmp_path / "absent") is None
+
+    def test_default_workers_env(self, monkeypatch):
+        """WEB_CONCURRENCY est prioritaire sur le nombre de CPU"""
+        from api.serve import default_workers
+
+        monkeypatch.setenv("WEB_CONCURRENCY", "3")
+        assert default_workers() == 3
+
+        monkeypatch.delenv("WEB_CONCURRENCY")
+        assert default_workers() >= 1
+
+    def test_restart_backoff(self):
+        """Relance immédiate après une mort isolée, puis 1, 2, 4... s plafonnés"""
+        from api.serve import restart_delay
+
+        assert [restart_delay(n) for n in range(5)] == [0.0, 1.0, 2.0, 4.0, 8.0]
+        assert restart_delay(20) == 30.0
+
+    def test_serving_caches_built_before_fork(self):
+        """Les caches construits d'avance sont ceux que les requêtes réutilisent"""
+        from scripts import predictor
+
+        built = predictor.build_serving_caches(model, predictor.quantile_models)
+        assert "fused_forest" in built and "binned_rows" in built
+        forest, _ = predictor._fused_forests[(id(model[-1]), ())]
+        assert predictor.get_fused_forest(model, {})[0] is forest
+        assert predictor.get_binned_rows(model) is predictor._binned_rows[id(model[-1])]
+
+
+# ---------------------------------------------------------
+# Tests du journal des prédictions
+# ---------------------------------------------------------
+
+class TestPredictionLogger:
+    """Tests du journal asynchrone des prédictions (api/prediction_logger.py)"""
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        """File pleine : l'entrée est abandonnée et comptée"""
+        from api.prediction_logger import PredictionLogger
+
+        logger = PredictionLogger(tmp_path / "predictions.jsonl", max_queue=2)
+        assert logger.log({"i": 0}) and logger.log({"i": 1})
+        assert logger.log({"i": 2}) is False
+        assert logger.stats()["dropped"] == 1
+
+    def test_flush_batches_and_rotation(self, tmp_path):
+        """Écriture JSONL par lots, abonnés notifiés, rotation compressée"""
+        import gzip
+        from api.prediction_logger import PredictionLogger
+
+        path = tmp_path / "predictions.jsonl"
+        logger = PredictionLogger(path, batch_size=2, max_bytes=1, backup_count=1)
+        batches = []
+        logger.subscribe(batches.append)
+        for i in range(3):
+            logger.log({"i": i})
+        assert logger.flush() == 3
+        assert [len(b) for b in batches] == [2, 1]
+        # 2e lot : le fichier dépasse max_bytes, il est compressé avant l'écriture
+        assert [json.loads(l)["i"] for l in path.read_text().splitlines()] == [2]
+        (gz,) = tmp_path.glob("predictions-*.jsonl.gz")
+        assert [json.loads(l)["i"] for l in gzip.open(gz).read().splitlines()] == [0, 1]
+
+    def test_subscriber_errors_are_counted_and_logged(self, tmp_path, caplog):
+        """Un abonné en erreur est journalisé et compté, les autres abonnés reçoivent le lot"""
+        from api.prediction_logger import PredictionLogger
+
+        def broken(batch):
+            raise RuntimeError("drift monitor down")
+
+        logger = PredictionLogger(tmp_path / "predictions.jsonl")
+        received = []
+        logger.subscribe(broken)
+        logger.subscribe(received.append)
+        logger.log({"i": 0})
+        with caplog.at_level("ERROR", logger="api.prediction_logger"):
+            assert logger.flush() == 1
+        assert received == [[{"i": 0}]]
+        assert logger.stats()["subscriber_errors"] == 1 and logger.stats()["written"] == 1
+        assert "drift monitor down" in caplog.text
+
+    @patch("api.main.predict_yield_hg_ha")
+    def test_predict_is_logged(self, mock_predict):
+        """Une prédiction alimente le journal, exposé via /metrics"""
+        mock_predict.return_value = 50000.0
+        before = client.get("/metrics").json()["prediction_log"]["logged"]
+
+        payload = {"area": "France", "item": "maize", "year": 2026,
+                   "avg_rain_mm": 650.0, "pesticides_tonnes": 5000.0, "avg_temp": 12.5}
+        assert client.post("/predict", json=payload).status_code == 200
+
+        metrics = client.get("/metrics").json()
+        assert metrics["prediction_log"]["logged"] == before + 1
+        assert len(metrics["model_version"]) == 12
+
+
+# ---------------------------------------------------------
+# Tests du moniteur de dérive
+# ---------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def drift_reference():
+    """Données d'entraînement, lues une seule fois pour le module"""
+    return pd.read_csv(Path(__file__).resolve().parent.parent / "inputs" / "processed" / "clean_data.csv")
+
+
+class TestDriftMonitor:
+    """Tests du moniteur de dérive en continu (api/drift_monitor.py)"""
+
+    def test_no_drift_on_training_sample(self, drift_reference):
+        """Un échantillon de l'entraînement ne dérive pas"""
+        from api.drift_monitor import DriftMonitor
+
+        monitor = DriftMonitor(drift_reference)
+        sample = drift_reference.sample(2000, random_state=0).to_dict("records")
+        for start in range(0, len(sample), 500):
+            monitor.update([{"input": r} for r in sample[start:start + 500]])
+
+        scores = monitor.scores()
+        assert scores["records"] == 2000 and scores["batches"] == 4
+        assert all(f["status"] == "ok" for f in scores["features"].values())
+        assert scores["unseen_area_rate"] == 0.0
+
+    def test_shift_and_unseen_area_detected(self, drift_reference):
+        """Températures décalées de +3 °C et pays inconnu"""
+        from api.drift_monitor import DriftMonitor
+
+        monitor = DriftMonitor(drift_reference)
+        sample = drift_reference.sample(1000, random_state=1).to_dict("records")
+        monitor.update([{"input": {**r, "area": "atlantis", "avg_temp": r["avg_temp"] + 3}} for r in sample])
+
+        scores = monitor.scores()
+        assert scores["features"]["avg_temp"]["status"] == "drift"
+        assert scores["features"]["avg_rain_mm"]["status"] == "ok"
+        assert scores["unseen_area_rate"] == 1.0
+        assert scores["top_unseen_areas"] == ["atlantis"]
+
+    def test_area_case_and_spaces_are_normalized(self, drift_reference):
+        """" France " et "INDIA" sont des pays connus (normalize_area), comme au scoring"""
+        from api.drift_monitor import DriftMonitor
+
+        monitor = DriftMonitor(drift_reference.assign(area=drift_reference["area"].str.title()))
+        monitor.update([{"input": {"area": area}} for area in (" France ", "INDIA", "Atlantis")])
+        assert monitor._n_unseen == 1.0 and list(monitor._unseen_top) == ["atlantis"]
+
+    def test_drift_in_metrics(self):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "features" in response.json()["drift"]
+
+
+# ---------------------------------------------------------
+# Tests du benchmark de comparaison des modèles
+# ---------------------------------------------------------
+
+def test_compare_models_process_pool(tmp_path):
+    """Tableau du notebook + temps / pic mémoire, calculés dans un pool de processus (folds temporels par défaut)"""
+    from scripts.compare_models import compare_models
+
+    df = pd.read_csv(Path(__file__).resolve().parent.parent / "inputs" / "processed" / "clean_data.csv")
+    df = df.sample(2000, random_state=0)
+    train = df["year"] < 2010
+    features = ["area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]
+    results_df, timings_df = compare_models(
+        df.loc[train, features], df.loc[train, "hg/ha_yield"],
+        df.loc[~train, features], df.loc[~train, "hg/ha_yield"],
+        names=["Ridge", "Dummy"], cv_folds=2, workers=1, cache_dir=tmp_path)
+
+    assert results_df["Model"].tolist() == ["Ridge", "Dummy"]
+    assert {"CV_R2_Mean", "RMSE_Test", "Overfit"} <= set(results_df.columns)
+    assert (timings_df["Peak_RSS_MB"] > 0).all()
+    assert (timings_df["Wall_Time_s"] > 0).all()
+    assert len(list(tmp_path.glob("*/meta.json"))) == 1
+
+
+# ---------------------------------------------------------
+# Tests de la validation croisée temporelle
+# ---------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def split_data():
+    """Échantillon d'entraînement (années < 2010) pour les tests de validation croisée"""
+    df = pd.read_csv(Path(__file__).resolve().parent.parent / "inputs" / "processed" / "clean_data.csv")
+    df = df[df["year"] < 2010].sample(3000, random_state=0)
+    return df[["area", "item", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp"]], df["hg/ha_yield"]
+
+
+class TestTimeSplits:
+    """Tests du découpage rolling origin et du cache des folds (scripts/cv_splits.py)"""
+
+    def test_no_future_years_in_train(self, split_data):
+        from scripts.cv_splits import YearRollingOriginSplit
+
+        X, _ = split_data
+        splits = list(YearRollingOriginSplit(n_splits=4, test_years=2).split(X))
+        assert len(splits) == 4
+        for train_idx, test_idx in splits:
+            assert X["year"].iloc[train_idx].max() < X["year"].iloc[test_idx].min()
+        # origine glissante : le dernier bloc de test est la dernière année disponible
+        assert X["year"].iloc[splits[-1][1]].max() == X["year"].max()
+
+    def test_fold_cache_reused(self, split_data, tmp_path):
+        """Les matrices transformées sont calculées une fois puis relues"""
+        from scripts.compare_models import build_preprocessor
+        from scripts.cv_splits import YearRollingOriginSplit, build_fold_cache, cached_folds, cross_validate_cached
+        from sklearn.linear_model import Ridge
+
+        X, y = split_data
+        splitter = YearRollingOriginSplit(n_splits=3)
+        path = build_fold_cache(X, y, splitter, build_preprocessor(), tmp_path)
+        mtime = (path / "meta.json").stat().st_mtime_ns
+        assert build_fold_cache(X, y, splitter, build_preprocessor(), tmp_path) == path
+        assert (path / "meta.json").stat().st_mtime_ns == mtime
+
+        folds = cached_folds(X, y, splitter, build_preprocessor(), tmp_path)
+        assert len(folds) == 3 and folds[0].Xt_train.shape[0] == len(folds[0].train_idx)
+        scores = cross_validate_cached(Ridge(), folds, y)
+        assert scores["test_R2"].shape == (3,)
+
+    def test_retrain_and_quantiles_validate_on_time_folds(self, split_data, tmp_path):
+        """retrain et train_quantiles valident sur les mêmes folds temporels en cache"""
+        from sklearn.base import clone
+        from scripts.retrain import time_cv
+        from scripts.train_quantiles import cross_validate_quantiles
+
+        X, y = split_data
+        small = clone(model).set_params(model__max_iter=20)
+        cv = time_cv(small, X, y, n_splits=2, cache_dir=tmp_path)
+        assert set(cv) == {"CV_R2_mean", "CV_R2_std"} and cv["CV_R2_mean"] > 0
+        scores = cross_validate_quantiles(small, X, y, [0.1, 0.9], n_splits=2, cache_dir=tmp_path)
+        assert scores.shape[0] == 4
+        below = scores.groupby("quantile")["below"].mean()
+        assert below[0.1] < below[0.9]
+        # mêmes folds : un seul cache pour les deux scripts
+        assert len(list(tmp_path.glob("*/meta.json"))) == 1
+
+    def test_quantile_conformal_calibration(self, split_data, tmp_path):
+        """Décalage = quantile des résidus hors fold ; appliqué aussi par la traversée FlatForest"""
+        from sklearn.base import clone
+        from scripts.flat_forest import FlatForest
+        from scripts.train_quantiles import (calibrate, conformal_offsets, oof_quantile_predictions,
+                                             quantile_scores, train_quantile_models)
+
+        X, y = split_data
+        small = clone(model).set_params(model__max_iter=20)
+        oof = oof_quantile_predictions(small, X, y, [0.1, 0.9], n_splits=2, cache_dir=tmp_path)
+        offsets = conformal_offsets(oof)
+        shifted = {q: [(y_test, p + offsets[q]) for y_test, p in folds] for q, folds in oof.items()}
+        below = quantile_scores(shifted).groupby("quantile")["below"].mean()
+        assert below[0.1] == pytest.approx(0.1, abs=0.03) and below[0.9] == pytest.approx(0.9, abs=0.03)
+
+        small.fit(X, y)
+        Xt = small[:-1].transform(X.head(50))
+        raw = {q: m.predict(Xt) for q, m in train_quantile_models(small, X, y, [0.1, 0.9]).items()}
+        models = calibrate(train_quantile_models(small, X, y, [0.1, 0.9]), offsets)
+        for q, m in models.items():
+            assert m.conformal_offset_ == offsets[q]
+            np.testing.assert_allclose(m.predict(Xt), raw[q] + offsets[q])
+            np.testing.assert_allclose(FlatForest([m]).predict(Xt)[:, 0], raw[q] + offsets[q])
+
+
+# ---------------------------------------------------------
+# Tests du chargeur compact
+# ---------------------------------------------------------
+
+def test_load_dataset_compact():
+    """Types compacts, colonnes *_code ignorées, mémoire réduite"""
+    from scripts.data import DATA_PATH, FEATURE_COLS, TARGET, load_dataset
+
+    df = load_dataset()
+    raw = pd.read_csv(DATA_PATH)
+    assert list(df.columns) == FEATURE_COLS + [TARGET]
+    assert df["area"].dtype == "category" and df["item"].dtype == "category"
+    assert df["year"].dtype == "int16" and len(df) == len(raw)
+    assert df.memory_usage(deep=True).sum() < raw.memory_usage(deep=True).sum() / 4
+    # climat en float64 par défaut : mêmes valeurs que celles que reçoit l'API
+    assert df["avg_temp"].dtype == "float64"
+    np.testing.assert_array_equal(df["avg_rain_mm"].to_numpy(), raw["avg_rain_mm"].to_numpy())
+    assert load_dataset(float32=True)["avg_temp"].dtype == "float32"
+
+
+# ---------------------------------------------------------
+# Tests de l'optimiseur de plans
+# ---------------------------------------------------------
+
+class TestPlanOptimizer:
+    """Tests de /recommend/plan (culture x irrigation x fertilisation)"""
+
+    plan_request = {
+        "area": "france", "year": 2013, "avg_rain_mm": 800.0,
+        "pesticides_tonnes": 5000.0, "avg_temp": 12.0,
+        "prices": {"maize": 180, "wheat": 200, "potatoes": 50},
+        "irrigation_cost_per_ha": 250, "fertilizer_cost_per_ha": 150,
+    }
+
+    def test_single_predict_per_item(self):
+        """Une seule prédiction pour les 4 combinaisons, mêmes revenus que recommend_by_revenue"""
+        from scripts import predictor
+        from scripts.predictor import optimize_practices, recommend_by_revenue
+
+        kwargs = {k: self.plan_request[k] for k in ("area", "year", "avg_rain_mm", "pesticides_tonnes", "avg_temp", "prices")}
+        with patch.object(predictor, "predict_points", wraps=predictor.predict_points) as spy:
+            plans = optimize_practices(model, candidate_items=CANDIDATE_ITEMS, top_k=20, **kwargs)
+            assert spy.call_count == 1
+        assert len(plans) == 12
+
+        ref = recommend_by_revenue(model, candidate_items=CANDIDATE_ITEMS, irrigation=True, fertilizer=True, **kwargs)
+        both = plans[plans["irrigation"] & plans["fertilizer"]].set_index("item")
+        assert np.allclose(both.loc[ref["item"], "revenue_per_ha"], ref["revenue_per_ha"])
+
+    def test_plan_endpoint_budget(self):
+        response = client.post("/recommend/plan", json={**self.plan_request, "budget_per_ha": 200, "top_k": 20})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        # irrigation (250 €/ha) hors budget
+        assert len(results) == 6 and not any(r["irrigation"] for r in results)
+        net = [r["net_revenue_per_ha"] for r in results]
+        assert net == sorted(net, reverse=True)
+        assert all(abs(r["revenue_per_ha"] - r["practice_cost_per_ha"] - r["net_revenue_per_ha"]) < 1e-6 for r in results)
+
+
+# ---------------------------------------------------------
+# Tests de la table des effets des pratiques
+# ---------------------------------------------------------
+
+def test_practice_effects_precedence():
+    """(culture, groupe) > (*, groupe) > (culture, *) > défaut, champ par champ"""
+    from scripts.practice_effects import PracticeEffects
+
+    effects = PracticeEffects(
+        default={"irrigation_hg_ha": 12000, "fertilizer_hg_ha": 15000},
+        area_groups={"sahel": ["niger", "mali"]},
+        effects=[
+            {"item": "maize", "area_group": "*", "irrigation_hg_ha": 18000},
+            {"item": "*", "area_group": "sahel", "irrigation_hg_ha": 25000},
+            {"item": "maize", "area_group": "sahel", "fertilizer_hg_ha": 9000},
+        ])
+    items = ["maize", "wheat", "unknown crop"]
+    assert effects.effects(items, "France").tolist() == [[18000, 12000, 12000], [15000, 15000, 15000]]
+    assert effects.effects(items, "niger").tolist() == [[25000, 25000, 25000], [9000, 15000, 15000]]
+    assert effects.adjustment(items, "mali", irrigation=True, fertilizer=True).tolist() == [34000, 40000, 40000]
+    assert effects.adjustment(items, "mali").tolist() == [0, 0, 0]
+
+
+# ---------------------------------------------------------
+# Tests de l'horizon pluriannuel
+# ---------------------------------------------------------
+
+class TestHorizon:
+    """Tests de /forecast/horizon"""
+
+    horizon_request = {
+        "area": "france", "items": ["maize", "wheat"], "start_year": 2008, "end_year": 2013,
+        "avg_rain_mm": 800.0, "pesticides_tonnes": 5000.0, "avg_temp": 12.0, "temp_trend_per_year": 0.5,
+    }
+
+    def test_columnar_matches_predict(self):
+        """Une série par culture, identique aux appels /predict année par année"""
+        from scripts.predictor import predict_yield_hg_ha
+
+        response = client.post("/forecast/horizon", json=self.horizon_request)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["years"] == list(range(2008, 2014))
+        assert data["climate"]["avg_temp"] == [12.0, 12.5, 13.0, 13.5, 14.0, 14.5]
+        wheat = data["series"][1]
+        assert wheat["item"] == "wheat" and len(wheat["pred_yield_hg_ha"]) == 6
+        expected = predict_yield_hg_ha(model, area="france", item="wheat", year=2011,
+                                       avg_rain_mm=800.0, pesticides_tonnes=5000.0, avg_temp=13.5)
+        assert wheat["pred_yield_hg_ha"][3] == pytest.approx(expected)
+
+    def test_stream_and_validation(self):
+        response = client.post("/forecast/horizon", json={**self.horizon_request, "stream": True})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(l) for l in response.text.splitlines()]
+        assert lines[0]["years"][0] == 2008 and [l["item"] for l in lines[1:]] == ["maize", "wheat"]
+        full = client.post("/forecast/horizon", json=self.horizon_request).json()
+        assert lines[1:] == full["series"]
+
+        # rien n'est scoré avant que le flux ne soit lu : l'en-tête part d'abord
+        from api import main as api_main
+        from api.schemas import HorizonRequest
+        with patch.object(api_main, "forecast_horizon", wraps=api_main.forecast_horizon) as spy:
+            api_main.forecast(HorizonRequest(**self.horizon_request, stream=True))
+        assert spy.call_count == 0
+
+        bad = client.post("/forecast/horizon", json={**self.horizon_request, "avg_temp_by_year": [12.0, 13.0]})
+        assert bad.status_code == 400
+        reversed_range = client.post("/forecast/horizon", json={**self.horizon_request, "end_year": 2000})
+        assert reversed_range.status_code == 400
+        from api.schemas import MAX_HORIZON_ITEMS
+        too_many = client.post("/forecast/horizon",
+                               json={**self.horizon_request, "items": ["maize"] * (MAX_HORIZON_ITEMS + 1)})
+        assert too_many.status_code == 422
+
+
+# ---------------------------------------------------------
+# Tests du moteur en processus de l'interface
+# ---------------------------------------------------------
+
+def test_local_backend_matches_api():
+    """Mêmes codes et mêmes corps que l'API : pays connu, pays inconnu et payloads invalides"""
+    from api import local_backend
+
+    base = {"area": "france", "year": 2012, "avg_rain_mm": 800.0, "pesticides_tonnes": 5000.0,
+            "avg_temp": 12.0, "irrigation": True, "fertilizer": False}
+    unknown = {**base, "area": "Atlantis"}
+    calls = [
+        ("/predict", {**base, "item": "wheat", "price_value": 200.0, "price_unit": "eur_per_t"}),
+        ("/recommend/yield", {**base, "top_k": 3}),
+        ("/recommend/revenue", {**base, "top_k": 3, "prices": {"maize": 180.0, "wheat": 210.0}}),
+        ("/recommend/revenue", {**base, "prices": {"maize": 0.0}}),
+        # pays inconnu du modèle
+        ("/predict", {**unknown, "item": "wheat"}),
+        ("/recommend/yield", {**unknown, "top_k": 3}),
+        # payloads invalides : 422 avec le même détail que FastAPI
+        ("/predict", {**base, "item": "wheat", "year": 1800}),
+        ("/predict", {**base, "item": "wheat", "price_unit": "eur_per_bushel"}),
+        ("/recommend/yield", {**base, "top_k": 0}),
+        ("/recommend/revenue", {**base}),
+        ("/predict/batch", {"rows": [{**base, "item": "wheat", "avg_rain_mm": -1.0}]}),
+    ]
+    for endpoint, payload in calls:
+        response = client.post(endpoint, json=payload)
+        status, body = local_backend.call(endpoint, payload)
+        assert status == response.status_code
+        assert body == response.json()
+
+
+# ---------------------------------------------------------
+# Tests des moteurs de traversée des arbres
+# ---------------------------------------------------------
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_forest_engines_bit_exact(engine):
+    """Mêmes prédictions au bit près que sklearn, valeurs manquantes comprises"""
+    from scripts.compiled_forest import NUMBA_AVAILABLE
+    from scripts.data import load_dataset, FEATURE_COLS
+    from scripts.predictor import predict_points
+
+    if engine == "numba" and not NUMBA_AVAILABLE:
+        pytest.skip("Numba non installé")
+    X_in = load_dataset().sample(500, random_state=0)[FEATURE_COLS].astype({"area": object, "item": object})
+    X_in.iloc[::7, X_in.columns.get_loc("avg_temp")] = np.nan
+    np.testing.assert_array_equal(predict_points(model, X_in, engine), model.predict(X_in))
+
+
+@pytest.mark.parametrize("use_numba", [False, True])
+def test_quantized_engine(use_numba, tmp_path, monkeypatch):
+    """Entrées uint8 : écart d'arrondi float32 seulement sur le split 2010+, export lié à la version du modèle"""
+    from scripts import quantized_forest
+    from scripts.data import DATA_PATH, FEATURE_COLS
+    from scripts.quantized_forest import QuantizedForest
+
+    if use_numba and not quantized_forest.NUMBA_AVAILABLE:
+        pytest.skip("Numba non installé")
+    monkeypatch.setattr(quantized_forest, "NUMBA_AVAILABLE", use_numba)
+    df = pd.read_csv(DATA_PATH, usecols=FEATURE_COLS)
+    X_in = df[df["year"] >= 2010].sample(300, random_state=0)
+    X_in.iloc[::11, X_in.columns.get_loc("avg_rain_mm")] = np.nan
+    Xt = model[:-1].transform(X_in)
+
+    forest = QuantizedForest.from_estimator(model[-1], model_version="v1")
+    assert forest.bin(Xt).dtype == np.uint8
+    np.testing.assert_allclose(forest.predict(Xt), model.predict(X_in), rtol=0, atol=1.0)
+
+    forest.save(tmp_path / "q.npz")
+    assert QuantizedForest.load(tmp_path / "q.npz", model_version="v2") is None
+    loaded = QuantizedForest.load(tmp_path / "q.npz", model_version="v1")
+    np.testing.assert_array_equal(loaded.predict(Xt), forest.predict(Xt))
+
+
+@pytest.mark.parametrize("use_numba", [False, True])
+def test_binned_rows_match_pipeline(use_numba, monkeypatch):
+    """Lignes pré-binées par pays : mêmes recommandations au bit près que le pipeline complet"""
+    from scripts import predictor, quantized_forest
+    from scripts.binned_rows import BinnedRowCache
+
+    if use_numba and not quantized_forest.NUMBA_AVAILABLE:
+        pytest.skip("Numba non installé")
+    monkeypatch.setattr(quantized_forest, "NUMBA_AVAILABLE", use_numba)
+    items = CANDIDATE_ITEMS + ["quinoa"]  # culture inconnue : aucun bit one-hot
+    binned = BinnedRowCache(model)
+    for area, rain in [("india", 1083.0), ("atlantis", 650.0), ("france", np.nan)]:
+        ctx = dict(area=area, year=2031, avg_rain_mm=rain, pesticides_tonnes=1234.5, avg_temp=17.3)
+        X_in = pd.DataFrame({"item": items, **ctx})
+        np.testing.assert_array_equal(binned.predict(items=items, **ctx), model.predict(X_in))
+
+    kwargs = dict(area="india", year=2020, avg_rain_mm=1083.0, pesticides_tonnes=2000.0, avg_temp=26.0,
+                  candidate_items=CANDIDATE_ITEMS, prices={it: 150.0 for it in CANDIDATE_ITEMS}, top_k=20)
+    fast = predictor.recommend_by_revenue(model, **kwargs)
+    monkeypatch.setattr(predictor, "RECOMMEND_FAST_PATH", False)
+    pd.testing.assert_frame_equal(fast, predictor.recommend_by_revenue(model, **kwargs))
+
+
+def test_predict_batch_matches_single_predictions():
+    """/predict/batch : mêmes rendements que /predict ligne par ligne, et que le moteur local"""
+    from api import local_backend
+
+    rows = [{"area": area, "item": item, "year": 2018, "avg_rain_mm": 700.0, "pesticides_tonnes": 120.0,
+             "avg_temp": 19.0, "irrigation": i % 2 == 0, "fertilizer": i % 3 == 0}
+            for i, (area, item) in enumerate([("india", "maize"), ("france", "wheat"), ("atlantis", "potatoes")])]
+    response = client.post("/predict/batch", json={"rows": rows})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["pred_yield_hg_ha"] == [client.post("/predict", json=r).json()["pred_yield_hg_ha"] for r in rows]
+    assert local_backend.call("/predict/batch", {"rows": rows}) == (200, body)
+
+    for invalid in ({"rows": []}, {"rows": [{"area": "india"}]}):
+        response = client.post("/predict/batch", json=invalid)
+        assert response.status_code == 422
+        assert local_backend.call("/predict/batch", invalid) == (422, response.json())
+
+
+# ---------------------------------------------------------
+# Tests du préchauffage
+# ---------------------------------------------------------
+
+def test_warmup_touches_all_paths_without_logging(monkeypatch):
+    """Chaque chemin (revenus par unité compris) mesuré froid puis chaud, sans journalisation ; /ready suit l'état"""
+    import asyncio
+    from api import main as api_main
+    from api.warmup import Warmup, is_warming
+
+    warmup = Warmup(api_main.warmup_calls(), iterations=1, mode="background")
+    monkeypatch.setattr(api_main, "warmup", warmup)
+    assert client.get("/ready").status_code == 503 and client.get("/health").json()["ready"] is False
+
+    logged = api_main.prediction_logger.logged
+    warmup.run()
+    assert warmup.state == "done" and not is_warming()
+    assert api_main.prediction_logger.logged == logged
+    assert {"/predict", "/recommend/yield", "/recommend/revenue[eur_per_kg]", "/predict[eur_per_hg]"} <= set(warmup.paths)
+    assert all(p["cold_ms"] > 0 and p["warm_ms"] > 0 for p in warmup.paths.values())
+    assert client.get("/ready").json() == {"ready": True, "warmup": "done"}
+    assert client.get("/metrics").json()["warmup"]["state"] == "done"
+
+    failing = Warmup({"boom": lambda: 1 / 0, "ok": lambda: None}, iterations=1, mode="blocking")
+    asyncio.run(failing.start())
+    assert failing.state == "failed" and failing.ready and "boom: ZeroDivisionError" in failing.error
+    assert "ZeroDivisionError" in failing.paths["boom"]["error"]
+    assert failing.paths["ok"]["warm_ms"] is not None  # le chemin suivant est quand même préchauffé
+
+
+# ---------------------------------------------------------
+# Tests du cache des réponses
+# ---------------------------------------------------------
+
+def test_response_cache_hit_and_etag():
+    """Même corps à l'ordre des clés près : une seule inférence, ETag stable, 304 sur If-None-Match"""
+    from api import main as api_main
+
+    body = {"area": "india", "year": 2020, "avg_rain_mm": 1083.0, "pesticides_tonnes": 2000.0, "avg_temp": 26.0}
+    with patch.object(api_main, "recommend_by_yield", wraps=api_main.recommend_by_yield) as spy:
+        first = client.post("/recommend/yield", json=body)
+        second = client.post("/recommend/yield", json=dict(reversed(list(body.items()))))
+    assert spy.call_count == 1
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert first.content == second.content and first.headers["etag"] == second.headers["etag"]
+
+    not_modified = client.post("/recommend/yield", json=body, headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    # erreurs jamais mises en cache
+    invalid = client.post("/recommend/yield", json={**body, "top_k": 0})
+    assert invalid.status_code == 422 and "x-cache" not in invalid.headers
+
+    # la version de service couvre le modèle, practice_effects.json et les variables de service
+    from api import main as api_main
+    version = api_main.serving_version()
+    assert response_cache.version == version and version.startswith(api_main.MODEL_VERSION)
+    with patch.object(api_main, "AREA_FALLBACK", not api_main.AREA_FALLBACK):
+        assert api_main.serving_version() != version
+    with patch.object(api_main, "PRACTICE_EFFECTS_PATH", Path("missing.json")):
+        assert api_main.serving_version() != version
+
+
+def test_response_cache_hits_are_logged():
+    """Un hit ne passe pas par le handler mais est journalisé (donc vu par la dérive) comme un appel normal"""
+    from api import main as api_main
+
+    body = {"area": "india", "item": "maize", "year": 2020, "avg_rain_mm": 1083.0,
+            "pesticides_tonnes": 2000.0, "avg_temp": 26.0}
+    with patch.object(api_main.prediction_logger, "log") as log:
+        first = client.post("/predict", json=body)
+        second = client.post("/predict", json=body)
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    (miss,), (hit,) = [c.args for c in log.call_args_list]
+    assert (miss["cache_hit"], hit["cache_hit"]) == (False, True)
+    assert hit["input"] == miss["input"] and hit["output"] == miss["output"] == second.json()
+
+
+def test_response_cache_disk_tier(tmp_path):
+    """Second niveau disque partagé entre instances, purgé au démarrage d'une autre version"""
+    from fastapi import FastAPI
+    from api.response_cache import ResponseCache, ResponseCacheMiddleware
+
+    calls = []
+    mini = FastAPI()
+
+    @mini.post("/echo")
+    def echo(payload: dict):
+        calls.append(payload)
+        return {"n": len(calls)}
+
+    def make_client(version):
+        cache = ResponseCache(version, max_entries=1, disk_dir=tmp_path)
+        return TestClient(ResponseCacheMiddleware(mini, cache, ["/echo"])), cache
+
+    c1, _ = make_client("v1")
+    assert c1.post("/echo", json={"a": 1}).json() == {"n": 1}
+    assert c1.post("/echo", json={"b": 2}).json() == {"n": 2}  # évince {"a": 1} de la mémoire
+
+    c2, cache2 = make_client("v1")  # autre worker / redémarrage
+    assert c2.post("/echo", json={"a": 1}).json() == {"n": 1}
+    assert cache2.disk_hits == 1 and len(calls) == 2
+
+    c3, _ = make_client("v2")  # redémarrage avec un autre modèle ou une autre configuration
+    assert not (tmp_path / "v1").exists()
+    assert c3.post("/echo", json={"a": 1}).json() == {"n": 3}
+
+
+# ---------------------------------------------------------
+# Tests des jobs de scoring par lots
+# ---------------------------------------------------------
+
+def test_job_store_created_on_first_use(tmp_path, monkeypatch):
+    """L'import de api.main ne crée pas JOBS_DIR : le store est créé à la première requête /jobs"""
+    from api import main as api_main
+
+    monkeypatch.setattr(api_main, "JOBS_DIR", tmp_path / "jobs")
+    monkeypatch.setattr(api_main, "job_store", None)
+    monkeypatch.setattr(api_main, "job_runner", None)
+    assert not (tmp_path / "jobs").exists()
+    assert client.get("/jobs/unknown").status_code == 404
+    assert (tmp_path / "jobs" / "jobs.sqlite").exists()
+    assert api_main.job_runner.store is api_main.job_store
+
+
+def test_jobs_lifecycle(tmp_path, monkeypatch):
+    """Upload JSONL -> job traité par blocs -> résultat CSV identique à predict_frame ; erreurs et chemins refusés"""
+    import io
+    from api import main as api_main
+    from api.jobs import JobRunner, JobStore
+    from scripts.predictor import predict_frame
+
+    store = JobStore(tmp_path / "jobs")
+    runner = JobRunner(store, workers=0, chunk_rows=7)
+    monkeypatch.setattr(api_main, "job_store", store)
+    monkeypatch.setattr(api_main, "job_runner", runner)
+
+    df = pd.DataFrame({"area": ["india", "france", "kenya"] * 8, "item": CANDIDATE_ITEMS[:3] * 8,
+                       "year": 2020, "avg_rain_mm": 900.0, "pesticides_tonnes": 150.0, "avg_temp": 21.5,
+                       "fertilizer": [True, False] * 12})
+    body = df.to_json(orient="records", lines=True).encode()
+    created = client.post("/jobs", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert created.status_code == 202 and created.json()["status"] == "queued"
+    job_id = created.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    assert runner.process_next() == job_id
+    status = client.get(f"/jobs/{job_id}").json()
+    assert (status["status"], status["processed_rows"], status["total_rows"], status["progress"]) == ("done", 24, 24, 1.0)
+    result = pd.read_csv(io.BytesIO(client.get(f"/jobs/{job_id}/result").content))
+    np.testing.assert_allclose(result["pred_yield_hg_ha"], predict_frame(model, df))
+
+    bad = client.post("/jobs?format=csv", content=b"area,item\nindia,maize\n").json()["job_id"]
+    runner.process_next()
+    failed = client.get(f"/jobs/{bad}").json()
+    assert failed["status"] == "failed" and "Missing columns" in failed["error"]
+
+    assert client.post("/jobs", json={"path": "../api/main.py"}).status_code == 403
+    assert client.post("/jobs?format=xlsx", content=b"x").status_code == 415
+    assert client.delete(f"/jobs/{job_id}").json()["deleted"]
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+
+
+def test_jobs_requeued_when_lease_expires(tmp_path):
+    """Job 'running' sans renouvellement du bail -> remis en file ; bail renouvelé -> laissé à son runner"""
+    import time
+    from api.jobs import JobStore
+
+    store = JobStore(tmp_path / "jobs")
+    for job_id in ("stale", "alive"):
+        store.create(job_id, tmp_path / f"{job_id}.csv", "csv", "csv")
+        assert store.claim()["id"] == job_id
+    store.update("stale", heartbeat_at=time.time() - 120, processed_rows=10)
+    store.heartbeat(["alive"])
+
+    assert store.requeue_orphans(lease_s=60) == 1
+    stale, alive = store.get("stale"), store.get("alive")
+    assert (stale["status"], stale["processed_rows"]) == ("queued", 0)
+    assert alive["status"] == "running"
+    assert store.claim()["id"] == "stale"
+
+
+# ---------------------------------------------------------
+# Limitation de débit + file équitable
+# ---------------------------------------------------------
+
+def test_token_bucket_rate_limit(monkeypatch):
+    """Rafale consommée -> 429 + Retry-After ; seau rechargé avec le temps ; un seau par client"""
+    from api.rate_limit import TokenBucketLimiter, parse_rate, parse_rules
+
+    now = [0.0]
+    limiter = TokenBucketLimiter(parse_rules("/recommend/*=2:3", parse_rate), clock=lambda: now[0])
+    assert [limiter.acquire("ip:a", "/recommend/yield") for _ in range(3)] == [None] * 3
+    assert limiter.acquire("ip:a", "/recommend/revenue") == pytest.approx(0.5)  # règle partagée par le préfixe
+    assert limiter.acquire("ip:b", "/recommend/yield") is None
+    assert limiter.acquire("ip:a", "/health") is None
+    now[0] = 0.5
+    assert limiter.acquire("ip:a", "/recommend/yield") is None
+
+    monkeypatch.setattr(rate_limiter, "rules", parse_rules("/health=0.01:2", parse_rate))
+    assert [client.get("/health").status_code for _ in range(2)] == [200, 200]
+    limited = client.get("/health")
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) >= 1
+    # clé inconnue : ignorée, le client reste limité par son IP
+    assert client.get("/health", headers={"X-API-Key": "random-1"}).status_code == 429
+
+
+def test_client_identity_and_scheduler_validation():
+    """Seules les clés déclarées comptent ; X-Forwarded-For lu depuis la droite ; poids nuls refusés"""
+    from api.rate_limit import FairScheduler, client_id
+
+    scope = {"client": ("10.0.0.2", 5000),
+             "headers": [(b"x-api-key", b"forged"), (b"x-forwarded-for", b"6.6.6.6, 203.0.113.7")]}
+    assert client_id(scope) == "ip:10.0.0.2"
+    assert client_id(scope, trusted_proxies=1) == "ip:203.0.113.7"
+    assert client_id(scope, trusted_proxies=3) == "ip:10.0.0.2"
+    assert client_id(scope, api_keys=frozenset({"forged"})) == "key:forged"
+
+    with pytest.raises(ValueError):
+        FairScheduler(concurrency=1, weights={"key:x": 0})
+    with pytest.raises(ValueError):
+        FairScheduler(concurrency=1, quantum=0)
+
+
+def test_fair_scheduler_interleaves_clients():
+    """Un client qui remplit la file ne fait pas attendre les autres derrière toutes ses requêtes"""
+    import asyncio
+    from api.rate_limit import FairScheduler, QueueFull
+
+    async def scenario():
+        scheduler = FairScheduler(concurrency=1, quantum=1.0, max_queue_per_client=8, weights={"key:ui": 2.0})
+        await scheduler.acquire("ip:sweep")
+        order = []
+
+        async def request(client, cost=1.0):
+            await scheduler.acquire(client, cost)
+            order.append(client)
+
+        tasks = [asyncio.create_task(request("ip:sweep")) for _ in range(8)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await scheduler.acquire("ip:sweep")
+        tasks += [asyncio.create_task(request("key:ui")) for _ in range(4)]
+        await asyncio.sleep(0)
+        while len(order) < len(tasks):
+            scheduler.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    # poids 2 : l'interface passe deux fois par tour, ses 4 requêtes sortent parmi les 6 premières
+    assert order[:6].count("key:ui") == 4
+    assert stats["rejected"] == 1 and stats["waiting"] == 0 and stats["in_flight"] == 1
+
+
+# ---------------------------------------------------------
+# Pays inconnus : voisins climatiques
+# ---------------------------------------------------------
+
+def test_unknown_area_blends_nearest_areas(monkeypatch, tmp_path):
+    """Pays inconnu -> moyenne pondérée de ses voisins, en un seul lot ; pays connus seulement normalisés"""
+    from scripts import predictor
+    from scripts.area_neighbors import AreaNeighbors
+
+    index = predictor.get_area_neighbors(model)
+    index.save(tmp_path / "index.pkl")
+    assert AreaNeighbors.load(tmp_path / "index.pkl", "other-version") is None
+    loaded = AreaNeighbors.load(tmp_path / "index.pkl", index.model_version)
+    assert list(loaded.areas) == list(index.areas)
+
+    X = pd.DataFrame({"area": ["Atlantis", " India"], "item": ["maize", "maize"], "year": 2020,
+                      "avg_rain_mm": [1083.0, 1083.0], "pesticides_tonnes": [2000.0, 2000.0],
+                      "avg_temp": [26.0, 26.0]})
+    neighbors, weights = index.query(X.iloc[:1])
+    by_neighbor = model.predict(pd.DataFrame([{**X.iloc[0].to_dict(), "area": a} for a in neighbors[0]]))
+
+    monkeypatch.setattr(predictor, "AREA_FALLBACK", True)
+    preds = predictor.predict_points(model, X)
+    assert preds[0] == pytest.approx(float(by_neighbor @ weights[0]))
+    assert preds[1] == pytest.approx(model.predict(X.iloc[1:].assign(area="india"))[0])
+
+    ranked = predictor.recommend_by_yield(model, area="Atlantis", year=2020, avg_rain_mm=1083.0,
+                                          pesticides_tonnes=2000.0, avg_temp=26.0,
+                                          candidate_items=["maize"], top_k=1)
+    assert ranked["pred_yield_hg_ha"].iloc[0] == pytest.approx(preds[0])
+
+    # /explain mélange les contributions des mêmes voisins : même prédiction que /predict
+    from scripts.explain import explain_prediction
+    explained = explain_prediction(model, area="Atlantis", item="maize", year=2020, avg_rain_mm=1083.0,
+                                   pesticides_tonnes=2000.0, avg_temp=26.0)
+    assert explained["pred_yield_hg_ha"] == pytest.approx(preds[0])
+    assert explained["base_value"] + sum(explained["contributions"].values()) == pytest.approx(preds[0])
+    assert sum(explained["area_neighbors"].values()) == pytest.approx(1.0)
+
+    monkeypatch.setattr(predictor, "AREA_FALLBACK", False)
+    assert predictor.predict_points(model, X)[0] == pytest.approx(model.predict(X.iloc[:1])[0])
+    assert explain_prediction(model, area="Atlantis", item="maize", year=2020, avg_rain_mm=1083.0,
+                              pesticides_tonnes=2000.0, avg_temp=26.0)["area_neighbors"] is None
+
+
+# ---------------------------------------------------------
+# Historique des rendements (SQLite indexée)
+# ---------------------------------------------------------
+
+def _write_raw_history(raw):
+    raw.mkdir()
+    (raw / "yield.csv").write_text(
+        "Domain Code,Domain,Area Code,Area,Element Code,Element,Item Code,Item,Year Code,Year,Unit,Value\n"
+        + "".join(f"QC,Crops,1,{a},5419,Yield,56,{it},{y},{y},hg/ha,{v}\n"
+                  for a, it, y, v in [("India", "Maize", 2010, 25401), ("India", "Maize", 2011, 24784),
+                                      ("India", "Wheat", 2011, 29886), ("Kenya", "Maize", 2011, 16420)]))
+    (raw / "rainfall.csv").write_text(" Area,Year,average_rain_fall_mm_per_year\nIndia,2011,1083\nKenya,2011,..\n")
+    (raw / "pesticides.csv").write_text(
+        "Domain,Area,Element,Item,Year,Unit,Value\n"
+        '"Pesticides Use","India","Use","Pesticides (total)","2011","tonnes of active ingredients","55540"\n')
+    (raw / "temp.csv").write_text("year,country,avg_temp\n2011,India,25.0\n2011,India,26.0\n2011,Kenya,19.5\n")
+
+
+def test_history_store_queries_and_rebuild(tmp_path):
+    """Filtres pays / culture / années insensibles à la casse, climat joint, reconstruction si un CSV change"""
+    from api.history import HistoryStore
+
+    raw = tmp_path / "raw"
+    _write_raw_history(raw)
+    store = HistoryStore(tmp_path / "history.sqlite", raw_dir=raw)
+
+    rows = store.yields("INDIA", "maize", year_from=2011)
+    assert rows == [{"area": "india", "item": "maize", "year": 2011, "yield_hg_ha": 24784.0,
+                     "avg_rain_mm": 1083.0, "pesticides_tonnes": 55540.0, "avg_temp": 25.5}]
+    assert [(r["area"], r["year"]) for r in store.yields(item="Maize", climate=False)] == \
+        [("india", 2010), ("india", 2011), ("kenya", 2011)]
+    assert store.climate("kenya") == [{"area": "kenya", "year": 2011, "avg_rain_mm": None,
+                                       "pesticides_tonnes": None, "avg_temp": 19.5}]
+    assert len(store.yields("india", limit=1)) == 1
+    with pytest.raises(ValueError):
+        store.yields()
+
+    with open(raw / "yield.csv", "a") as f:
+        f.write("QC,Crops,1,India,5419,Yield,56,Maize,2012,2012,hg/ha,25557\n")
+    fresh = HistoryStore(tmp_path / "history.sqlite", raw_dir=raw)
+    assert [r["year"] for r in fresh.yields("india", "maize")] == [2010, 2011, 2012]
+
+
+def test_history_endpoints(monkeypatch, tmp_path):
+    import api.main as api_main
+    from api.history import HistoryStore
+
+    _write_raw_history(tmp_path / "raw")
+    monkeypatch.setattr(api_main, "history_store", HistoryStore(tmp_path / "history.sqlite", raw_dir=tmp_path / "raw"))
+
+    body = client.get("/history/yield", params={"area": "India", "year_from": 2011, "climate": False}).json()
+    assert body["count"] == 2 and {r["item"] for r in body["rows"]} == {"maize", "wheat"}
+    assert "avg_temp" not in body["rows"][0]
+    assert client.get("/history/climate", params={"area": "india"}).json()["rows"][0]["avg_temp"] == 25.5
+    assert client.get("/history/yield").status_code == 400
+    assert client.get("/history/climate").status_code == 422
+
+
 # ---------------------------------------------------------
 # Configuration pytest
 # ---------------------------------------------------------